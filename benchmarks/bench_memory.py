@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Memory used by per-file data structures, before and after compaction.
+
+Builds each structure for a synthetic list of files (no files are
+created) and measures what it retains with tracemalloc:
+
+    scan       category -> paths: dict of full path lists, or FileTable
+    moves      in-memory move records: list of dicts, or MoveRecords
+    plan       planned moves: list of tuples, or MovePlan
+
+Run from the repository root:
+
+    python benchmarks/bench_memory.py --files 1000000 5000000
+"""
+
+import os
+import gc
+import sys
+import json
+import argparse
+import tracemalloc
+from collections import namedtuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_sorter.compact import FileTable, MoveRecords
+from file_sorter.plan import MovePlan
+
+CATEGORIES = ['Documents', 'Images', 'Videos', 'Music', 'Archives', 'Code', 'Other']
+EXTENSIONS = ['.pdf', '.jpg', '.mp4', '.mp3', '.zip', '.py', '.bin']
+
+_Entry = namedtuple('_Entry', 'path name')
+_Stat = namedtuple('_Stat', 'st_size st_mtime_ns')
+
+
+ROOT = '/srv/fileserver/shared'
+
+
+def iter_files(files, per_folder):
+    """Yield (folder, name, category index) for files spread over folders"""
+    for i in range(files):
+        kind = i % len(CATEGORIES)
+        folder = (f"{ROOT}/department_{i // (per_folder * 100):03d}"
+                  f"/project_{i // per_folder:06d}/incoming")
+        yield folder, f"scan_{i:08d}_final{EXTENSIONS[kind]}", kind
+
+
+def build_scan_dict(files, per_folder):
+    result = {}
+    for folder, name, kind in iter_files(files, per_folder):
+        result.setdefault(CATEGORIES[kind], []).append(os.path.join(folder, name))
+    return result
+
+
+def build_scan_table(files, per_folder):
+    table = FileTable()
+    for folder, name, kind in iter_files(files, per_folder):
+        table.add(folder, name, CATEGORIES[kind])
+    return table
+
+
+def build_moves_list(files, per_folder):
+    moves = []
+    for folder, name, kind in iter_files(files, per_folder):
+        moves.append({'from': os.path.join(folder, name),
+                      'to': os.path.join(ROOT, CATEGORIES[kind], name),
+                      'strategy': 'rename', 'bytes': 1024})
+    return moves
+
+
+def build_moves_records(files, per_folder):
+    moves = MoveRecords()
+    for folder, name, kind in iter_files(files, per_folder):
+        moves.append(os.path.join(folder, name),
+                     os.path.join(ROOT, CATEGORIES[kind], name), 'rename', 1024)
+    return moves
+
+
+def build_plan_tuples(files, per_folder):
+    folders = {}
+    moves = []
+    for folder, name, kind in iter_files(files, per_folder):
+        source_id = folders.setdefault(folder, len(folders))
+        target_id = folders.setdefault(CATEGORIES[kind], len(folders))
+        moves.append((source_id, name, target_id, None, 1024, 1700000000000000000, 'rename'))
+    return folders, moves
+
+
+def build_plan(files, per_folder):
+    plan = MovePlan(ROOT)
+    st = _Stat(1024, 1700000000000000000)
+    for folder, name, kind in iter_files(files, per_folder):
+        plan.add(_Entry(os.path.join(folder, name), name), st, CATEGORIES[kind],
+                 os.path.join(ROOT, CATEGORIES[kind]), name, 'rename')
+    return plan
+
+
+STRUCTURES = {
+    'scan': (build_scan_dict, build_scan_table),
+    'moves': (build_moves_list, build_moves_records),
+    'plan': (build_plan_tuples, build_plan)
+}
+
+
+def measure(build, files, per_folder):
+    """Bytes retained by the result of build"""
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    result = build(files, per_folder)
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del result
+    gc.collect()
+    return retained
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, nargs='+', default=[1000000])
+    parser.add_argument('--per-folder', type=int, default=200, help="files per folder")
+    parser.add_argument('--only', choices=sorted(STRUCTURES), nargs='+',
+                        help="measure only these structures")
+    parser.add_argument('--json', action='store_true', help="print results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    for files in args.files:
+        for name in args.only or STRUCTURES:
+            before, after = STRUCTURES[name]
+            old = measure(before, files, args.per_folder)
+            new = measure(after, files, args.per_folder)
+            results.setdefault(str(files), {})[name] = {
+                'before_bytes': old,
+                'after_bytes': new,
+                'before_per_file': round(old / files, 1),
+                'after_per_file': round(new / files, 1)
+            }
+            if not args.json:
+                print(f"{files:>9} files  {name:<6} {old / 2 ** 20:>9.1f} MiB -> "
+                      f"{new / 2 ** 20:>8.1f} MiB  ({old / files:.0f} -> {new / files:.0f} B/file)",
+                      flush=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
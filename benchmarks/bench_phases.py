@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Time each phase of a sort on a synthetic tree.
+
+Phases:
+
+    scan       list the tree (walk_entries)
+    classify   category and placement of every scanned file
+    plan       SortEngine.plan, scan and classify with collisions resolved
+    move       SortEngine.sort_directory, journaled
+    undo       SortEngine.undo_operation of that sort
+
+Each phase runs on a tmpfs mount and on a disk-backed directory, on a
+fresh tree built by treegen with the same seed, and the best of --repeat
+runs is kept. Results are JSON so runs of two commits can be compared:
+
+    python benchmarks/bench_phases.py --files 50000 --output before.json
+    python benchmarks/bench_phases.py --files 50000 --compare before.json
+
+Needs no display; only the headless engine is imported.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from file_sorter import SortEngine
+from file_sorter.scanner import walk_entries
+
+import treegen
+
+PHASES = ('scan', 'classify', 'plan', 'move', 'undo')
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    value = fn()
+    return time.perf_counter() - start, value
+
+
+def run_once(base, tree, workers):
+    """Build a tree under base and time every phase once"""
+    root = tempfile.mkdtemp(prefix='file-sorter-bench-', dir=base)
+    state = tempfile.mkdtemp(prefix='file-sorter-state-', dir=base)
+    try:
+        made = treegen.make_tree(root, **tree)
+        engine = SortEngine(settings_file=None, journal_dir=os.path.join(state, 'journal'))
+        seconds = {}
+
+        def scan():
+            return [entry for _, file_entries, _ in walk_entries(root) for entry in file_entries]
+        seconds['scan'], entries = _timed(scan)
+
+        def classify():
+            category_for_name = engine.extension_index.category_for_name
+            place = engine._placer(root)
+            return sum(1 for entry in entries if place(entry, category_for_name(entry.name)))
+        seconds['classify'], _ = _timed(classify)
+
+        seconds['plan'], plan = _timed(lambda: engine.plan(root))
+        seconds['move'], result = _timed(lambda: engine.sort_directory(root, workers=workers))
+        seconds['undo'], undone = _timed(lambda: engine.undo_operation(result['operation']))
+
+        return {
+            'tree': made,
+            'seconds': seconds,
+            'scanned_files': len(entries),
+            'planned_moves': len(plan),
+            'moved_files': result['moved_files'],
+            'moved_back': undone['moved_back'],
+            'errors': len(result['errors']) + len(undone['errors'])
+        }
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+        shutil.rmtree(state, ignore_errors=True)
+
+
+def run_target(base, tree, workers, repeat):
+    """Best time per phase over repeat runs, with per-file rates"""
+    runs = [run_once(base, tree, workers) for _ in range(repeat)]
+    best = {phase: min(run['seconds'][phase] for run in runs) for phase in PHASES}
+    files = runs[0]['scanned_files']
+    return {
+        'seconds': {phase: round(value, 5) for phase, value in best.items()},
+        'files_per_second': {phase: round(files / value, 1) if value else None
+                             for phase, value in best.items()},
+        'files': files,
+        'folders': runs[0]['tree']['folders'],
+        'duplicate_names': runs[0]['tree']['duplicate_names'],
+        'moved_files': runs[0]['moved_files'],
+        'errors': sum(run['errors'] for run in runs)
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results, baseline):
+    """Print per phase time ratios against a baseline result file"""
+    for label, target in results['targets'].items():
+        old = baseline.get('targets', {}).get(label)
+        if not old:
+            continue
+        print(f"{label} (vs {baseline.get('meta', {}).get('commit') or 'baseline'}):")
+        for phase in PHASES:
+            before = old['seconds'].get(phase)
+            after = target['seconds'][phase]
+            if not before or not after:
+                continue
+            change = (after - before) / before * 100
+            print(f"  {phase:<9} {before:>9.4f} s -> {after:>9.4f} s  {change:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    treegen.add_arguments(parser)
+    parser.add_argument('--workers', type=int, default=1, help="move workers")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per target; best is kept")
+    parser.add_argument('--tmpfs-dir', default='/dev/shm')
+    parser.add_argument('--disk-dir', default=tempfile.gettempdir())
+    parser.add_argument('--output', metavar='FILE', help="also write the JSON results to FILE")
+    parser.add_argument('--compare', metavar='FILE', help="print changes against earlier results")
+    args = parser.parse_args()
+
+    tree = treegen.tree_options(args)
+    results = {
+        'meta': {
+            'commit': _git_commit(),
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'workers': args.workers,
+            'repeat': args.repeat,
+            'tree': tree
+        },
+        'targets': {}
+    }
+    for label, base in (('tmpfs', args.tmpfs_dir), ('disk', args.disk_dir)):
+        if not os.path.isdir(base):
+            print(f"Skipping {label}: {base} does not exist", file=sys.stderr)
+            continue
+        results['targets'][label] = run_target(base, tree, args.workers, max(1, args.repeat))
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            compare(results, json.load(f))
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
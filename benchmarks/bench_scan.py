@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Directory scan time against the number of scan threads.
+
+Builds a synthetic tree and lists it with walk_entries using 1, 2, 4, ...
+threads, in fixed and in completion order. Local disks answer a listing
+in microseconds, so --latency adds a delay to every os.scandir call to
+stand in for the round trip of a network file system. Run from the
+repository root:
+
+    python benchmarks/bench_scan.py --files 50000 --depth 4 --fanout 6 --latency 2
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from file_sorter import scanner
+from file_sorter.scanner import walk_entries
+
+import treegen
+
+
+def delayed_scandir(latency):
+    """os.scandir that waits latency seconds first"""
+    scandir = os.scandir
+
+    def wrapper(path):
+        time.sleep(latency)
+        return scandir(path)
+    return wrapper
+
+
+def run_once(root, workers, ordered):
+    start = time.perf_counter()
+    directories = files = 0
+    for _, file_entries, _ in walk_entries(root, workers=workers, ordered=ordered):
+        directories += 1
+        files += len(file_entries)
+    elapsed = time.perf_counter() - start
+    return {
+        'workers': workers,
+        'ordered': ordered,
+        'seconds': round(elapsed, 4),
+        'directories_per_second': round(directories / elapsed, 1) if elapsed else None,
+        'directories': directories,
+        'files': files
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    treegen.add_arguments(parser)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="milliseconds added to every directory listing")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per setting; the best counts")
+    parser.add_argument('--dir', default=tempfile.gettempdir(), help="where to build the tree")
+    parser.add_argument('--json', action='store_true', help="print results as JSON")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='file-sorter-bench-', dir=args.dir)
+    try:
+        treegen.make_tree(root, **treegen.tree_options(args))
+        if args.latency:
+            scanner.os.scandir = delayed_scandir(args.latency / 1000)
+        results = []
+        for workers in args.workers:
+            for ordered in ((True, False) if workers > 1 else (True,)):
+                runs = [run_once(root, workers, ordered) for _ in range(max(1, args.repeat))]
+                results.append(min(runs, key=lambda run: run['seconds']))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps({'latency_ms': args.latency, 'runs': results}, indent=2))
+        return
+
+    for run in results:
+        order = 'fixed order' if run['ordered'] else 'completion order'
+        print(f"{run['workers']:>3} threads  {order:<16}  {run['seconds']:>8.3f} s  "
+              f"{run['directories_per_second']:>10} dirs/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Startup time of the sorter: import graph, commands and executable builds.
+
+Three measurements, each the best of --repeat fresh processes:
+
+    imports    python -X importtime for the entry points: the modules each
+               one loads, their total import time, the slowest modules,
+               and whether Tk gets loaded
+    commands   wall time of a quick command (history) started through
+               python -m file_sorter and through the fileSorter.py launcher
+    builds     the same command run by frozen executables, given with
+               --exe LABEL=PATH or built here with --build (needs PyInstaller)
+
+Run from the repository root:
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --build onefile fast
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Entry point -> code run with -X importtime
+IMPORT_TARGETS = {
+    'cli': "import file_sorter.cli",
+    'settings': "from file_sorter import SortEngine; SortEngine(settings_file=None)",
+    'launcher': "import fileSorter",
+    'gui': "import file_sorter_gui",
+}
+
+# Files a build needs, copied next to build_exe.py in a scratch folder
+BUILD_FILES = ['build_exe.py', 'fileSorter.py', 'file_sorter_gui.py', 'file_sorter']
+
+
+def best_wall_time(command, repeat, cwd=REPO):
+    """Fastest of repeat runs of command, in seconds; None if it fails"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run(command, cwd=cwd, stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        if completed.returncode != 0:
+            return None
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 4)
+
+
+def parse_importtime(text):
+    """Return [(module, self_us, cumulative_us)] from -X importtime output"""
+    modules = []
+    for line in text.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        modules.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return modules
+
+
+def measure_imports(code, repeat, top):
+    """Import graph of code: module count, total time, slowest modules"""
+    runs = []
+    for _ in range(repeat):
+        completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=REPO,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if completed.returncode != 0:
+            return {'error': completed.stderr.strip().splitlines()[-1:]}
+        runs.append(parse_importtime(completed.stderr))
+    modules = min(runs, key=lambda run: sum(self_us for _, self_us, _ in run))
+    slowest = sorted(modules, key=lambda module: -module[1])[:top]
+    return {
+        'modules': len(modules),
+        'import_ms': round(sum(self_us for _, self_us, _ in modules) / 1000, 2),
+        'loads_tk': any(name.split('.')[0] in ('tkinter', '_tkinter') for name, _, _ in modules),
+        'slowest': [{'module': name, 'self_ms': round(self_us / 1000, 2)}
+                    for name, self_us, _ in slowest]
+    }
+
+
+def build(profile, scratch):
+    """Build profile in a scratch copy of the sources; returns the executable path"""
+    folder = os.path.join(scratch, profile)
+    os.makedirs(folder)
+    for name in BUILD_FILES:
+        source = os.path.join(REPO, name)
+        if os.path.isdir(source):
+            shutil.copytree(source, os.path.join(folder, name),
+                            ignore=shutil.ignore_patterns('__pycache__'))
+        else:
+            shutil.copy2(source, folder)
+    subprocess.run([sys.executable, 'build_exe.py', '--profile', profile, '--console'],
+                   cwd=folder, check=True, stdout=subprocess.DEVNULL)
+    exe_name = 'AdvancedFileSorter.exe' if os.name == 'nt' else 'AdvancedFileSorter'
+    if profile == 'fast':
+        return os.path.join(folder, 'dist', 'AdvancedFileSorter', exe_name)
+    return os.path.join(folder, 'dist', exe_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help="runs per measurement; the best counts")
+    parser.add_argument('--top', type=int, default=8, help="slowest modules listed per entry point")
+    parser.add_argument('--exe', action='append', default=[], metavar='LABEL=PATH',
+                        help="frozen executable to time; may be repeated")
+    parser.add_argument('--build', nargs='+', choices=('onefile', 'fast'), default=[],
+                        help="build these profiles with build_exe.py and time them")
+    parser.add_argument('--json', action='store_true', help="print results as JSON")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix='file-sorter-startup-')
+    try:
+        settings = os.path.join(scratch, 'settings.json')
+        quick = ['--settings', settings, 'history']
+        results = {
+            'imports': {label: measure_imports(code, args.repeat, args.top)
+                        for label, code in IMPORT_TARGETS.items()},
+            'commands': {
+                'python': best_wall_time([sys.executable, '-c', 'pass'], args.repeat),
+                'python -m file_sorter history': best_wall_time(
+                    [sys.executable, '-m', 'file_sorter'] + quick, args.repeat),
+                'fileSorter.py history': best_wall_time(
+                    [sys.executable, 'fileSorter.py'] + quick, args.repeat)
+            },
+            'builds': {}
+        }
+
+        executables = dict(item.split('=', 1) for item in args.exe)
+        for profile in args.build:
+            executables[profile] = build(profile, scratch)
+        for label, path in executables.items():
+            results['builds'][label] = best_wall_time([path] + quick, args.repeat,
+                                                      cwd=os.path.dirname(path) or '.')
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("Imports:")
+    for label, result in results['imports'].items():
+        if 'error' in result:
+            print(f"  {label:<10} failed: {' '.join(result['error'])}")
+            continue
+        tk = ", loads Tk" if result['loads_tk'] else ""
+        print(f"  {label:<10} {result['import_ms']:>8.1f} ms  {result['modules']:>4} modules{tk}")
+        for module in result['slowest']:
+            print(f"      {module['self_ms']:>7.2f} ms  {module['module']}")
+    print("Commands (wall time):")
+    for label, seconds in results['commands'].items():
+        print(f"  {label:<32} {seconds * 1000 if seconds else float('nan'):>8.1f} ms")
+    if results['builds']:
+        print("Builds (history, wall time):")
+        for label, seconds in results['builds'].items():
+            print(f"  {label:<32} {seconds * 1000 if seconds else float('nan'):>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Move throughput against the number of worker threads.
+
+Builds the same synthetic tree on a tmpfs mount and on a disk-backed
+directory, sorts it with 1, 2, 4, ... workers and prints files/s for each
+run. Run from the repository root:
+
+    python benchmarks/bench_workers.py --files 20000 --workers 1 2 4 8
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from file_sorter import SortEngine
+
+import treegen
+
+
+def run_once(base, tree, workers):
+    """Build a fresh tree under base and time one sort"""
+    root = tempfile.mkdtemp(prefix='file-sorter-bench-', dir=base)
+    try:
+        treegen.make_tree(root, **tree)
+        engine = SortEngine(settings_file=None)
+        start = time.perf_counter()
+        result = engine.sort_directory(root, workers=workers)
+        elapsed = time.perf_counter() - start
+        return {
+            'workers': workers,
+            'seconds': round(elapsed, 4),
+            'files_per_second': round(result['moved_files'] / elapsed, 1) if elapsed else None,
+            'moved_files': result['moved_files'],
+            'errors': len(result['errors'])
+        }
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    treegen.add_arguments(parser)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--tmpfs-dir', default='/dev/shm')
+    parser.add_argument('--disk-dir', default=tempfile.gettempdir())
+    parser.add_argument('--json', action='store_true', help="print results as JSON")
+    args = parser.parse_args()
+
+    tree = treegen.tree_options(args)
+    results = {}
+    for label, base in (('tmpfs', args.tmpfs_dir), ('disk', args.disk_dir)):
+        if not os.path.isdir(base):
+            print(f"Skipping {label}: {base} does not exist", file=sys.stderr)
+            continue
+        results[label] = [run_once(base, tree, workers)
+                          for workers in args.workers]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for label, runs in results.items():
+        print(f"{label}:")
+        for run in runs:
+            print(f"  {run['workers']:>3} workers  {run['seconds']:>8.3f} s  "
+                  f"{run['files_per_second']:>10} files/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Reproducible synthetic directory trees for the benchmarks.
+
+The same parameters and seed always give the same tree: the same folder
+layout, names, extensions and sizes. Usable on its own:
+
+    python benchmarks/treegen.py /tmp/tree --files 50000 --depth 3 --fanout 6 \\
+        --extensions pdf:3,jpg:5,mp4:1,txt:2 --duplicate-names 0.1
+"""
+
+import os
+import json
+import random
+import argparse
+
+DEFAULT_EXTENSIONS = {'.pdf': 3, '.txt': 2, '.jpg': 4, '.png': 2, '.mp4': 1, '.mp3': 2,
+                      '.zip': 1, '.py': 1, '.bin': 1}
+
+
+def parse_extensions(text):
+    """Parse "pdf:3,jpg:5,bin" into {'.pdf': 3, '.jpg': 5, '.bin': 1}"""
+    mix = {}
+    for item in text.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        extension, _, weight = item.partition(':')
+        extension = extension.strip().lower()
+        if extension and not extension.startswith('.'):
+            extension = '.' + extension
+        mix[extension] = float(weight) if weight else 1.0
+    return mix
+
+
+def make_folders(root, depth, fanout):
+    """Return the folders of a tree depth levels deep with fanout subfolders each"""
+    folders = [root]
+    level = [root]
+    for d in range(depth):
+        level = [os.path.join(parent, f"d{d}_{i}") for parent in level for i in range(fanout)]
+        folders.extend(level)
+    return folders
+
+
+def make_tree(root, files=10000, depth=2, fanout=5, extensions=None, duplicate_names=0.0,
+              file_size=1024, seed=0):
+    """Create files below root; returns a description of what was made.
+
+    duplicate_names is the fraction of files that reuse the name of an
+    earlier file in another folder, so sorting them has to resolve a name
+    collision. file_size is the average size; sizes vary by +-50%.
+    """
+    rng = random.Random(seed)
+    extensions = extensions or DEFAULT_EXTENSIONS
+    choices = list(extensions)
+    weights = [extensions[extension] for extension in choices]
+
+    folders = make_folders(root, depth, fanout)
+    for folder in folders:
+        os.makedirs(folder, exist_ok=True)
+
+    payload = b'x' * (file_size + file_size // 2 + 1)
+    names = []
+    total_bytes = 0
+    collisions = 0
+    for i in range(files):
+        if names and rng.random() < duplicate_names:
+            name = rng.choice(names)
+            collisions += 1
+        else:
+            name = f"file{i:07d}{rng.choices(choices, weights)[0]}"
+            names.append(name)
+        path = os.path.join(rng.choice(folders), name)
+        if os.path.exists(path):
+            # Same name in the same folder; only possible for a reused name
+            path = os.path.join(rng.choice(folders), f"c{i}_{name}")
+        size = rng.randint(file_size // 2, file_size + file_size // 2) if file_size else 0
+        with open(path, 'wb') as f:
+            f.write(payload[:size])
+        total_bytes += size
+
+    return {
+        'files': files,
+        'folders': len(folders),
+        'bytes': total_bytes,
+        'duplicate_names': collisions,
+        'depth': depth,
+        'fanout': fanout,
+        'seed': seed
+    }
+
+
+def add_arguments(parser):
+    """Add the tree shape options to an argparse parser"""
+    parser.add_argument('--files', type=int, default=10000)
+    parser.add_argument('--depth', type=int, default=2, help="folder levels below the root")
+    parser.add_argument('--fanout', type=int, default=5, help="subfolders per folder")
+    parser.add_argument('--extensions', type=parse_extensions,
+                        default=DEFAULT_EXTENSIONS,
+                        help="extension mix as ext:weight,... (default: a mixed set)")
+    parser.add_argument('--duplicate-names', type=float, default=0.05,
+                        help="fraction of files reusing an earlier name (default: %(default)s)")
+    parser.add_argument('--file-size', type=int, default=1024, help="average bytes per file")
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def tree_options(args):
+    """The make_tree keyword arguments from parsed add_arguments options"""
+    return {
+        'files': args.files,
+        'depth': args.depth,
+        'fanout': args.fanout,
+        'extensions': args.extensions,
+        'duplicate_names': args.duplicate_names,
+        'file_size': args.file_size,
+        'seed': args.seed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('root')
+    add_arguments(parser)
+    args = parser.parse_args()
+    print(json.dumps(make_tree(args.root, **tree_options(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,14 +2,36 @@
 """
 Build script for creating executable file
 Run this script to build the executable: python build_exe.py
+
+Profiles:
+    onefile  single AdvancedFileSorter.exe (default). Unpacks itself to a
+             temporary folder on every launch.
+    fast     AdvancedFileSorter folder with the executable next to its
+             libraries (onedir), so nothing is unpacked at startup, built
+             without UPX and without standard library packages the sorter
+             never uses. Has a console so scripts can run commands such as
+             "AdvancedFileSorter.exe sort D:\\Inbox" and read the JSON result.
+
+    python build_exe.py --profile fast
 """
 
 import os
 import sys
+import argparse
 import subprocess
 import shutil
 from pathlib import Path
 
+PROFILES = ('onefile', 'fast')
+
+# Standard library packages left out of the fast build; nothing in the
+# sorter imports them, but PyInstaller collects them through optional imports
+EXCLUDED_MODULES = [
+    'asyncio', 'distutils', 'doctest', 'email', 'http', 'idlelib', 'lib2to3',
+    'multiprocessing', 'pdb', 'pydoc', 'setuptools', 'pkg_resources', 'ssl',
+    'test', 'turtle', 'turtledemo', 'unittest', 'xmlrpc'
+]
+
 def run_command(command, description):
     """Run a command and handle errors"""
     print(f"🔄 {description}...")
@@ -22,9 +44,57 @@ def run_command(command, description):
         print(f"Error output: {e.stderr}")
         return False
 
+def pyinstaller_command(profile, console):
+    """The PyInstaller command line for a build profile"""
+    if profile == 'fast':
+        command = [
+            "pyinstaller",
+            "--onedir",  # No unpacking at startup
+            "--noupx",  # Compressed libraries are slower to load
+            "--console" if console else "--windowed",
+            "--name=AdvancedFileSorter",
+        ]
+        command.extend(f"--exclude-module={module}" for module in EXCLUDED_MODULES)
+        if os.name != 'nt':
+            command.append("--strip")
+    else:
+        command = [
+            "pyinstaller",
+            "--onefile",  # Create a single executable file
+            "--console" if console else "--windowed",  # GUI only by default
+            "--name=AdvancedFileSorter",
+            "--hidden-import=tkinter",
+            "--hidden-import=tkinter.ttk",
+            "--hidden-import=tkinter.filedialog",
+            "--hidden-import=tkinter.messagebox",
+            "--hidden-import=tkinter.scrolledtext",
+        ]
+    
+    # Add icon and settings file if they exist
+    if os.path.exists("icon.ico"):
+        command.append("--icon=icon.ico")
+    if os.path.exists("file_sorter_settings.json"):
+        command.append("--add-data=file_sorter_settings.json;.")
+    
+    command.append("fileSorter.py")
+    return command
+
 def main():
     """Main build function"""
-    print("🚀 Building Advanced File Sorter Executable")
+    parser = argparse.ArgumentParser(description="Build the Advanced File Sorter executable")
+    parser.add_argument('--profile', choices=PROFILES, default='onefile',
+                        help="onefile: one self-extracting file; fast: onedir build that "
+                             "starts quickly (default: %(default)s)")
+    console = parser.add_mutually_exclusive_group()
+    console.add_argument('--console', dest='console', action='store_true', default=None,
+                         help="show a console (default for the fast profile)")
+    console.add_argument('--windowed', dest='console', action='store_false',
+                         help="no console window (default for the onefile profile)")
+    args = parser.parse_args()
+    if args.console is None:
+        args.console = args.profile == 'fast'
+    
+    print(f"🚀 Building Advanced File Sorter Executable ({args.profile})")
     print("=" * 50)
     
     # Check if PyInstaller is installed
@@ -46,48 +116,35 @@ def main():
         shutil.rmtree("build")
     
     # Create the executable
-    pyinstaller_cmd = [
-        "pyinstaller",
-        "--onefile",  # Create a single executable file
-        "--windowed",  # Don't show console window (GUI app)
-        "--name=AdvancedFileSorter",
-        "--icon=icon.ico",  # Add icon if you have one
-        "--add-data=file_sorter_settings.json;.",  # Include settings file
-        "--hidden-import=tkinter",
-        "--hidden-import=tkinter.ttk",
-        "--hidden-import=tkinter.filedialog",
-        "--hidden-import=tkinter.messagebox",
-        "--hidden-import=tkinter.scrolledtext",
-        "fileSorter.py"
-    ]
-    
-    # Remove icon parameter if no icon file exists
-    if not os.path.exists("icon.ico"):
-        pyinstaller_cmd.remove("--icon=icon.ico")
-    
-    # Remove settings file parameter if it doesn't exist
-    if not os.path.exists("file_sorter_settings.json"):
-        pyinstaller_cmd.remove("--add-data=file_sorter_settings.json;.")
-    
-    command = " ".join(pyinstaller_cmd)
+    command = " ".join(pyinstaller_command(args.profile, args.console))
     
     if not run_command(command, "Building executable"):
         return False
     
     # Check if executable was created
-    exe_path = Path("dist/AdvancedFileSorter.exe")
+    exe_name = "AdvancedFileSorter.exe" if os.name == 'nt' else "AdvancedFileSorter"
+    if args.profile == 'fast':
+        exe_path = Path("dist/AdvancedFileSorter") / exe_name
+        download = "Download the `AdvancedFileSorter` folder and keep its files together"
+    else:
+        exe_path = Path("dist") / exe_name
+        download = "Download `AdvancedFileSorter.exe`"
     if exe_path.exists():
-        size_mb = exe_path.stat().st_size / (1024 * 1024)
+        if args.profile == 'fast':
+            size = sum(path.stat().st_size for path in exe_path.parent.rglob("*") if path.is_file())
+        else:
+            size = exe_path.stat().st_size
+        size_mb = size / (1024 * 1024)
         print(f"✅ Executable created successfully!")
         print(f"📁 Location: {exe_path.absolute()}")
         print(f"📊 Size: {size_mb:.1f} MB")
         
         # Create a simple README for the release
-        readme_content = """# Advanced File Sorter - Executable
+        readme_content = f"""# Advanced File Sorter - Executable
 
 ## How to Use
-1. Download `AdvancedFileSorter.exe`
-2. Double-click to run
+1. {download}
+2. Double-click `{exe_name}` to run
 3. Select a directory to sort
 4. Click "Preview Files" to see what will be sorted
 5. Click "Sort Files" to organize your files
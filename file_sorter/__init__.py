@@ -0,0 +1,5 @@
+"""Headless engine behind the Advanced File Sorter GUI and command line."""
+
+from .engine import SortEngine, DEFAULT_FILE_TYPES, SETTINGS_FILE
+
+__all__ = ['SortEngine', 'DEFAULT_FILE_TYPES', 'SETTINGS_FILE']
@@ -0,0 +1,175 @@
+"""Batch jobs: sort many directories in one run.
+
+A ``BatchJob`` takes a list of roots (one per user share, say) and sorts
+them with ``SortEngine.sort_directory``, several at a time. Two limits
+apply: at most ``max_roots`` sorts run at once, and at most
+``per_device`` of them on any one device, so roots on the same disk are
+sorted one after another instead of fighting over its heads while roots
+on other disks proceed. A root whose device is busy doesn't hold up the
+roots behind it in the list.
+
+Every root gets its own journal and operation record, so each one can be
+undone on its own; the records share a batch id and count as a single
+entry against the undo history limit.
+
+An ``OperationControl`` passed as ``control`` pauses or cancels all of
+the running sorts; once cancelled, no further roots are started and
+those left stay ``waiting``. A ``ProgressTracker`` passed as ``progress``
+is shared by the sorts, so it adds up the bytes, rates and ETA of all
+roots.
+"""
+
+import os
+import time
+import threading
+from datetime import datetime
+
+from .mover import device_of
+from .progress import rates
+
+DEFAULT_MAX_ROOTS = 4
+DEFAULT_PER_DEVICE = 1
+
+# Root states reported by BatchJob.progress()
+WAITING = 'waiting'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class BatchJob:
+    """Sort a list of directories under global and per-device concurrency limits"""
+
+    def __init__(self, engine, roots, create_folders=True, max_roots=DEFAULT_MAX_ROOTS,
+                 per_device=DEFAULT_PER_DEVICE, on_progress=None, on_root_done=None,
+                 control=None, progress=None):
+        self.engine = engine
+        # Keep the order, drop repeated roots
+        self.roots = list(dict.fromkeys(os.path.abspath(root) for root in roots))
+        self.create_folders = create_folders
+        self.max_roots = max(1, max_roots)
+        self.per_device = max(1, per_device)
+        self.on_progress = on_progress
+        self.on_root_done = on_root_done
+        self.control = control
+        self.tracker = progress
+        self.batch_id = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+
+        self._condition = threading.Condition()
+        self._state = {root: {'state': WAITING, 'moved': 0, 'found': 0} for root in self.roots}
+        self._results = {}
+        self._seconds = 0.0
+
+    def progress(self):
+        """Snapshot of the progress: totals plus a dict per root"""
+        with self._condition:
+            roots = {root: dict(state) for root, state in self._state.items()}
+        return {
+            'moved': sum(state['moved'] for state in roots.values()),
+            'found': sum(state['found'] for state in roots.values()),
+            'roots_done': sum(state['state'] in (DONE, FAILED) for state in roots.values()),
+            'roots_total': len(roots),
+            'roots': roots
+        }
+
+    def _root_progress(self, root):
+        def on_progress(moved, found):
+            with self._condition:
+                state = self._state[root]
+                state['moved'] = moved
+                state['found'] = found
+            if self.on_progress is not None:
+                self.on_progress(root, moved, found)
+        return on_progress
+
+    def _sort_root(self, root, device, running):
+        # What a BaseException (KeyboardInterrupt, SystemExit from a callback) leaves
+        result = {'error': "interrupted"}
+        state = FAILED
+        try:
+            result = self.engine.sort_directory(root, self.create_folders,
+                                                on_progress=self._root_progress(root),
+                                                batch=self.batch_id, control=self.control,
+                                                progress=self.tracker)
+            state = DONE
+        except Exception as e:
+            self.engine.log(f"Error sorting {root}: {e}")
+            result = {'error': str(e)}
+        finally:
+            # Free the device slot whatever happened, or run() waits forever
+            with self._condition:
+                self._results[root] = result
+                entry = self._state[root]
+                entry['state'] = state
+                if state == DONE:
+                    entry['moved'] = result['moved_files']
+                    entry['found'] = result['total_files']
+                running[device] -= 1
+                self._condition.notify_all()
+        if self.on_root_done is not None:
+            self.on_root_done(root, result)
+
+    def run(self):
+        """Sort every root; returns the totals and the result of each root"""
+        job_start = time.monotonic()
+        devices = {root: device_of(root) for root in self.roots}
+        waiting = list(self.roots)
+        # Device -> sorts running on it
+        running = {}
+        threads = []
+
+        with self._condition:
+            while waiting:
+                if self.control is not None and self.control.cancelled:
+                    break
+                started = None
+                if sum(running.values()) < self.max_roots:
+                    for root in waiting:
+                        device = devices[root]
+                        # Roots that can't be stat'ed get no device limit
+                        if device is None or running.get(device, 0) < self.per_device:
+                            started = root
+                            break
+                if started is None:
+                    self._condition.wait()
+                    continue
+
+                waiting.remove(started)
+                device = devices[started]
+                running[device] = running.get(device, 0) + 1
+                self._state[started]['state'] = RUNNING
+                thread = threading.Thread(target=self._sort_root,
+                                          args=(started, device, running), daemon=True)
+                threads.append(thread)
+                thread.start()
+
+        for thread in threads:
+            thread.join()
+        self._seconds = time.monotonic() - job_start
+
+        return self.result()
+
+    def result(self):
+        """Totals over all roots, and the result of each root in order"""
+        roots = []
+        totals = {'total_files': 0, 'moved_files': 0, 'skipped_files': 0,
+                  'duplicate_files': 0, 'errors': 0}
+        moved_bytes = 0
+        for root in self.roots:
+            result = self._results.get(root)
+            roots.append({'directory': root, 'result': result})
+            if result is None:
+                continue
+            if 'error' in result:
+                totals['errors'] += 1
+                continue
+            for key in ('total_files', 'moved_files', 'skipped_files', 'duplicate_files'):
+                totals[key] += result[key]
+            totals['errors'] += len(result['errors'])
+            moved_bytes += result['totals']['bytes']
+        # Rates over the wall time of the whole job, not the sum of the roots'
+        totals['totals'] = rates(totals['moved_files'], moved_bytes, self._seconds)
+        totals['batch'] = self.batch_id
+        totals['cancelled'] = self.control is not None and self.control.cancelled
+        totals['roots'] = roots
+        return totals
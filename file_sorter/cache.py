@@ -0,0 +1,111 @@
+"""Small persistent caches keyed by a file's identity.
+
+Content sniffing and duplicate hashing both derive something from a
+file's bytes that stays valid as long as the file isn't modified. A
+``StatCache`` keys such results by (device, inode, size, mtime), which a
+rename keeps, so a sorted file is never read again for the same answer.
+
+Entries are kept in least recently used order: the ones this process
+added or looked up go to the end when the cache is saved, and trimming
+drops from the front. A cache is only written when entries were added;
+lookups alone reorder it the next time. The file is read back before
+writing only when another process replaced it since it was loaded, and
+then the entries this process used are merged into it, so sorts running
+side by side don't throw away each other's entries.
+"""
+
+import os
+import json
+import threading
+
+# Entries kept on disk; the least recently used are dropped first
+MAX_CACHE_ENTRIES = 200000
+
+
+def stat_key(st):
+    """Cache key for a stat result"""
+    return f"{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+
+
+class StatCache:
+    """Dict of results keyed by stat_key, saved as one JSON file"""
+
+    def __init__(self, path=None, max_entries=MAX_CACHE_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+        # Entries added or hit since the last save, least recently used first
+        self._used = {}
+        # Whether any of them was added, which makes the cache worth writing
+        self._dirty = False
+        # Identity of the file as last read or written, to notice other writers
+        self._stamp = None
+        if path:
+            self._entries = self._read()
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _read(self):
+        """Entries in the file on disk; empty if it is missing or unreadable"""
+        self._stamp = self._file_stamp()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f).get('entries', {})
+        except (OSError, ValueError, AttributeError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is not None:
+            with self._lock:
+                self._used.pop(key, None)
+                self._used[key] = value
+        return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._used.pop(key, None)
+            self._used[key] = value
+            self._dirty = True
+
+    def save(self):
+        """Write the cache with what was used moved to the end, if anything was added"""
+        if not self.path or not self._dirty:
+            return
+        if self._file_stamp() != self._stamp:
+            # Another process saved since we loaded; keep its entries too
+            entries = self._read()
+        else:
+            entries = None
+        with self._lock:
+            used, self._used = self._used, {}
+            self._dirty = False
+            if entries is None:
+                entries = dict(self._entries)
+        for key, value in used.items():
+            entries.pop(key, None)
+            entries[key] = value
+        if len(entries) > self.max_entries:
+            keys = list(entries)[-self.max_entries:]
+            entries = {key: entries[key] for key in keys}
+        data = json.dumps({'entries': entries}, separators=(',', ':'))
+        with self._lock:
+            # Entries used while saving stay in _used for the next save
+            self._entries = dict(entries, **self._used)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Sorts running side by side may save the same cache
+        temp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(temp_path, self.path)
+        self._stamp = self._file_stamp()
@@ -0,0 +1,333 @@
+"""On-disk catalog of sorted files.
+
+The journal records the moves of the last few operations for undo, but
+finding one file again, or totalling the sorted files per category,
+means reading every journal or walking the tree. A ``Catalog`` keeps one
+SQLite row per moved file: where it came from, where it went, its
+category, size and mtime, and the operation that moved it. Indexes on
+the file name and the category make lookups and per-category totals a
+query instead of a scan.
+
+Sorts add rows from their move threads. Rows are buffered and written
+with ``executemany`` in one transaction per ``BATCH_SIZE`` files, and the
+database runs in WAL mode so a search from the GUI doesn't wait for a
+sort that is writing. Undo deletes the rows of the files it moves back,
+so the catalog only lists files that are still where a sort put them
+(unless they were moved by hand since). The catalog can also drive an
+undo on its own, after the operation's journal has been pruned; it keeps
+the folders a view created for that, as the journal does.
+
+The journal stays the crash-safe record: rows still buffered when the
+process dies are lost, a journal line is not.
+"""
+
+import os
+import sqlite3
+import threading
+
+from .progress import rates
+
+CATALOG_FILE = 'file_sorter_catalog.db'
+
+# Rows written per transaction
+BATCH_SIZE = 500
+
+# Seconds a writer waits for another one (a concurrent sort) to commit
+_BUSY_TIMEOUT = 30.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS operations (
+    id TEXT PRIMARY KEY,
+    timestamp TEXT,
+    directory TEXT,
+    batch TEXT,
+    view TEXT,
+    files INTEGER,
+    bytes INTEGER,
+    seconds REAL
+);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    operation TEXT NOT NULL,
+    name TEXT NOT NULL COLLATE NOCASE,
+    original TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    category TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS folders (
+    operation TEXT NOT NULL,
+    path TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS folders_operation ON folders(operation);
+CREATE INDEX IF NOT EXISTS files_name ON files(name);
+CREATE INDEX IF NOT EXISTS files_category ON files(category);
+CREATE INDEX IF NOT EXISTS files_operation ON files(operation);
+CREATE INDEX IF NOT EXISTS files_destination ON files(destination);
+"""
+
+_INSERT = ("INSERT INTO files (operation, name, original, destination, category, size, mtime_ns) "
+           "VALUES (?, ?, ?, ?, ?, ?, ?)")
+_DELETE = "DELETE FROM files WHERE destination = ? AND operation = ?"
+
+
+class CatalogError(Exception):
+    """The catalog database could not be opened, read or written"""
+
+
+def _storable(path):
+    """Whether path can be stored as SQLite text (no undecodable bytes)"""
+    try:
+        path.encode('utf-8')
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def _like_pattern(pattern):
+    """Translate a search into a LIKE pattern.
+
+    Plain text matches names starting with it, which the name index
+    answers directly; * and ? are wildcards anywhere in the name.
+    """
+    escaped = pattern.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    if '*' in pattern or '?' in pattern:
+        return escaped.replace('*', '%').replace('?', '_')
+    return escaped + '%'
+
+
+class Catalog:
+    """Connection to the catalog database; safe to use from many threads"""
+
+    def __init__(self, path, batch_size=BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._added = []
+        self._removed = []
+        # First error hit while flushing; later rows are dropped
+        self.error = None
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, timeout=_BUSY_TIMEOUT, isolation_level=None,
+                                       check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            # The journal, not the catalog, is what a crash must not lose
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_SCHEMA)
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(operations)")}
+            # Catalogs created before views and operation totals existed
+            for column, kind in (('view', 'TEXT'), ('files', 'INTEGER'), ('bytes', 'INTEGER'),
+                                 ('seconds', 'REAL')):
+                if column not in columns:
+                    self._db.execute(f"ALTER TABLE operations ADD COLUMN {column} {kind}")
+        except (OSError, sqlite3.Error) as e:
+            raise CatalogError(f"{path}: {e}") from None
+
+    def start_operation(self, operation):
+        """Register a sort operation before its files are added"""
+        directory = operation.get('directory')
+        if directory is not None:
+            directory = os.path.abspath(directory)
+        with self._lock:
+            try:
+                self._db.execute(
+                    "INSERT OR IGNORE INTO operations (id, timestamp, directory, batch, view) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (operation['id'], operation.get('timestamp'), directory,
+                     operation.get('batch'), operation.get('view')))
+            except sqlite3.Error as e:
+                self.error = self.error or e
+
+    def finish_operation(self, operation):
+        """Store the totals of a finished sort, for comparing runs over time"""
+        totals = operation.get('totals')
+        if not totals:
+            return
+        with self._lock:
+            try:
+                self._db.execute(
+                    "UPDATE operations SET files = ?, bytes = ?, seconds = ? WHERE id = ?",
+                    (totals['files'], totals['bytes'], totals['seconds'], operation['id']))
+            except sqlite3.Error as e:
+                self.error = self.error or e
+
+    def add_folders(self, operation_id, paths):
+        """Store folders a view operation created, so its undo can remove them"""
+        rows = [(operation_id, os.path.abspath(path)) for path in paths]
+        rows = [row for row in rows if _storable(row[1])]
+        with self._lock:
+            self._write_locked([("INSERT INTO folders (operation, path) VALUES (?, ?)", rows)])
+
+    def add(self, operation_id, original, destination, category, size, mtime_ns):
+        """Buffer the row of one moved file; written with the next full batch"""
+        # Absolute, so lookups and undo don't depend on the working directory
+        original = os.path.abspath(original)
+        destination = os.path.abspath(destination)
+        if not (_storable(original) and _storable(destination)):
+            return
+        row = (operation_id, os.path.basename(original), original, destination, category,
+               size, mtime_ns)
+        with self._lock:
+            self._added.append(row)
+            if len(self._added) >= self.batch_size:
+                self._flush_locked()
+
+    def remove(self, operation_id, destination):
+        """Buffer the removal of a file that was moved back by an undo"""
+        destination = os.path.abspath(destination)
+        if not _storable(destination):
+            return
+        with self._lock:
+            self._removed.append((destination, operation_id))
+            if len(self._removed) >= self.batch_size:
+                self._flush_locked()
+
+    def _write_locked(self, statements):
+        """Run [(sql, rows)] with executemany in one transaction"""
+        if self.error is not None:
+            return
+        try:
+            self._db.execute("BEGIN")
+            try:
+                for sql, rows in statements:
+                    self._db.executemany(sql, rows)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+        except sqlite3.Error as e:
+            self.error = e
+
+    def _flush_locked(self):
+        statements = [(sql, rows) for sql, rows in ((_INSERT, self._added),
+                                                    (_DELETE, self._removed)) if rows]
+        self._added, self._removed = [], []
+        if statements:
+            self._write_locked(statements)
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def forget_operation(self, operation_id):
+        """Drop an operation that was undone completely"""
+        with self._lock:
+            self._flush_locked()
+            self._write_locked([("DELETE FROM files WHERE operation = ?", [(operation_id,)]),
+                                ("DELETE FROM folders WHERE operation = ?", [(operation_id,)]),
+                                ("DELETE FROM operations WHERE id = ?", [(operation_id,)])])
+
+    def save(self):
+        """Write buffered rows and close; raises CatalogError if any write failed"""
+        with self._lock:
+            self._flush_locked()
+            self._db.close()
+        if self.error is not None:
+            raise CatalogError(f"{self.path}: {self.error}")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _query(self, sql, parameters=()):
+        with self._lock:
+            try:
+                return self._db.execute(sql, parameters).fetchall()
+            except sqlite3.Error as e:
+                raise CatalogError(f"{self.path}: {e}") from None
+
+    def search(self, pattern, category=None, limit=100):
+        """Files whose name matches pattern (see _like_pattern), newest first"""
+        sql = ("SELECT f.name, f.original, f.destination, f.category, f.size, f.mtime_ns, "
+               "f.operation, o.timestamp FROM files f LEFT JOIN operations o ON o.id = f.operation "
+               "WHERE f.name LIKE ? ESCAPE '\\'")
+        parameters = [_like_pattern(pattern)]
+        if category:
+            sql += " AND f.category = ?"
+            parameters.append(category)
+        sql += " ORDER BY f.id DESC LIMIT ?"
+        parameters.append(int(limit))
+        keys = ('name', 'original', 'destination', 'category', 'size', 'mtime_ns',
+                'operation', 'sorted_at')
+        return [dict(zip(keys, row)) for row in self._query(sql, parameters)]
+
+    def category_totals(self, directory=None):
+        """{category: {'files', 'bytes'}} of the catalogued files, optionally of one directory"""
+        if directory is None:
+            rows = self._query("SELECT category, COUNT(*), SUM(size) FROM files GROUP BY category")
+        else:
+            rows = self._query(
+                "SELECT f.category, COUNT(*), SUM(f.size) FROM files f "
+                "JOIN operations o ON o.id = f.operation WHERE o.directory = ? "
+                "GROUP BY f.category", (os.path.abspath(directory),))
+        return {category: {'files': files, 'bytes': size or 0}
+                for category, files, size in rows}
+
+    def operations(self, operation_id=None):
+        """Catalogued operations with their file counts, oldest first.
+
+        moved_files counts the files still catalogued; 'totals' are those of
+        the sort itself (files, bytes, seconds and rates), where recorded.
+        """
+        sql = ("SELECT o.id, o.timestamp, o.directory, o.batch, o.view, o.files, o.bytes, "
+               "o.seconds, COUNT(f.id) FROM operations o LEFT JOIN files f ON f.operation = o.id")
+        parameters = ()
+        if operation_id is not None:
+            sql += " WHERE o.id = ?"
+            parameters = (operation_id,)
+        rows = self._query(sql + " GROUP BY o.id ORDER BY o.id", parameters)
+        operations = []
+        for operation, timestamp, directory, batch, view, *totals, files in rows:
+            operations.append({'id': operation, 'timestamp': timestamp, 'directory': directory,
+                               'batch': batch, 'moved_files': files})
+            if view:
+                operations[-1]['view'] = view
+            if totals[-1] is not None:
+                # Files, bytes and seconds of the sort
+                operations[-1]['totals'] = rates(*totals)
+        return operations
+
+    def operation(self, operation_id):
+        """The operation dict of one catalogued operation, or None"""
+        operations = self.operations(operation_id)
+        return operations[0] if operations else None
+
+    def folders(self, operation_id):
+        """Folders recorded with add_folders for an operation, in the order created"""
+        return [path for path, in self._query(
+            "SELECT path FROM folders WHERE operation = ? ORDER BY rowid", (operation_id,))]
+
+    def count(self, operation_id):
+        return self._query("SELECT COUNT(*) FROM files WHERE operation = ?",
+                           (operation_id,))[0][0]
+
+    def size(self, operation_id):
+        """Bytes of the files of an operation still catalogued"""
+        return self._query("SELECT COALESCE(SUM(size), 0) FROM files WHERE operation = ?",
+                           (operation_id,))[0][0]
+
+    def iter_moves_reversed(self, operation_id, chunk=BATCH_SIZE):
+        """Yield (original, destination) of an operation's files, newest first.
+
+        Rows are read a chunk at a time, so the caller can remove the ones
+        it moved back while iterating.
+        """
+        before = None
+        while True:
+            if before is None:
+                rows = self._query(
+                    "SELECT id, original, destination FROM files WHERE operation = ? "
+                    "ORDER BY id DESC LIMIT ?", (operation_id, chunk))
+            else:
+                rows = self._query(
+                    "SELECT id, original, destination FROM files WHERE operation = ? AND id < ? "
+                    "ORDER BY id DESC LIMIT ?", (operation_id, before, chunk))
+            if not rows:
+                return
+            for _, original, destination in rows:
+                yield original, destination
+            before = rows[-1][0]
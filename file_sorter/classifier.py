@@ -0,0 +1,73 @@
+"""Extension based file classification.
+
+``ExtensionIndex`` compiles the category -> extensions mapping from the
+settings into a single suffix -> category dict, so classifying a file is a
+couple of dict lookups no matter how many categories are configured.
+"""
+
+import os
+
+DEFAULT_CATEGORY = 'Other'
+
+
+def normalize_extension(extension):
+    """Lower-case an extension and make sure it starts with a dot"""
+    extension = extension.strip().lower()
+    if extension and not extension.startswith('.'):
+        extension = '.' + extension
+    return extension
+
+
+class ExtensionIndex:
+    """Precomputed suffix -> category lookup table.
+
+    Compound suffixes such as ``.tar.gz`` are supported; the longest
+    configured suffix of a name wins. When an extension is listed under
+    more than one category the first category keeps it (the same result the
+    old linear scan gave) and the clash is recorded in ``conflicts`` as
+    ``(extension, kept_category, ignored_category)`` tuples.
+    """
+
+    def __init__(self, file_types, default=DEFAULT_CATEGORY):
+        self.default = default
+        self.suffixes = {}
+        self.conflicts = []
+        # Largest number of dot separated parts in a configured suffix
+        self.max_parts = 1
+
+        for category, extensions in file_types.items():
+            for extension in extensions:
+                extension = normalize_extension(extension)
+                if not extension:
+                    continue
+                owner = self.suffixes.get(extension)
+                if owner is None:
+                    self.suffixes[extension] = category
+                    self.max_parts = max(self.max_parts, extension.count('.'))
+                elif owner != category:
+                    self.conflicts.append((extension, owner, category))
+
+    def category_for_name(self, name):
+        """Return the category for a bare file name"""
+        base = name.lower().lstrip('.')  # '.bashrc' has no suffix
+
+        # Collect up to max_parts dot positions from the right
+        dots = []
+        pos = len(base)
+        for _ in range(self.max_parts):
+            pos = base.rfind('.', 0, pos)
+            if pos <= 0:
+                break
+            dots.append(pos)
+
+        # Longest suffix first
+        suffixes = self.suffixes
+        for pos in reversed(dots):
+            category = suffixes.get(base[pos:])
+            if category is not None:
+                return category
+        return self.default
+
+    def category_for_path(self, file_path):
+        """Return the category for a full file path"""
+        return self.category_for_name(os.path.basename(file_path))
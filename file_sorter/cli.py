@@ -0,0 +1,401 @@
+"""Command line interface: python -m file_sorter {preview,sort,apply,watch,undo,find} ...
+
+Every command prints a single JSON document on stdout so the sorter can be
+driven from scripts; log messages go to stderr. watch runs until it is
+interrupted and prints one JSON line per sorted batch.
+
+Ctrl+C during preview, sort, apply, batch, undo or recover cancels the
+operation after the current file: the moves made so far are committed
+and the command exits with status 130. A second Ctrl+C stops at once.
+With --progress those commands also print the bytes done, the throughput
+and the time left to stderr every few seconds.
+"""
+
+import os
+import sys
+import json
+import signal
+import argparse
+import threading
+
+from .batch import BatchJob, DEFAULT_MAX_ROOTS, DEFAULT_PER_DEVICE
+from .compact import json_default
+from .control import OperationControl
+from .engine import SortEngine, SETTINGS_FILE
+from .dedup import DEDUP_MODES
+from .metrics import PROFILE_MODES
+from .plan import MovePlan
+from .progress import ProgressTracker, describe
+from .sniffer import SNIFF_MODES
+from .view import VIEW_MODES
+from .watcher import SortWatcher, DEFAULT_SETTLE, open_source
+
+
+def _stderr_log(message):
+    print(message, file=sys.stderr)
+
+
+def _emit(data):
+    json.dump(data, sys.stdout, indent=2, default=json_default)
+    sys.stdout.write("\n")
+
+
+def _cancel_on_interrupt(control, log):
+    """Make the first Ctrl+C cancel control instead of raising KeyboardInterrupt"""
+    if threading.current_thread() is not threading.main_thread():
+        return
+
+    def handler(signum, frame):
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        log("Cancelling after the current file; press Ctrl+C again to stop at once")
+        control.cancel()
+    signal.signal(signal.SIGINT, handler)
+
+
+# Seconds between --progress lines
+PROGRESS_INTERVAL = 2.0
+
+
+def _print_progress(progress, stop, interval=PROGRESS_INTERVAL):
+    """Print a status line for progress to stderr every interval seconds until stop is set"""
+    last = None
+    while not stop.wait(interval):
+        snapshot = progress.snapshot()
+        done = (snapshot['files_done'], snapshot['files_total'])
+        if snapshot['files_total'] and done != last:
+            last = done
+            print(f"{snapshot['fraction']:.0%} - {describe(snapshot)}", file=sys.stderr)
+
+
+def _exit_status(result):
+    if result.get('cancelled'):
+        return 130
+    return 1 if result['errors'] else 0
+
+
+def _trim_result(result):
+    """Make a sort result printable: round timings, leave out the move list"""
+    for totals in result['strategies'].values():
+        totals['seconds'] = round(totals['seconds'], 6)
+    result['operation'] = {key: value for key, value in result['operation'].items()
+                           if key != 'moves'}
+    return result
+
+
+def build_parser():
+    """Build the argument parser for the file-sorter command"""
+    parser = argparse.ArgumentParser(
+        prog='file-sorter-cli',
+        description="Sort files into category folders without the GUI.")
+    parser.add_argument('--settings', default=SETTINGS_FILE,
+                        help="settings JSON file (default: %(default)s)")
+    parser.add_argument('--quiet', action='store_true',
+                        help="don't print log messages to stderr")
+    parser.add_argument('--sniff', choices=SNIFF_MODES,
+                        help="classify by file contents too: for files with unknown "
+                             "extensions, or for all files (default: the setting)")
+    parser.add_argument('--dedup', choices=DEDUP_MODES,
+                        help="what to do with files identical to one already in their "
+                             "category folder (default: the setting)")
+    parser.add_argument('--timings', action='store_true',
+                        help="time the phases of each operation and include the report")
+    parser.add_argument('--profile', choices=PROFILE_MODES,
+                        help="run cProfile (cpu) or tracemalloc (memory) during each "
+                             "operation (default: the setting)")
+    parser.add_argument('--scan-workers', type=int, metavar='N',
+                        help="threads listing directories; more help on network shares "
+                             "(default: the setting)")
+    parser.add_argument('--unordered', action='store_true',
+                        help="with several scan workers, take folders in the order their "
+                             "listings complete instead of a fixed order")
+    parser.add_argument('--view', choices=VIEW_MODES,
+                        help="leave files in place and build the category folders from "
+                             "symlinks, hard links or reflink copies (default: the setting)")
+    parser.add_argument('--catalog', action='store_true',
+                        help="record sorted files in the file catalog (default: the setting)")
+    parser.add_argument('--progress', action='store_true',
+                        help="print the bytes done, files/s, MB/s and time left to stderr "
+                             "while sorting or undoing")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    preview = commands.add_parser('preview', help="show what would be moved")
+    preview.add_argument('directory')
+    preview.add_argument('--samples', type=int, default=10,
+                         help="file names listed per category (default: %(default)s)")
+    preview.add_argument('--full', action='store_true',
+                         help="list every folder again instead of trusting the scan snapshot")
+    preview.add_argument('--save-plan', metavar='FILE',
+                         help="write the planned moves to FILE for 'apply'")
+
+    sort = commands.add_parser('sort', help="move files into category folders")
+    sort.add_argument('directory')
+    sort.add_argument('--no-create-folders', action='store_true',
+                      help="only move into category folders that already exist")
+    sort.add_argument('--record', metavar='FILE',
+                      help="write the operation record to FILE for a later undo")
+    sort.add_argument('--full', action='store_true',
+                      help="list every folder again instead of trusting the scan snapshot")
+
+    apply = commands.add_parser('apply', help="make the moves of a plan saved by 'preview'")
+    apply.add_argument('plan', metavar='FILE')
+    apply.add_argument('--no-create-folders', action='store_true',
+                       help="only move into category folders that already exist")
+    apply.add_argument('--record', metavar='FILE',
+                       help="write the operation record to FILE for a later undo")
+
+    batch = commands.add_parser('batch', help="sort several directories in one job")
+    batch.add_argument('directories', metavar='DIR', nargs='*')
+    batch.add_argument('--roots-file', metavar='FILE',
+                       help="file with one directory per line, added to the DIRs")
+    batch.add_argument('--no-create-folders', action='store_true',
+                       help="only move into category folders that already exist")
+    batch.add_argument('--max-roots', type=int, default=DEFAULT_MAX_ROOTS,
+                       help="directories sorted at the same time (default: %(default)s)")
+    batch.add_argument('--per-device', type=int, default=DEFAULT_PER_DEVICE,
+                       help="directories sorted at the same time on one disk "
+                            "(default: %(default)s)")
+
+    watch = commands.add_parser('watch', help="keep sorting files as they arrive")
+    watch.add_argument('directory')
+    watch.add_argument('--no-create-folders', action='store_true',
+                       help="only move into category folders that already exist")
+    watch.add_argument('--settle', type=float, default=DEFAULT_SETTLE,
+                       help="seconds a file must be left alone before it is moved "
+                            "(default: %(default)s)")
+    watch.add_argument('--no-initial-sort', action='store_true',
+                       help="leave files that are already there alone")
+    watch.add_argument('--poll', action='store_true',
+                       help="list folders periodically instead of using inotify")
+
+    undo = commands.add_parser('undo', help="undo the last sort, or the one in an operation record")
+    undo.add_argument('record', metavar='FILE', nargs='?',
+                      help="operation record written by 'sort --record' "
+                           "(default: the last journaled operation)")
+    undo.add_argument('--operation', metavar='ID',
+                      help="undo this operation from the history, or from the file catalog "
+                           "once its journal is gone")
+
+    find = commands.add_parser('find', help="look sorted files up in the file catalog")
+    find.add_argument('pattern',
+                      help="start of the file name, or a pattern with * and ? wildcards")
+    find.add_argument('--category', help="only files sorted into this category")
+    find.add_argument('--limit', type=int, default=100,
+                      help="most files listed, newest first (default: %(default)s)")
+
+    stats = commands.add_parser('stats', help="files and bytes per category from the file catalog")
+    stats.add_argument('directory', nargs='?',
+                       help="only files sorted out of this directory (default: all)")
+
+    commands.add_parser('history', help="list journaled operations")
+
+    recover = commands.add_parser('recover', help="deal with sorts that were interrupted")
+    recover.add_argument('action', choices=['rollback', 'resume', 'keep'],
+                         help="move the files back, finish the sort, or keep the "
+                              "partial sort as an undoable operation")
+
+    return parser
+
+
+def main(argv=None):
+    """Entry point for python -m file_sorter and the file-sorter-cli script"""
+    args = build_parser().parse_args(argv)
+    engine = SortEngine(settings_file=args.settings,
+                        log=None if args.quiet else _stderr_log)
+    if args.sniff:
+        engine.sniff_content = args.sniff
+    if args.dedup:
+        engine.dedup = args.dedup
+    if args.timings:
+        engine.timings = True
+    if args.profile:
+        engine.profile = args.profile
+    if args.scan_workers:
+        engine.scan_workers = max(1, args.scan_workers)
+    if args.unordered:
+        engine.scan_ordered = False
+    if args.catalog:
+        engine.catalog = True
+    if args.view:
+        engine.view = args.view
+
+    if args.command in ('preview', 'sort', 'watch') and not os.path.isdir(args.directory):
+        _emit({'error': f"Not a directory: {args.directory}"})
+        return 2
+    if getattr(args, 'directory', None):
+        # Journals, plans and the catalog must not depend on the working directory
+        args.directory = os.path.abspath(args.directory)
+
+    control = OperationControl()
+    if args.command != 'watch':
+        _cancel_on_interrupt(control, engine.log)
+
+    progress = ProgressTracker()
+    stop = threading.Event()
+    if args.progress:
+        threading.Thread(target=_print_progress, args=(progress, stop), daemon=True).start()
+    try:
+        return _run_command(args, engine, control, progress)
+    finally:
+        stop.set()
+
+
+def _run_command(args, engine, control, progress):
+    """Run the parsed command; returns the exit status"""
+    if args.command == 'preview':
+        plan = engine.plan(args.directory, samples=args.samples, full_rescan=args.full,
+                           control=control)
+        if control.cancelled:
+            _emit(plan.summary)
+            return 130
+        if args.save_plan:
+            plan.save(args.save_plan)
+        _emit(plan.summary)
+        return 0
+
+    if args.command == 'sort':
+        result = engine.sort_directory(args.directory,
+                                       create_folders=not args.no_create_folders,
+                                       full_rescan=args.full, control=control, progress=progress)
+        if args.record and result['moved_files']:
+            with open(args.record, 'w') as f:
+                json.dump(result['operation'], f, default=json_default)
+        _emit(_trim_result(result))
+        return _exit_status(result)
+
+    if args.command == 'apply':
+        try:
+            plan = MovePlan.load(args.plan)
+        except (OSError, ValueError) as e:
+            _emit({'error': f"Could not read plan: {e}"})
+            return 2
+        result = engine.execute_plan(plan, create_folders=not args.no_create_folders,
+                                     control=control, progress=progress)
+        if args.record and result['moved_files']:
+            with open(args.record, 'w') as f:
+                json.dump(result['operation'], f, default=json_default)
+        _emit(_trim_result(result))
+        return _exit_status(result)
+
+    if args.command == 'batch':
+        roots = list(args.directories)
+        if args.roots_file:
+            try:
+                with open(args.roots_file, 'r') as f:
+                    roots.extend(line.strip() for line in f if line.strip())
+            except OSError as e:
+                _emit({'error': f"Could not read roots file: {e}"})
+                return 2
+        missing = [root for root in roots if not os.path.isdir(root)]
+        if not roots or missing:
+            _emit({'error': f"Not a directory: {', '.join(missing)}" if missing
+                   else "No directories given"})
+            return 2
+
+        def log_root(root, result):
+            if 'error' not in result:
+                engine.log(f"{root}: moved {result['moved_files']} of "
+                           f"{result['total_files']} files")
+
+        job = BatchJob(engine, roots, create_folders=not args.no_create_folders,
+                       max_roots=args.max_roots, per_device=args.per_device,
+                       on_root_done=log_root, control=control, progress=progress)
+        result = job.run()
+        for root in result['roots']:
+            if root['result'] and 'error' not in root['result']:
+                _trim_result(root['result'])
+        _emit(result)
+        return _exit_status(result)
+
+    if args.command == 'watch':
+        def emit_batch(result):
+            if result['moved_files'] or result['errors']:
+                summary = {key: result[key] for key in
+                           ('total_files', 'moved_files', 'skipped_files', 'errors')}
+                sys.stdout.write(json.dumps(summary) + "\n")
+                sys.stdout.flush()
+
+        watcher = SortWatcher(engine, args.directory,
+                              create_folders=not args.no_create_folders,
+                              settle=args.settle, source=open_source(args.poll),
+                              on_batch=emit_batch)
+        try:
+            watcher.run(threading.Event(), initial_sort=not args.no_initial_sort)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if args.command == 'undo':
+        if args.operation:
+            from .catalog import CatalogError
+            try:
+                result = engine.undo_operation_id(args.operation, control=control,
+                                                  progress=progress)
+            except CatalogError as e:
+                _emit({'error': f"Could not read file catalog: {e}"})
+                return 2
+            if result is None:
+                _emit({'error': f"No operation {args.operation}"})
+                return 2
+        elif args.record:
+            try:
+                with open(args.record, 'r') as f:
+                    operation = json.load(f)
+            except (OSError, ValueError) as e:
+                _emit({'error': f"Could not read operation record: {e}"})
+                return 2
+            result = engine.undo_operation(operation, control=control, progress=progress)
+            if (result['cancelled'] or result['errors']) and result['moved_back']:
+                # Let the next undo of this record continue where this one stopped
+                with open(args.record, 'w') as f:
+                    json.dump(operation, f, default=json_default)
+        else:
+            result = engine.undo_last_operation(control=control, progress=progress)
+            if result is None:
+                _emit({'error': "No operations to undo"})
+                return 2
+        _emit(result)
+        return _exit_status(result)
+
+    if args.command in ('find', 'stats'):
+        from .catalog import CatalogError
+        try:
+            if args.command == 'find':
+                _emit({'files': engine.find_sorted_files(args.pattern, args.category, args.limit)})
+            else:
+                operations = engine.catalog_operations()
+                if args.directory:
+                    directory = os.path.abspath(args.directory)
+                    operations = [operation for operation in operations
+                                  if operation['directory'] == directory]
+                _emit({'categories': engine.catalog_totals(args.directory),
+                       'operations': operations})
+        except CatalogError as e:
+            _emit({'error': f"Could not read file catalog: {e}"})
+            return 2
+        return 0
+
+    if args.command == 'history':
+        _emit({'operations': engine.operation_history,
+               'interrupted': engine.interrupted_operations})
+        return 0
+
+    if args.command == 'recover':
+        results = []
+        for operation in list(engine.interrupted_operations):
+            if control.cancelled:
+                break
+            if args.action == 'rollback':
+                result = engine.rollback_interrupted(operation, control=control,
+                                                     progress=progress)
+            elif args.action == 'resume':
+                result = _trim_result(engine.resume_operation(operation, control=control,
+                                                              progress=progress))
+            else:
+                result = engine.close_interrupted(operation)
+            results.append(result)
+        _emit({'recovered': results})
+        if control.cancelled:
+            return 130
+        return 1 if any(result.get('errors') for result in results) else 0
+
+    return 2
@@ -0,0 +1,240 @@
+"""Compact containers for per-file data of large sorts.
+
+A list of full path strings costs well over 100 bytes per file, and a
+dict per move several hundred, which adds up to gigabytes at a few
+million files. The containers here store each directory path once in a
+``DirectoryTable`` and keep, per file, only its base name, packed with
+the others into one ``NameBuffer``, plus small integers in ``array``
+buffers: a directory id, a category id, a size.
+
+``FileTable`` holds scan results grouped by category and ``MoveRecords``
+the moves of an operation kept in memory (sorts without a journal).
+``MovePlan`` uses the same layout. All of them rebuild full paths only
+when they are read.
+"""
+
+import os
+import sys
+from array import array
+from collections.abc import Mapping
+
+
+class DirectoryTable:
+    """Interned directory paths, numbered in the order they were first seen"""
+
+    __slots__ = ('paths', '_ids')
+
+    def __init__(self, paths=()):
+        self.paths = []
+        self._ids = {}
+        for path in paths:
+            self.id(path)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, directory_id):
+        return self.paths[directory_id]
+
+    def id(self, path):
+        """Return the id of path, adding it if it's new"""
+        directory_id = self._ids.get(path)
+        if directory_id is None:
+            directory_id = self._ids[path] = len(self.paths)
+            self.paths.append(path)
+        return directory_id
+
+
+class NameBuffer:
+    """File names packed end to end in one bytearray.
+
+    A str object costs about 50 bytes before its first character; here a
+    name costs its encoded length plus a 4 byte end offset. Names are
+    encoded like os.fsencode, so undecodable names round-trip.
+    """
+
+    __slots__ = ('_data', '_ends')
+
+    _encoding = sys.getfilesystemencoding()
+    _errors = sys.getfilesystemencodeerrors()
+
+    def __init__(self):
+        self._data = bytearray()
+        self._ends = array('I')
+
+    def append(self, name):
+        self._data += name.encode(self._encoding, self._errors)
+        try:
+            self._ends.append(len(self._data))
+        except OverflowError:
+            # Past 4 GiB of names; widen the offsets once
+            self._ends = array('Q', self._ends)
+            self._ends.append(len(self._data))
+
+    def __len__(self):
+        return len(self._ends)
+
+    def __getitem__(self, index):
+        start = self._ends[index - 1] if index > 0 else 0
+        return self._data[start:self._ends[index]].decode(self._encoding, self._errors)
+
+    def __iter__(self):
+        data = self._data
+        encoding = self._encoding
+        errors = self._errors
+        start = 0
+        for end in self._ends:
+            yield data[start:end].decode(encoding, errors)
+            start = end
+
+
+class NameTable:
+    """Small table of repeated strings (categories, strategies) stored as ids"""
+
+    __slots__ = ('names', '_ids', 'ids')
+
+    def __init__(self, typecode='B'):
+        self.names = []
+        self._ids = {}
+        self.ids = array(typecode)
+
+    def append(self, name):
+        name_id = self._ids.get(name)
+        if name_id is None:
+            name_id = self._ids[name] = len(self.names)
+            self.names.append(name)
+            if name_id >= 1 << (8 * self.ids.itemsize):
+                # More distinct names than the typecode holds; widen once
+                self.ids = array('I', self.ids)
+        self.ids.append(name_id)
+
+    def __getitem__(self, index):
+        return self.names[self.ids[index]]
+
+
+class FileTable(Mapping):
+    """Scan results: category -> file paths, stored compactly.
+
+    As a mapping it behaves like the dict of path lists scan_directory
+    used to return; the list for a category is built when it is asked for.
+    """
+
+    def __init__(self):
+        self.directories = DirectoryTable()
+        self._directory_ids = array('I')
+        self._names = NameBuffer()
+        self._categories = NameTable('H')
+
+    def add(self, directory, name, category):
+        self._directory_ids.append(self.directories.id(directory))
+        self._names.append(name)
+        self._categories.append(category)
+
+    @property
+    def total_files(self):
+        return len(self._names)
+
+    def iter_files(self):
+        """Yield (path, category) for every file, in the order they were added"""
+        join = os.path.join
+        directories = self.directories.paths
+        categories = self._categories
+        for index, name in enumerate(self._names):
+            yield join(directories[self._directory_ids[index]], name), categories[index]
+
+    def counts(self):
+        """Number of files per category"""
+        names = self._categories.names
+        counts = dict.fromkeys(names, 0)
+        for category_id in self._categories.ids:
+            counts[names[category_id]] += 1
+        return counts
+
+    def __getitem__(self, category):
+        try:
+            category_id = self._categories.names.index(category)
+        except ValueError:
+            raise KeyError(category)
+        join = os.path.join
+        directories = self.directories.paths
+        return [join(directories[self._directory_ids[index]], name)
+                for index, (name, file_category) in enumerate(zip(self._names,
+                                                                  self._categories.ids))
+                if file_category == category_id]
+
+    def __iter__(self):
+        return iter(self._categories.names)
+
+    def __len__(self):
+        return len(self._categories.names)
+
+
+class MoveRecords:
+    """Moves of an operation as {'from', 'to', 'strategy', 'bytes'} records.
+
+    Appending stores two directory ids, a base name, the size and a
+    strategy id; the destination name is only stored when it differs from
+    the source name. Items are rebuilt as dicts when read, so undo and
+    JSON output see the same records as before.
+    """
+
+    def __init__(self, moves=()):
+        self._directories = DirectoryTable()
+        self._sources = array('I')
+        self._targets = array('I')
+        self._names = NameBuffer()
+        # Index -> destination name, for moves that renamed the file
+        self._renamed = {}
+        self._strategies = NameTable()
+        self._sizes = array('Q')
+        for move in moves:
+            self.append(move['from'], move['to'], move.get('strategy'), move.get('bytes', 0))
+
+    def append(self, source, destination, strategy, size):
+        source_dir, name = os.path.split(source)
+        target_dir, target_name = os.path.split(destination)
+        if target_name != name:
+            self._renamed[len(self._names)] = target_name
+        self._sources.append(self._directories.id(source_dir))
+        self._targets.append(self._directories.id(target_dir))
+        self._names.append(name)
+        self._strategies.append(strategy)
+        self._sizes.append(size)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self._names)
+        if not 0 <= index < len(self._names):
+            raise IndexError("move index out of range")
+        directories = self._directories.paths
+        name = self._names[index]
+        return {
+            'from': os.path.join(directories[self._sources[index]], name),
+            'to': os.path.join(directories[self._targets[index]],
+                               self._renamed.get(index, name)),
+            'strategy': self._strategies[index],
+            'bytes': self._sizes[index]
+        }
+
+    def __iter__(self):
+        for index in range(len(self._names)):
+            yield self[index]
+
+    def __reversed__(self):
+        for index in range(len(self._names) - 1, -1, -1):
+            yield self[index]
+
+    def to_list(self):
+        return list(self)
+
+
+def json_default(value):
+    """``default`` hook for json.dump that writes the containers as lists"""
+    if isinstance(value, MoveRecords):
+        return value.to_list()
+    if isinstance(value, FileTable):
+        return {category: value[category] for category in value}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,48 @@
+"""Pausing and cancelling long-running operations.
+
+An ``OperationControl`` is handed to a sort, plan, undo or batch job. The
+loops of the operation call ``checkpoint()`` between files (and the scan
+between directories): it blocks while the operation is paused and tells
+the loop to stop once it is cancelled. A file that is being moved is
+always finished first, so a cancelled sort ends with every file either
+moved and journaled or left where it was; the moves made so far are
+committed as a normal operation that can be undone.
+"""
+
+import threading
+
+
+class OperationControl:
+    """Pause/cancel token shared by the caller and one or more running operations"""
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+        # Set while the operation may run; cleared by pause()
+        self._running = threading.Event()
+        self._running.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def cancel(self):
+        """Stop at the next checkpoint; wakes a paused operation so it can stop"""
+        self._cancelled.set()
+        self._running.set()
+
+    def pause(self):
+        if not self._cancelled.is_set():
+            self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def checkpoint(self):
+        """Wait while paused; return True if the operation should stop now"""
+        if not self._running.is_set():
+            self._running.wait()
+        return self._cancelled.is_set()
@@ -0,0 +1,161 @@
+"""Duplicate detection for files being sorted into a category folder.
+
+Without it an identical file only gets a ``name_1.ext`` and the bytes are
+stored twice. A ``DuplicateFinder`` checks every file against the files
+of its destination folder in stages, each cheaper than the next is
+expensive:
+
+1. size: only files of the same size can be equal; the folder is indexed
+   by size once, from a single scandir, the first time a file goes there
+2. partial hash: BLAKE2b of the first and last 64 KB
+3. full hash: BLAKE2b of the whole file, streamed in 1 MB reads, only
+   when the partial hashes match
+
+Hashes are cached by (device, inode, size, mtime) in the same way as the
+content sniffer's results, so the files of a category folder are hashed
+once, not on every run.
+
+What happens to a duplicate is up to the caller (see ``DEDUP_MODES``).
+"""
+
+import os
+import threading
+
+from .cache import StatCache, stat_key
+
+DEDUP_MODES = ('off', 'skip', 'hardlink', 'quarantine')
+DEFAULT_DEDUP_MODE = 'off'
+HASH_CACHE_FILE = 'hash_cache.json'
+# Folder below the sorted directory that receives quarantined duplicates
+DUPLICATES_FOLDER = 'Duplicates'
+
+PARTIAL_BYTES = 64 * 1024
+HASH_CHUNK = 1024 * 1024
+
+
+def _open(path):
+    return os.open(path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+
+
+def _read_at(fd, size, offset):
+    """os.pread, or a seek and a read where there is none (Windows)"""
+    if hasattr(os, 'pread'):
+        return os.pread(fd, size, offset)
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, size)
+
+
+def partial_hash(path, size):
+    """BLAKE2b of the first and last PARTIAL_BYTES of path"""
+    import hashlib
+    digest = hashlib.blake2b(digest_size=16)
+    fd = _open(path)
+    try:
+        digest.update(_read_at(fd, PARTIAL_BYTES, 0))
+        if size > PARTIAL_BYTES:
+            tail = max(PARTIAL_BYTES, size - PARTIAL_BYTES)
+            digest.update(_read_at(fd, size - tail, tail))
+    finally:
+        os.close(fd)
+    return digest.hexdigest()
+
+
+def full_hash(path):
+    """BLAKE2b of the whole of path"""
+    import hashlib
+    digest = hashlib.blake2b()
+    buffer = bytearray(HASH_CHUNK)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                break
+            digest.update(view[:count])
+    return digest.hexdigest()
+
+
+class DuplicateFinder:
+    """Finds files already in a folder with the same contents; thread-safe"""
+
+    def __init__(self, cache_path=None):
+        # [partial, full or None] per file
+        self._hashes = StatCache(cache_path)
+        self._lock = threading.Lock()
+        # Folder -> {size: [paths]}
+        self._folders = {}
+
+    def save(self):
+        """Write the hash cache back if anything was added"""
+        self._hashes.save()
+
+    def _index(self, folder):
+        """Return the size index of folder, listing it on first use"""
+        by_size = self._folders.get(folder)
+        if by_size is not None:
+            return by_size
+        by_size = {}
+        try:
+            with os.scandir(folder) as it:
+                for entry in it:
+                    try:
+                        if not entry.is_file(follow_symlinks=False):
+                            continue
+                        size = entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        continue
+                    by_size.setdefault(size, []).append(entry.path)
+        except OSError:
+            pass
+        with self._lock:
+            return self._folders.setdefault(folder, by_size)
+
+    def _hash(self, path, st, full):
+        key = stat_key(st)
+        hashes = self._hashes.get(key)
+        if hashes is None:
+            hashes = [partial_hash(path, st.st_size), None]
+        if full and hashes[1] is None:
+            # Small files are read completely by the partial hash already
+            hashes[1] = (hashes[0] if st.st_size <= 2 * PARTIAL_BYTES
+                         else full_hash(path))
+        self._hashes.set(key, hashes)
+        return hashes[1] if full else hashes[0]
+
+    def find(self, path, st, folder):
+        """Return the path of a file in folder identical to path, or None"""
+        if not st.st_size:
+            # Empty files are all equal; not worth treating as duplicates
+            return None
+        by_size = self._index(folder)
+        with self._lock:
+            candidates = list(by_size.get(st.st_size, ()))
+        if not candidates:
+            return None
+
+        partial = self._hash(path, st, full=False)
+        full = None
+        for candidate in candidates:
+            try:
+                candidate_st = os.lstat(candidate)
+                if candidate_st.st_size != st.st_size:
+                    continue
+                if (candidate_st.st_dev, candidate_st.st_ino) == (st.st_dev, st.st_ino):
+                    # Already a hard link to the same file
+                    return candidate
+                if self._hash(candidate, candidate_st, full=False) != partial:
+                    continue
+                if full is None:
+                    full = self._hash(path, st, full=True)
+                if self._hash(candidate, candidate_st, full=True) == full:
+                    return candidate
+            except OSError:
+                continue
+        return None
+
+    def add(self, folder, path, size):
+        """Register a file that was just moved into folder"""
+        with self._lock:
+            by_size = self._folders.get(folder)
+            if by_size is not None:
+                by_size.setdefault(size, []).append(path)
@@ -0,0 +1,1465 @@
+import os
+import json
+import time
+import threading
+from datetime import datetime
+from itertools import islice
+
+from .classifier import ExtensionIndex
+from .compact import FileTable, MoveRecords
+from .dedup import (DuplicateFinder, DEDUP_MODES, DEFAULT_DEDUP_MODE, DUPLICATES_FOLDER,
+                    HASH_CACHE_FILE)
+from .journal import (JournalStore, JournalWriter, JOURNAL_DIR, history_slots,
+                      iter_moves_reversed, read_created_folders)
+from .executor import BoundedExecutor, DestinationFolder, DEFAULT_WORKERS
+from .logbuffer import DEFAULT_MAX_LINES
+from .metrics import Metrics, DEFAULT_PROFILE_MODE, PROFILE_DIR, PROFILE_MODES, format_report
+from .mover import Mover, DEFAULT_CHUNK_SIZE, HARDLINK, RENAME, SYMLINK, device_of
+from .plan import MovePlan, predict_strategy
+from .progress import ProgressTracker, rates
+from .rules import compile_rules
+from .scanner import DEFAULT_SCAN_WORKERS, PathEntry, walk_entries
+from .sniffer import (ContentSniffer, DEFAULT_SNIFF_MODE, DEFAULT_SNIFF_WORKERS, SNIFF_MODES,
+                      SNIFF_CACHE_FILE)
+from .snapshot import DirectorySnapshot, SNAPSHOT_DIR
+from .view import (ViewBuilder, ViewIndex, DEFAULT_VIEW_MODE, REFLINK, VIEW_MODES,
+                   remove_empty_folders, remove_view_entry, view_strategy)
+
+# Default file type mappings
+DEFAULT_FILE_TYPES = {
+    'Documents': ['.pdf', '.doc', '.docx', '.txt', '.rtf', '.odt', '.xls', '.xlsx', '.ppt', '.pptx'],
+    'Images': ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.svg', '.webp', '.ico'],
+    'Videos': ['.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v'],
+    'Music': ['.mp3', '.wav', '.flac', '.aac', '.ogg', '.m4a', '.wma'],
+    'Archives': ['.zip', '.rar', '.7z', '.tar', '.gz', '.bz2'],
+    'Code': ['.py', '.js', '.html', '.css', '.java', '.cpp', '.c', '.php', '.rb', '.go'],
+    'Executables': ['.exe', '.msi', '.dmg', '.deb', '.rpm', '.app']
+}
+
+SETTINGS_FILE = 'file_sorter_settings.json'
+
+# Number of operations kept for undo
+MAX_HISTORY = 10
+
+# Timer names for the move and view strategies; every other strategy is a copy
+_MOVE_TIMERS = {RENAME: 'move.rename', HARDLINK: 'move.hardlink', SYMLINK: 'move.symlink',
+                REFLINK: 'move.reflink'}
+
+
+def _ignore(*args):
+    pass
+
+
+def _view_header(view):
+    """The journal header value for a view mode: None for a normal sort"""
+    return None if view == 'off' else view
+
+
+def _link_duplicate(original, source, destination):
+    """Replace source by a hard link to original at destination.
+
+    Returns False when a link can't be made there (another device, no
+    hard link support), so the caller moves the file instead.
+    """
+    try:
+        os.link(original, destination)
+    except FileExistsError:
+        raise
+    except OSError:
+        return False
+    os.unlink(source)
+    return True
+
+
+class SortEngine:
+    """Scanning, categorizing and moving logic shared by the GUI and the CLI.
+
+    The engine never touches a UI toolkit. Callers observe it through the
+    ``log`` callback (one message string) and the ``on_progress`` callbacks
+    passed to the long-running methods, which are invoked from whatever
+    thread runs the operation. Those methods also take a ``progress``
+    ProgressTracker (see progress.py) that any thread can ask for the bytes
+    done, the throughput and the time left.
+    """
+
+    def __init__(self, settings_file=SETTINGS_FILE, log=None, journal_dir=None):
+        self.file_types = {category: list(extensions)
+                           for category, extensions in DEFAULT_FILE_TYPES.items()}
+        self.workers = DEFAULT_WORKERS
+        self.copy_chunk_size = DEFAULT_CHUNK_SIZE
+        # Results log: lines kept in memory, optional file receiving every line
+        self.log_max_lines = DEFAULT_MAX_LINES
+        self.log_file = ''
+        # Content sniffing: 'off', 'unknown' or 'all' (see sniffer.py)
+        self.sniff_content = DEFAULT_SNIFF_MODE
+        # Duplicates: 'off', 'skip', 'hardlink' or 'quarantine' (see dedup.py)
+        self.dedup = DEFAULT_DEDUP_MODE
+        # Placement rules checked before the extension categories (see rules.py)
+        self.rules = []
+        # Per-operation timings and profiling (see metrics.py)
+        self.timings = False
+        self.profile = DEFAULT_PROFILE_MODE
+        # Directory listing threads, and whether folders are visited in a fixed order
+        self.scan_workers = DEFAULT_SCAN_WORKERS
+        self.scan_ordered = True
+        # On-disk catalog of sorted files for search and per-category totals (see catalog.py)
+        self.catalog = False
+        # Views: 'off' moves files; 'symlink', 'hardlink' or 'reflink' links them (see view.py)
+        self.view = DEFAULT_VIEW_MODE
+        self.settings_file = settings_file
+        self.log = log or _ignore
+        self.extension_index = ExtensionIndex(self.file_types)
+
+        self.load_settings()
+
+        # Operation history for undo. Operations are journaled next to the
+        # settings file so they survive restarts; without a settings file
+        # (or journal_dir) they are only kept in memory.
+        if journal_dir is None and settings_file:
+            journal_dir = os.path.join(os.path.dirname(os.path.abspath(settings_file)), JOURNAL_DIR)
+        self.journal = JournalStore(journal_dir) if journal_dir else None
+        # Directory snapshots for incremental rescans live next to the journal
+        self.snapshot_dir = (os.path.join(os.path.dirname(journal_dir), SNAPSHOT_DIR)
+                             if journal_dir else None)
+        self.profile_dir = (os.path.join(os.path.dirname(journal_dir), PROFILE_DIR)
+                            if journal_dir else None)
+        # The catalog database too; catalog.py (and sqlite3) is imported on first use
+        self.catalog_dir = os.path.dirname(journal_dir) if journal_dir else None
+        self.operation_history = []
+        self.interrupted_operations = []
+        # Concurrent sorts (batch jobs) record operations from several threads
+        self._history_lock = threading.Lock()
+        if self.journal:
+            self.load_history()
+
+    def load_settings(self):
+        """Load settings from JSON file"""
+        try:
+            if self.settings_file and os.path.exists(self.settings_file):
+                with open(self.settings_file, 'r') as f:
+                    settings = json.load(f)
+                    self.file_types = settings.get('file_types', self.file_types)
+                    self.workers = max(1, int(settings.get('workers', self.workers)))
+                    self.copy_chunk_size = int(settings.get('copy_chunk_size', self.copy_chunk_size))
+                    self.log_max_lines = max(1, int(settings.get('log_max_lines', self.log_max_lines)))
+                    self.log_file = settings.get('log_file', self.log_file)
+                    sniff_content = settings.get('sniff_content', self.sniff_content)
+                    if sniff_content in SNIFF_MODES:
+                        self.sniff_content = sniff_content
+                    self.rules = settings.get('rules', self.rules)
+                    dedup = settings.get('dedup', self.dedup)
+                    if dedup in DEDUP_MODES:
+                        self.dedup = dedup
+                    self.timings = bool(settings.get('timings', self.timings))
+                    profile = settings.get('profile', self.profile)
+                    if profile in PROFILE_MODES:
+                        self.profile = profile
+                    self.scan_workers = max(1, int(settings.get('scan_workers', self.scan_workers)))
+                    self.scan_ordered = bool(settings.get('scan_ordered', self.scan_ordered))
+                    self.catalog = bool(settings.get('catalog', self.catalog))
+                    view = settings.get('view', self.view)
+                    if view in VIEW_MODES:
+                        self.view = view
+        except Exception as e:
+            self.log(f"Error loading settings: {e}")
+        self.rebuild_index()
+
+    def save_settings(self):
+        """Save settings to JSON file"""
+        self.rebuild_index()
+        settings = {
+            'file_types': self.file_types,
+            'workers': self.workers,
+            'copy_chunk_size': self.copy_chunk_size,
+            'log_max_lines': self.log_max_lines,
+            'log_file': self.log_file,
+            'sniff_content': self.sniff_content,
+            'dedup': self.dedup,
+            'rules': self.rules,
+            'timings': self.timings,
+            'profile': self.profile,
+            'scan_workers': self.scan_workers,
+            'scan_ordered': self.scan_ordered,
+            'catalog': self.catalog,
+            'view': self.view
+        }
+        with open(self.settings_file, 'w') as f:
+            json.dump(settings, f, indent=4)
+
+    def rebuild_index(self):
+        """Recompile the extension lookup table and the rules after settings changed"""
+        self.extension_index = ExtensionIndex(self.file_types)
+        for extension, kept, ignored in self.extension_index.conflicts:
+            self.log(f"Extension {extension} is listed under both {kept} and {ignored}; "
+                     f"using {kept}")
+        self.rule_matcher = compile_rules(self.rules, self.extension_index.max_parts)
+        for position, message in self.rule_matcher.errors:
+            self.log(f"Ignoring rule {position + 1}: {message}")
+
+    def _placer(self, directory):
+        """Return place(entry, category) -> (label, folder) for files below directory.
+
+        The label is the category, or the target of the first matching
+        rule; the folder is where the file belongs.
+        """
+        matcher = self.rule_matcher
+        join = os.path.join
+        if not matcher:
+            return lambda entry, category: (category, join(directory, category))
+
+        now = time.time()
+
+        def place(entry, category):
+            target = matcher.match(entry, category, now)
+            if target is None:
+                return category, join(directory, category)
+            return target, join(directory, *target.split('/'))
+        return place
+
+    def _classifier(self, directory):
+        """Return classify(entry) -> (label, folder) by extension and rules"""
+        category_for_name = self.extension_index.category_for_name
+        place = self._placer(directory)
+        return lambda entry: place(entry, category_for_name(entry.name))
+
+    def get_file_category(self, file_path):
+        """Determine file category based on extension"""
+        return self.extension_index.category_for_path(file_path)
+
+    def output_folders(self):
+        """Names of the folders directly below a sorted directory that sorting fills"""
+        folders = set(self.file_types)
+        folders.add(self.extension_index.default)
+        folders.update(self.rule_matcher.targets())
+        if self.dedup != 'off':
+            folders.add(DUPLICATES_FOLDER)
+        return folders
+
+    def _scan_error(self, path, error):
+        self.log(f"Error scanning {path}: {error}")
+
+    def iter_work(self, directory, moved_into=None, snapshot=None, on_cached=None,
+                  metrics=None, control=None):
+        """Stream (entry, category, category_folder) for every file below directory.
+
+        Files are classified as they are found, so callers can act on them
+        while the scan continues; category is the rule target when a rule
+        placed the file. Existing category folders directly below directory
+        are visited first. Because a directory is listed only when the scan
+        reaches it, a caller that moves files into a folder passes a
+        moved_into dict: before the first move into a folder it adds the
+        folder with an empty set unless the folder is already a key, and
+        then adds each moved file name to the set, so the file isn't
+        reported a second time. Listed folders are kept as keys with None.
+
+        With a DirectorySnapshot, directories whose files are all sorted are
+        recorded in it, and unchanged ones from an earlier run are not
+        listed; on_cached(folder, count) reports their files instead, with
+        folder relative to directory. Listing and classifying are timed
+        when metrics are given. With an OperationControl the scan pauses
+        and stops between directories.
+
+        Directories are listed by ``scan_workers`` threads; unless
+        ``scan_ordered`` is set, files come in the order the listings
+        complete, which may pick different names on collisions from run to
+        run.
+        """
+        classify = self._classifier(directory)
+        categories = self.output_folders()
+        skip_duplicates = self.dedup != 'off'
+
+        walk = walk_entries(directory, self._scan_error, snapshot, self.scan_workers,
+                            self.scan_ordered)
+        if metrics is not None:
+            walk = metrics.timed_iter('scan', walk)
+            classify = metrics.timed('classify', classify)
+
+        for dirpath, file_entries, dir_entries in walk:
+            if control is not None and control.checkpoint():
+                return
+            if dirpath == directory:
+                if skip_duplicates:
+                    # Quarantined duplicates stay where they are
+                    dir_entries[:] = [entry for entry in dir_entries
+                                      if entry.name != DUPLICATES_FOLDER]
+                dir_entries.sort(key=lambda entry: entry.name not in categories)
+                if snapshot is not None:
+                    # Check category folders before anything is moved into them
+                    for entry in dir_entries:
+                        if entry.name in categories:
+                            snapshot.check(entry.path)
+
+            already_moved = None
+            if moved_into is not None:
+                already_moved = moved_into.pop(dirpath, None)
+                moved_into[dirpath] = None
+
+            if file_entries is None:
+                # Unchanged since the last scan; only sorted files in here
+                if on_cached is not None:
+                    files = snapshot.check(dirpath)[2]
+                    if files:
+                        on_cached(os.path.relpath(dirpath, directory).replace(os.sep, '/'),
+                                  files)
+                continue
+
+            sorted_files = 0
+
+            for entry in file_entries:
+                if already_moved and entry.name in already_moved:
+                    sorted_files += 1
+                    continue
+                category, category_folder = classify(entry)
+                if dirpath == category_folder:
+                    sorted_files += 1
+                yield entry, category, category_folder
+
+            if snapshot is not None and sorted_files == len(file_entries):
+                snapshot.record(dirpath, sorted_files,
+                                [entry.name for entry in dir_entries if not entry.is_symlink()])
+
+    def settings_fingerprint(self):
+        """Short hash of the settings that decide where files go and how"""
+        settings = json.dumps([self.file_types, self.rule_matcher.fingerprint(), self.sniff_content,
+                               self.dedup, self.view], sort_keys=True)
+        import hashlib
+        return hashlib.sha1(settings.encode('utf-8')).hexdigest()[:16]
+
+    def _open_snapshot(self, directory, full_rescan=False):
+        """Return the DirectorySnapshot for directory, or None without a cache"""
+        if not self.snapshot_dir:
+            return None
+        if self.rule_matcher.stat_dependent:
+            # Files age, grow or shrink into other folders without their folder changing
+            return None
+        if self.sniff_content != 'off':
+            # Sniffing moves files the extensions call sorted, after the scan
+            # recorded their folder as clean, and a file rewritten in place
+            # can change category without its folder changing
+            return None
+        # A folder is only clean under the rules it was classified with; a
+        # snapshot saved under other rules is dropped when it's loaded
+        rules = json.dumps([self.file_types, self.rule_matcher.fingerprint()], sort_keys=True)
+        import hashlib
+        variant = hashlib.sha1(rules.encode('utf-8')).hexdigest()[:16]
+        return DirectorySnapshot.for_root(self.snapshot_dir, directory, full_rescan, variant)
+
+    def _open_sniffer(self):
+        """Return a ContentSniffer for the sniff_content mode, or None when it's off"""
+        if self.sniff_content not in ('unknown', 'all'):
+            return None
+        cache_path = (os.path.join(self.snapshot_dir, SNIFF_CACHE_FILE)
+                      if self.snapshot_dir else None)
+        return ContentSniffer(self.extension_index, self.sniff_content, cache_path,
+                              DEFAULT_SNIFF_WORKERS)
+
+    def _classify(self, directory, work, sniffer):
+        """Pass scan results through the content sniffer, if there is one"""
+        return sniffer.refine(work, self._placer(directory)) if sniffer else work
+
+    def _open_duplicates(self):
+        """Return a DuplicateFinder for the dedup mode, or None when it's off"""
+        if self.dedup not in ('skip', 'hardlink', 'quarantine'):
+            return None
+        cache_path = (os.path.join(self.snapshot_dir, HASH_CACHE_FILE)
+                      if self.snapshot_dir else None)
+        return DuplicateFinder(cache_path)
+
+    def _open_metrics(self):
+        """Return a Metrics for one operation, or None when timings are off"""
+        if not self.timings and self.profile not in ('cpu', 'memory'):
+            return None
+        return Metrics(self.profile, self.profile_dir)
+
+    def _finish_metrics(self, metrics):
+        """Log the report of metrics and return it; None without metrics"""
+        if metrics is None:
+            return None
+        report = metrics.report()
+        for line in format_report(report):
+            self.log(line)
+        return report
+
+    def _open_catalog(self, existing=False):
+        """Return the Catalog of sorted files to update, or None when it's off.
+
+        With existing set, a catalog kept while the setting was on is
+        opened too, so an undo still removes the files it moves back.
+        """
+        if not self.catalog_dir:
+            return None
+        from .catalog import Catalog, CatalogError, CATALOG_FILE
+        path = os.path.join(self.catalog_dir, CATALOG_FILE)
+        if not self.catalog and not (existing and os.path.exists(path)):
+            return None
+        try:
+            return Catalog(path)
+        except CatalogError as e:
+            self.log(f"Error opening file catalog: {e}")
+            return None
+
+    def _read_catalog(self):
+        """Return the Catalog for a lookup, or None if there is none yet.
+
+        Raises CatalogError when it exists but can't be opened.
+        """
+        if not self.catalog_dir:
+            return None
+        from .catalog import Catalog, CATALOG_FILE
+        path = os.path.join(self.catalog_dir, CATALOG_FILE)
+        return Catalog(path) if os.path.exists(path) else None
+
+    def _save_catalog(self, catalog):
+        if catalog is None:
+            return
+        from .catalog import CatalogError
+        try:
+            catalog.save()
+        except CatalogError as e:
+            self.log(f"Error updating file catalog: {e}")
+
+    def find_sorted_files(self, pattern, category=None, limit=100):
+        """Look sorted files up by name in the catalog, without scanning.
+
+        pattern matches the start of the original file name, or the whole
+        name when it contains * or ? wildcards. Returns dicts with the
+        original path, destination, category, size, mtime_ns, operation id
+        and sort time, newest first; 'exists' tells whether the file is
+        still at its destination. Raises CatalogError if the catalog can't
+        be read.
+        """
+        catalog = self._read_catalog()
+        if catalog is None:
+            return []
+        try:
+            files = catalog.search(pattern, category, limit)
+        finally:
+            catalog.close()
+        for found in files:
+            found['exists'] = os.path.lexists(found['destination'])
+        return files
+
+    def catalog_totals(self, directory=None):
+        """Files and bytes per category in the catalog, for one sorted directory or all"""
+        catalog = self._read_catalog()
+        if catalog is None:
+            return {}
+        try:
+            return catalog.category_totals(directory)
+        finally:
+            catalog.close()
+
+    def catalog_operations(self):
+        """Operations in the catalog, including ones whose journal was pruned"""
+        catalog = self._read_catalog()
+        if catalog is None:
+            return []
+        try:
+            return catalog.operations()
+        finally:
+            catalog.close()
+
+    def _save_cache(self, cache, description):
+        if cache is None:
+            return
+        try:
+            cache.save()
+        except OSError as e:
+            self.log(f"Error saving {description}: {e}")
+
+    def scan_directory(self, directory):
+        """Scan directory for files to sort.
+
+        Returns (files_to_sort, total_files); files_to_sort is a FileTable
+        mapping each category to the paths of its files.
+        """
+        files_to_sort = FileTable()
+
+        for entry, category, category_folder in self.iter_work(directory):
+            files_to_sort.add(os.path.dirname(entry.path), entry.name, category)
+
+        return files_to_sort, files_to_sort.total_files
+
+    def preview(self, directory, samples=10, full_rescan=False, control=None):
+        """Summarize what sorting directory would do, without moving anything"""
+        return self.plan(directory, samples, full_rescan, control).summary
+
+    def plan(self, directory, samples=10, full_rescan=False, control=None):
+        """Scan directory and decide every move a sort would make.
+
+        Returns a MovePlan whose summary counts the files per category and
+        keeps the first few file names of each. Destination names are
+        reserved as the scan goes, so collisions are resolved here and not
+        when the plan is executed. Unchanged sorted folders are counted
+        from the scan snapshot unless full_rescan is set. A plan stopped
+        through control covers only the files seen so far and has
+        'cancelled' set in its summary.
+
+        Each category's 'mode' is the strategy its files will get: a
+        rename or copy, or with the view setting the kind of link. Files
+        that already have their view entry count as already sorted.
+        """
+        # Plans are saved and carried out later, from any working directory
+        directory = os.path.abspath(directory)
+        view = self.view
+        summary = {
+            'directory': directory,
+            'view': view,
+            # Tells whether the plan still matches the settings (see settings_fingerprint)
+            'settings_hash': self.settings_fingerprint(),
+            'total_files': 0,
+            'files_to_move': 0,
+            'files_already_sorted': 0,
+            'categories': {}
+        }
+        categories = summary['categories']
+        plan = MovePlan(directory, summary)
+        folders = {}
+        view_index = ViewIndex(view) if view != 'off' else None
+        root_device = device_of(directory)
+
+        def category_info(category):
+            info = categories.get(category)
+            if info is None:
+                info = categories[category] = {'count': 0, 'samples': []}
+            return info
+
+        def count_cached(category, files):
+            summary['total_files'] += files
+            summary['files_already_sorted'] += files
+            category_info(category)['count'] += files
+
+        metrics = self._open_metrics()
+        snapshot = self._open_snapshot(directory, full_rescan)
+        sniffer = self._open_sniffer()
+        work = self.iter_work(directory, snapshot=snapshot, on_cached=count_cached,
+                              metrics=metrics, control=control)
+        for entry, category, category_folder in self._classify(directory, work, sniffer):
+            if control is not None and control.checkpoint():
+                break
+            already_sorted = os.path.dirname(entry.path) == category_folder
+            destination_name = entry.name
+            strategy = None
+            if not already_sorted:
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except OSError as e:
+                    self._scan_error(entry.path, e)
+                    continue
+                if view != 'off':
+                    # Linked by an earlier sort into the same view
+                    already_sorted = view_index.contains(category_folder, entry.path, st)
+            if not already_sorted:
+                folder = folders.get(category_folder)
+                if folder is None:
+                    folder = folders[category_folder] = DestinationFolder(category_folder)
+                destination_name = os.path.basename(folder.reserve(entry.name))
+                device = folder.device if folder.device is not None else root_device
+                if view != 'off':
+                    strategy = view_strategy(view, st, device)
+                else:
+                    strategy = predict_strategy(st, device)
+                plan.add(entry, st, category, category_folder, destination_name, strategy)
+
+            summary['total_files'] += 1
+            if already_sorted:
+                summary['files_already_sorted'] += 1
+            else:
+                summary['files_to_move'] += 1
+
+            info = category_info(category)
+            info['count'] += 1
+            if strategy is not None:
+                mode = info.get('mode')
+                if mode is None:
+                    info['mode'] = strategy
+                elif mode != strategy:
+                    info['mode'] = 'mixed'
+            if len(info['samples']) < samples:
+                sample = {'name': entry.name, 'already_sorted': already_sorted}
+                if destination_name != entry.name:
+                    sample['destination'] = destination_name
+                info['samples'].append(sample)
+
+        summary['strategies'] = plan.strategies()
+        if control is not None and control.cancelled:
+            summary['cancelled'] = True
+        if self.catalog:
+            # Sizes of what earlier sorts moved, without stat'ing the category folders
+            from .catalog import CatalogError
+            try:
+                summary['catalog'] = self.catalog_totals(directory)
+            except CatalogError as e:
+                self.log(f"Error reading file catalog: {e}")
+        self._save_cache(snapshot, "scan snapshot")
+        self._save_cache(sniffer, "content sniffing cache")
+        report = self._finish_metrics(metrics)
+        if report is not None:
+            summary['metrics'] = report
+        return plan
+
+    def sort_directory(self, directory, create_folders=True, on_progress=None, workers=None,
+                       resume=None, full_rescan=False, batch=None, control=None, progress=None):
+        """Sort files in directory into category folders.
+
+        Files are moved as the scan finds them, by up to ``workers`` threads
+        (default: the ``workers`` setting). on_progress(moved, found) is
+        called after every move, where found is the number of files seen so
+        far. Returns a result dict with the counts and the operation record,
+        which is also appended to ``operation_history`` when anything was
+        moved. Each move is journaled as soon as it completes; resume is an
+        interrupted operation whose journal the moves are appended to.
+        Unchanged sorted folders are skipped using the scan snapshot unless
+        full_rescan is set. batch is the id of the batch job the sort is part
+        of, if any.
+
+        control is an OperationControl to pause or cancel the sort with. A
+        cancelled sort finishes the file being moved, commits the moves made
+        so far as a normal operation and sets 'cancelled' in the result.
+
+        With the view setting the files stay where they are and get links
+        in their category folders instead (see view.py); a resumed sort
+        keeps the view mode it was started with.
+
+        progress is a ProgressTracker to count the files and bytes to move
+        in; it may be shared with other sorts. The result and the operation
+        record get 'totals': files and bytes moved, seconds taken and the
+        average rates.
+        """
+        # The journal must let undo find the files from any working directory
+        directory = os.path.abspath(directory)
+        view = resume.get('view', 'off') if resume is not None else self.view
+        journal = None
+        if resume is not None:
+            journal = JournalWriter(resume['journal'])
+        elif self.journal:
+            journal = self.journal.start(directory, batch, _view_header(view))
+        run = _SortRun(self, directory, on_progress, journal, resume, control, view, progress)
+        if batch is not None:
+            run.operation_record['batch'] = batch
+        snapshot = self._open_snapshot(directory, full_rescan)
+        sniffer = self._open_sniffer()
+
+        try:
+            work = self.iter_work(directory, run.moved_into, snapshot, run.cached, run.metrics,
+                                  control)
+            self._run_sort(run, self._classify(directory, work, sniffer), create_folders, workers)
+        except BaseException:
+            if journal:
+                # Left uncommitted, so it shows up as interrupted
+                journal.close()
+            self._save_catalog(run.catalog)
+            raise
+
+        if snapshot is not None:
+            # Folders this sort moved into have a new mtime. Ones the scan
+            # never listed are still known exactly; the rest get rescanned.
+            for folder, added in run.moved_in_counts.items():
+                if snapshot.check(folder) is not None:
+                    snapshot.refresh(folder, added)
+                else:
+                    snapshot.forget(folder)
+            self._save_cache(snapshot, "scan snapshot")
+        self._save_cache(sniffer, "content sniffing cache")
+
+        return self._finish_sort(run, journal)
+
+    def iter_paths(self, directory, paths, metrics=None):
+        """Like iter_work, for a known list of file paths below directory"""
+        classify = self._classifier(directory)
+        if metrics is not None:
+            classify = metrics.timed('classify', classify)
+        for path in paths:
+            entry = PathEntry(path)
+            category, category_folder = classify(entry)
+            yield entry, category, category_folder
+
+    def sort_paths(self, directory, paths, create_folders=True, on_progress=None, workers=None,
+                   folders=None, control=None, batch=None):
+        """Sort the given files of directory without scanning it.
+
+        Used by watch mode, which learns about new files from the file
+        system instead of listing directories. The batch is journaled,
+        recorded for undo and cancelled through control like a
+        sort_directory call. folders is a dict the caller keeps between
+        batches so category folders are indexed once. batch is a batch id
+        as for sort_directory; watch mode gives all batches of a session
+        the same one, so the session takes one undo history slot.
+        """
+        directory = os.path.abspath(directory)
+        paths = [os.path.abspath(path) for path in paths]
+        journal = (self.journal.start(directory, batch, _view_header(self.view))
+                   if self.journal else None)
+        run = _SortRun(self, directory, on_progress, journal, control=control, view=self.view)
+        if batch is not None:
+            run.operation_record['batch'] = batch
+        sniffer = self._open_sniffer()
+
+        try:
+            work = self._classify(directory, self.iter_paths(directory, paths, run.metrics),
+                                  sniffer)
+            self._run_sort(run, work, create_folders, workers, folders)
+        except BaseException:
+            if journal:
+                journal.close()
+            self._save_catalog(run.catalog)
+            raise
+
+        self._save_cache(sniffer, "content sniffing cache")
+
+        return self._finish_sort(run, journal)
+
+    def execute_plan(self, plan, create_folders=True, on_progress=None, workers=None,
+                     control=None, progress=None):
+        """Make the moves of a MovePlan without scanning the directory again.
+
+        Each source is lstat'ed first; one that is gone or whose size or
+        mtime changed since the plan was made is left where it is and
+        counted in changed_files. Destinations keep the names the plan
+        picked unless another file has taken one since. The sort is
+        journaled, recorded for undo, cancelled and tracked in progress like
+        sort_directory; the plan's sizes give progress its totals up front.
+        """
+        # A plan is carried out in the view mode it was made for
+        view = plan.summary.get('view', 'off')
+        journal = (self.journal.start(plan.directory, view=_view_header(view))
+                   if self.journal else None)
+        run = _SortRun(self, plan.directory, on_progress, journal, control=control, view=view,
+                       progress=progress)
+        # Files the plan found already sorted count as skipped, as in a sort
+        run.cached(None, plan.summary.get('files_already_sorted', 0))
+        run.progress.expect(len(plan), plan.total_size())
+        ready_folders = {}
+
+        try:
+            with BoundedExecutor(workers or self.workers) as executor:
+                for move in plan.iter_moves():
+                    if control is not None and control.checkpoint():
+                        break
+                    source, category, category_folder, name, size, mtime_ns, _ = move
+                    run.found()
+                    entry = PathEntry(source)
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        st = None
+                    if st is None or st.st_size != size or st.st_mtime_ns != mtime_ns:
+                        run.changed(entry.name)
+                        run.progress.drop(1, size)
+                        continue
+
+                    folder = self._ready_folder(run, entry, category, category_folder,
+                                                create_folders, ready_folders)
+                    if folder is None:
+                        run.progress.drop(1, size)
+                    else:
+                        executor.submit(run.move, entry, folder, name)
+        except BaseException:
+            if journal:
+                journal.close()
+            self._save_catalog(run.catalog)
+            raise
+
+        return self._finish_sort(run, journal)
+
+    def _finish_sort(self, run, journal):
+        """Commit the journal of a finished sort and record it for undo"""
+        self._save_cache(run.duplicates, "duplicate hash cache")
+        result = run.result()
+        operation = result['operation']
+        operation['totals'] = result['totals']
+        if run.catalog is not None:
+            run.catalog.finish_operation(operation)
+        self._save_catalog(run.catalog)
+        report = self._finish_metrics(run.metrics)
+        if report is not None:
+            result['metrics'] = operation['metrics'] = report
+        if result['cancelled']:
+            operation['cancelled'] = True
+
+        if journal:
+            moved_files = run.moved_files + journal.previous_moves
+            if moved_files:
+                summary = {key: result[key] for key in
+                           ('total_files', 'skipped_files', 'duplicate_files', 'strategies',
+                            'totals')}
+                if report is not None:
+                    summary['metrics'] = report
+                if result['cancelled']:
+                    summary['cancelled'] = True
+                summary['moved_files'] = moved_files
+                summary['errors'] = len(result['errors'])
+                journal.commit(summary)
+                operation.update(summary)
+                operation['complete'] = True
+            else:
+                journal.close()
+                self.journal.discard(journal.path)
+
+        # Save operation for undo
+        if operation.get('complete') or run.moved_files:
+            self.record_operation(operation)
+
+        return result
+
+    def _run_sort(self, run, work, create_folders, workers, ready_folders=None):
+        if ready_folders is None:
+            ready_folders = {}
+
+        with BoundedExecutor(workers or self.workers) as executor:
+            # Totals keep growing until the scan is done
+            run.progress.begin_scan()
+            try:
+                self._queue_moves(run, work, create_folders, ready_folders, executor)
+            finally:
+                run.progress.end_scan()
+
+    def _queue_moves(self, run, work, create_folders, ready_folders, executor):
+        """Hand the files of work that need moving to executor"""
+        control = run.control
+        for entry, category, category_folder in work:
+            if control is not None and control.checkpoint():
+                break
+            run.found()
+
+            # Check if file is already in the correct category folder
+            if os.path.dirname(entry.path) == category_folder:
+                run.skipped()
+                continue
+
+            folder = ready_folders.get(category_folder)
+            if folder is None:
+                folder = self._ready_folder(run, entry, category, category_folder,
+                                            create_folders, ready_folders)
+                if folder is None:
+                    continue
+                if category_folder not in run.moved_into:
+                    # Not listed yet; have the scan skip what we move in
+                    run.moved_into[category_folder] = set()
+
+            run.expect(entry)
+            executor.submit(run.move, entry, folder)
+
+    def _ready_folder(self, run, entry, category, category_folder, create_folders,
+                      ready_folders):
+        """Return the DestinationFolder for category_folder, creating the folder if needed.
+
+        Returns None, after reporting entry as failed, when the folder can't
+        be created.
+        """
+        folder = ready_folders.get(category_folder)
+        if folder is not None:
+            return folder
+        try:
+            if create_folders and not os.path.exists(category_folder):
+                # Every level makedirs is about to create, deepest first
+                created = [category_folder]
+                parent = os.path.dirname(category_folder)
+                while parent != created[-1] and not os.path.exists(parent):
+                    created.append(parent)
+                    parent = os.path.dirname(parent)
+                os.makedirs(category_folder)
+                run.created_folders(reversed(created))
+                self.log(f"Created folder: {category}")
+                if run.metrics is not None:
+                    run.metrics.count('folders_created')
+        except Exception as e:
+            run.failed(entry.name, e)
+            return None
+        folder = ready_folders[category_folder] = DestinationFolder(category_folder)
+        return folder
+
+    def load_history(self):
+        """Rebuild operation_history and interrupted_operations from the journal"""
+        self.operation_history = []
+        self.interrupted_operations = []
+        try:
+            for operation in self.journal.operations():
+                if operation['complete']:
+                    self.operation_history.append(operation)
+                else:
+                    self.interrupted_operations.append(operation)
+        except OSError as e:
+            self.log(f"Error reading operation journal: {e}")
+        self._trim_history()
+
+    def _trim_history(self):
+        """Drop the oldest operations beyond MAX_HISTORY; returns whether any were"""
+        slots = history_slots(self.operation_history)
+        if len(slots) <= MAX_HISTORY:
+            return False
+        dropped = {id(operation) for slot in slots[:-MAX_HISTORY] for operation in slot}
+        self.operation_history = [operation for operation in self.operation_history
+                                  if id(operation) not in dropped]
+        return True
+
+    def record_operation(self, operation):
+        """Remember an operation so it can be undone later"""
+        with self._history_lock:
+            self.operation_history.append(operation)
+            # Keep only last MAX_HISTORY operations (a batch job counts once)
+            if self._trim_history() and self.journal:
+                self.journal.prune(MAX_HISTORY)
+
+    def resume_operation(self, operation, create_folders=True, on_progress=None, workers=None,
+                         control=None, progress=None):
+        """Finish an interrupted sort, appending to its journal"""
+        self.interrupted_operations.remove(operation)
+        return self.sort_directory(operation['directory'], create_folders, on_progress,
+                                   workers, resume=operation, control=control, progress=progress)
+
+    def close_interrupted(self, operation):
+        """Keep the moves of an interrupted sort as a normal undoable operation"""
+        self.interrupted_operations.remove(operation)
+        journal = JournalWriter(operation['journal'])
+        summary = {'moved_files': journal.previous_moves, 'interrupted': True}
+        journal.commit(summary)
+        operation.pop('undone', None)
+        operation.update(summary)
+        operation['complete'] = True
+        self.record_operation(operation)
+        return operation
+
+    def rollback_interrupted(self, operation, on_progress=None, control=None, progress=None):
+        """Undo the moves an interrupted sort already made"""
+        self.interrupted_operations.remove(operation)
+        result = self.undo_operation(operation, on_progress, control, progress)
+        if result['cancelled'] or result['errors']:
+            self.interrupted_operations.append(operation)
+        return result
+
+    @staticmethod
+    def _undo_from_catalog(operation, catalog):
+        """Whether operation's moves can only be read from the catalog.
+
+        That's the case once its journal was pruned from the history, and
+        for operations looked up in the catalog itself.
+        """
+        if catalog is None or not operation.get('id') or operation.get('moves'):
+            return False
+        return not (operation.get('journal') and os.path.exists(operation['journal']))
+
+    def _created_folders(self, operation, catalog=None):
+        """Folders a view operation created, from its journal, its record or the catalog"""
+        if self._undo_from_catalog(operation, catalog):
+            from .catalog import CatalogError
+            try:
+                return catalog.folders(operation['id'])
+            except CatalogError as e:
+                self.log(f"Error reading file catalog: {e}")
+                return []
+        if operation.get('journal') and os.path.exists(operation['journal']):
+            try:
+                return read_created_folders(operation['journal'])
+            except OSError:
+                return []
+        return operation.get('created_folders', [])
+
+    def _iter_undo_moves(self, operation, catalog=None):
+        """Yield (moved_from, moved_to) pairs of operation, newest first"""
+        if self._undo_from_catalog(operation, catalog):
+            # Files a cancelled undo moved back are no longer in the catalog
+            yield from catalog.iter_moves_reversed(operation['id'])
+        elif operation.get('journal'):
+            yield from iter_moves_reversed(operation['journal'])
+        else:
+            # Reverse order, past the moves a cancelled undo already reverted
+            for move in islice(reversed(operation['moves']), operation.get('undone', 0), None):
+                yield move['from'], move['to']
+
+    def undo_operation(self, operation, on_progress=None, control=None, progress=None):
+        """Move every file of operation back to where it came from.
+
+        A cancelled undo stops after the file being moved back and sets
+        'cancelled' in the result; the operation remembers how far it got
+        (in its journal too), so undoing it again continues from there.
+        The caller keeps it in the history. So it does after an undo with
+        errors, to retry the moves that failed; files an earlier try
+        already moved back are skipped.
+
+        Files moved back are removed from the catalog, which also supplies
+        the moves of operations whose journal is gone.
+
+        Undoing a view deletes its entries (moved_back counts them) and the
+        folders the view created, once empty, without touching the files
+        they pointed at. Folders that were there before are left alone.
+
+        progress is a ProgressTracker as for sort_directory. Its byte total
+        is the size the sort recorded, so an operation recorded without
+        one, or partly undone already, is tracked by files only.
+        """
+        on_progress = on_progress or _ignore
+        progress = progress or ProgressTracker()
+        started = time.monotonic()
+        mover = Mover(self.copy_chunk_size)
+        devices = {}
+        catalog = self._open_catalog(existing=True)
+        operation_id = operation.get('id')
+        from_catalog = self._undo_from_catalog(operation, catalog)
+        view = operation.get('view')
+        if view == 'off':
+            view = None
+        if from_catalog:
+            total = catalog.count(operation_id)
+            total_size = catalog.size(operation_id)
+        else:
+            total = ((operation.get('moved_files') or len(operation.get('moves', ())))
+                     - operation.get('undone', 0))
+            total_size = (operation.get('totals') or {}).get('bytes', 0)
+            if operation.get('undone'):
+                total_size = 0
+        # Views move no data
+        weigh = view is None and total_size > 0
+        progress.expect(total, total_size if weigh else 0)
+        moved_back = 0
+        moved_back_size = 0
+        errors = []
+        metrics = self._open_metrics()
+        moves = self._iter_undo_moves(operation, catalog)
+        if metrics is not None:
+            moves = metrics.timed_iter('journal', moves)
+            perf_counter = time.perf_counter
+
+        # Read now: a fully undone operation's journal is deleted below
+        view_folders = self._created_folders(operation, catalog) if view is not None else []
+        cancelled = False
+        # Newest moves reverted before the first error; the journal can only
+        # mark those as undone, so later ones are found moved back on a retry
+        reverted = 0
+        for moved_from, moved_to in moves:
+            if control is not None and control.checkpoint():
+                cancelled = True
+                break
+            try:
+                if not os.path.lexists(moved_to) and (view is not None
+                                                      or os.path.lexists(moved_from)):
+                    # Reverted by an earlier undo that stopped at an error
+                    if not errors:
+                        reverted += 1
+                    if catalog is not None and operation_id:
+                        catalog.remove(operation_id, moved_to)
+                    progress.drop(1, 0)
+                    continue
+                if view is not None:
+                    # The files never moved; only their view entries go
+                    if metrics is None:
+                        remove_view_entry(moved_from, moved_to)
+                    else:
+                        start = perf_counter()
+                        remove_view_entry(moved_from, moved_to)
+                        metrics.add_time('undo.view', perf_counter() - start)
+                    size = 0
+                else:
+                    # Look up the device once per original folder
+                    folder = os.path.dirname(moved_from)
+                    if folder not in devices:
+                        devices[folder] = device_of(folder)
+                    st = os.lstat(moved_to)
+                    size = st.st_size
+                    if metrics is None:
+                        mover.move(moved_to, moved_from, devices[folder], st)
+                    else:
+                        start = perf_counter()
+                        strategy, _ = mover.move(moved_to, moved_from, devices[folder], st)
+                        metrics.add_time('undo.' + _MOVE_TIMERS.get(strategy, 'move.copy'),
+                                         perf_counter() - start)
+                moved_back += 1
+                moved_back_size += size
+                if not errors:
+                    reverted += 1
+                if catalog is not None and operation_id:
+                    catalog.remove(operation_id, moved_to)
+                progress.advance(1, size if weigh else 0)
+                on_progress(moved_back, max(total, moved_back))
+            except Exception as e:
+                message = f"Error undoing move: {e}"
+                errors.append(message)
+                self.log(message)
+
+        if cancelled or errors:
+            # The caller keeps the operation, so the rest can be undone later
+            if reverted and not from_catalog:
+                self._record_undone(operation, reverted)
+        else:
+            # A fully undone operation no longer needs its journal
+            if operation.get('journal') and self.journal:
+                self.journal.discard(operation['journal'])
+            if catalog is not None and operation_id:
+                catalog.forget_operation(operation_id)
+        self._save_catalog(catalog)
+        # Folders the view created, unless something else is in them
+        remove_empty_folders(view_folders)
+
+        result = {'moved_back': moved_back, 'errors': errors, 'cancelled': cancelled,
+                  'totals': rates(moved_back, moved_back_size, time.monotonic() - started)}
+        if view is not None:
+            result['view'] = view
+        report = self._finish_metrics(metrics)
+        if report is not None:
+            result['metrics'] = report
+        return result
+
+    def _record_undone(self, operation, moved_back):
+        """Remember that an unfinished undo moved back the newest moved_back moves"""
+        operation['undone'] = operation.get('undone', 0) + moved_back
+        if operation.get('journal'):
+            try:
+                JournalWriter(operation['journal']).record_undone(moved_back)
+            except OSError as e:
+                self.log(f"Error updating operation journal: {e}")
+
+    def undo_operation_id(self, operation_id, on_progress=None, control=None, progress=None):
+        """Undo the operation with operation_id, from the history or the catalog.
+
+        Returns None if neither knows the operation. Raises CatalogError
+        if it isn't in the history and the catalog can't be read.
+        """
+        with self._history_lock:
+            operation = next((operation for operation in self.operation_history
+                              if operation.get('id') == operation_id), None)
+            if operation is not None:
+                self.operation_history.remove(operation)
+        in_history = operation is not None
+        if not in_history:
+            catalog = self._read_catalog()
+            if catalog is None:
+                return None
+            try:
+                operation = catalog.operation(operation_id)
+            finally:
+                catalog.close()
+            if operation is None:
+                return None
+        result = self.undo_operation(operation, on_progress, control, progress)
+        if (result['cancelled'] or result['errors']) and in_history:
+            self.record_operation(operation)
+        return result
+
+    def undo_last_operation(self, on_progress=None, control=None, progress=None):
+        """Undo the most recent history slot, or return None if there is none.
+
+        The operations of a batch job or a watch session share a slot (the
+        same 'batch' id) and are undone together, newest first; the result
+        then adds up theirs and 'operations' says how many there were. A
+        cancelled undo puts the operations it didn't finish back, and
+        operations with errors stay too.
+        """
+        with self._history_lock:
+            if not self.operation_history:
+                return None
+            last = self.operation_history[-1]
+            batch = last.get('batch')
+            slot = [operation for operation in self.operation_history
+                    if operation is last or (batch is not None and operation.get('batch') == batch)]
+            self.operation_history = [operation for operation in self.operation_history
+                                      if not any(operation is taken for taken in slot)]
+        if len(slot) == 1:
+            result = self.undo_operation(last, on_progress, control, progress)
+            if result['cancelled'] or result['errors']:
+                self.record_operation(last)
+            return result
+
+        started = time.monotonic()
+        progress = progress or ProgressTracker()
+        results = []
+        remaining = list(slot)
+        while remaining:
+            operation = remaining.pop()
+            result = self.undo_operation(operation, on_progress, control, progress)
+            results.append(result)
+            if result['cancelled']:
+                for operation in remaining + [operation]:
+                    self.record_operation(operation)
+                break
+            if result['errors']:
+                self.record_operation(operation)
+        moved_back = sum(result['moved_back'] for result in results)
+        combined = {
+            'moved_back': moved_back,
+            'errors': [error for result in results for error in result['errors']],
+            'cancelled': results[-1]['cancelled'],
+            'operations': len(slot),
+            'totals': rates(moved_back, sum(result['totals']['bytes'] for result in results),
+                            time.monotonic() - started)
+        }
+        views = [result['view'] for result in results if 'view' in result]
+        if views:
+            combined['view'] = views[0]
+        return combined
+
+
+class _SortRun:
+    """Shared state of one sort_directory call, updated by the move workers"""
+
+    def __init__(self, engine, directory, on_progress, journal=None, resume=None, control=None,
+                 view=DEFAULT_VIEW_MODE, progress=None):
+        self.log = engine.log
+        self.directory = directory
+        self.journal = journal
+        self.mover = Mover(engine.copy_chunk_size)
+        self.on_progress = on_progress or _ignore
+        # Bytes queued and moved, for byte-weighted progress and the ETA
+        self.progress = progress or ProgressTracker()
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.total_files = 0
+        self.moved_files = 0
+        self.moved_bytes = 0
+        self.skipped_files = 0
+        self.duplicate_files = 0
+        # Planned files that were changed or removed before the move
+        self.changed_files = 0
+        self.errors = []
+        # Views link files instead of moving them (see view.py)
+        self.view = ViewBuilder(view) if view != 'off' else None
+        self.view_index = ViewIndex(view) if view != 'off' else None
+        self.dedup = engine.dedup
+        # A view stores no data twice, so there are no duplicates to deal with
+        self.duplicates = engine._open_duplicates() if self.view is None else None
+        self.quarantine = None
+        self.metrics = engine._open_metrics()
+        self.control = control
+        # Catalog rows carry the operation id, which comes from the journal
+        self.catalog = engine._open_catalog() if journal else None
+        # Category folder path -> category label stored in the catalog
+        self._catalog_labels = {}
+        # Names moved into category folders the scan hasn't listed yet
+        self.moved_into = {}
+        # Number of files moved into each category folder
+        self.moved_in_counts = {}
+
+        # Create operation record for undo. With a journal the moves live
+        # on disk instead of in 'moves'.
+        if resume is not None:
+            self.operation_record = resume
+            # The journal's move count already leaves out rolled back moves
+            resume.pop('undone', None)
+        else:
+            self.operation_record = {
+                'timestamp': datetime.now().isoformat(),
+                'directory': directory
+            }
+            if self.view is not None:
+                self.operation_record['view'] = view
+        self.operation_record['moves'] = MoveRecords()
+        # Per strategy totals: {'rename': {'files', 'bytes', 'seconds'}, ...}
+        self.operation_record['strategies'] = {}
+        if journal:
+            self.operation_record['journal'] = journal.path
+            self.operation_record.setdefault('id', journal.operation_id)
+        if self.catalog is not None:
+            self.catalog.start_operation(self.operation_record)
+
+    def cached(self, category, files):
+        """Count files of an unchanged sorted folder without listing it"""
+        with self.lock:
+            self.total_files += files
+            self.skipped_files += files
+
+    def found(self):
+        with self.lock:
+            self.total_files += 1
+
+    def skipped(self):
+        with self.lock:
+            self.skipped_files += 1
+
+    @staticmethod
+    def _size(entry):
+        """Size of entry from its (cached) lstat; 0 if it can't be stat'ed"""
+        try:
+            return entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            return 0
+
+    def expect(self, entry):
+        """Add a file queued for moving to the progress totals"""
+        self.progress.expect(1, self._size(entry))
+
+    def _not_moved(self, entry):
+        """Take a queued file that won't be moved off the progress totals"""
+        self.progress.drop(1, self._size(entry))
+
+    def changed(self, filename):
+        with self.lock:
+            self.skipped_files += 1
+            self.changed_files += 1
+        self.log(f"Skipped {filename}: changed since the preview")
+
+    def failed(self, filename, error):
+        message = f"Error moving {filename}: {error}"
+        with self.lock:
+            self.errors.append(message)
+        self.log(message)
+
+    def created_folders(self, paths):
+        """Remember folders a view created, parents first, so its undo removes them"""
+        if self.view is None:
+            return
+        paths = list(paths)
+        if self.catalog is not None:
+            # For an undo from the catalog once the journal is pruned
+            self.catalog.add_folders(self.operation_record['id'], paths)
+        if self.journal:
+            for path in paths:
+                self.journal.record_folder(path)
+        else:
+            with self.lock:
+                self.operation_record.setdefault('created_folders', []).extend(paths)
+
+    def _quarantine_folder(self):
+        with self.lock:
+            if self.quarantine is None:
+                path = os.path.join(self.directory, DUPLICATES_FOLDER)
+                os.makedirs(path, exist_ok=True)
+                self.quarantine = DestinationFolder(path)
+            return self.quarantine
+
+    def _check_duplicate(self, entry, source_stat, folder):
+        """Return (folder, original) for moving a duplicate, or None to leave it alone"""
+        original = self.duplicates.find(entry.path, source_stat, folder.path)
+        if original is None:
+            return folder, None
+        self.log(f"{entry.name} is a duplicate of {original}")
+        with self.lock:
+            self.duplicate_files += 1
+            if self.dedup == 'skip':
+                self.skipped_files += 1
+                return None
+        if self.dedup == 'quarantine':
+            return self._quarantine_folder(), None
+        return folder, original
+
+    def _catalog_label(self, folder_path):
+        """Category of files moved into folder_path: its path below the sorted directory"""
+        label = self._catalog_labels.get(folder_path)
+        if label is None:
+            label = os.path.relpath(folder_path, self.directory).replace(os.sep, '/')
+            self._catalog_labels[folder_path] = label
+        return label
+
+    def move(self, entry, folder, name=None):
+        """Move one file into folder, as name if given; runs on a worker thread"""
+        if self.control is not None and self.control.checkpoint():
+            # Queued before the operation was cancelled
+            self._not_moved(entry)
+            return
+        file_path = entry.path
+        original = None
+        metrics = self.metrics
+        try:
+            source_stat = entry.stat(follow_symlinks=False)
+            if self.duplicates is not None and not entry.is_symlink():
+                if metrics is not None:
+                    start = time.perf_counter()
+                target = self._check_duplicate(entry, source_stat, folder)
+                if metrics is not None:
+                    metrics.add_time('dedup', time.perf_counter() - start)
+                if target is None:
+                    self.progress.drop(1, source_stat.st_size)
+                    return
+                folder, original = target
+            if self.view_index is not None and self.view_index.contains(folder.path, file_path,
+                                                                        source_stat):
+                # Linked by an earlier sort into the same view
+                self.skipped()
+                self.progress.drop(1, source_stat.st_size)
+                return
+        except Exception as e:
+            self.failed(entry.name, e)
+            self._not_moved(entry)
+            return
+
+        while True:
+            if metrics is None:
+                destination = folder.reserve(name or entry.name)
+            else:
+                start = time.perf_counter()
+                destination = folder.reserve(name or entry.name)
+                metrics.add_time('collisions', time.perf_counter() - start)
+                if os.path.basename(destination) != (name or entry.name):
+                    metrics.count('renamed_on_collision')
+            try:
+                # Tell the scanner before the file shows up in the folder
+                pending = self.moved_into.get(folder.path)
+                if pending is not None:
+                    pending.add(os.path.basename(destination))
+
+                start = time.perf_counter()
+                if original is not None and _link_duplicate(original, file_path, destination):
+                    strategy, size = HARDLINK, 0
+                elif self.view is not None:
+                    strategy, size = self.view.link(file_path, destination, folder.device,
+                                                    source_stat)
+                else:
+                    strategy, size = self.mover.move(file_path, destination, folder.device,
+                                                     source_stat)
+                elapsed = time.perf_counter() - start
+                break
+            except FileExistsError:
+                # Created behind our back; the name stays taken, try the next one
+                if metrics is not None:
+                    metrics.count('collision_retries')
+                continue
+            except Exception as e:
+                folder.release(destination)
+                self.failed(entry.name, e)
+                self.progress.drop(1, source_stat.st_size)
+                return
+
+        if self.duplicates is not None and original is None and folder is not self.quarantine:
+            self.duplicates.add(folder.path, destination, source_stat.st_size)
+
+        if metrics is not None:
+            metrics.add_time(_MOVE_TIMERS.get(strategy, 'move.copy'), elapsed)
+            start = time.perf_counter()
+
+        # Record the move for undo
+        if self.journal:
+            self.journal.record_move(file_path, destination, strategy, size)
+        if self.catalog is not None:
+            self.catalog.add(self.operation_record['id'], file_path, destination,
+                             self._catalog_label(folder.path), source_stat.st_size,
+                             source_stat.st_mtime_ns)
+
+        with self.lock:
+            if not self.journal:
+                self.operation_record['moves'].append(file_path, destination, strategy, size)
+            totals = self.operation_record['strategies'].get(strategy)
+            if totals is None:
+                totals = self.operation_record['strategies'][strategy] = {
+                    'files': 0, 'bytes': 0, 'seconds': 0.0}
+            totals['files'] += 1
+            totals['bytes'] += size
+            totals['seconds'] += elapsed
+            self.moved_in_counts[folder.path] = self.moved_in_counts.get(folder.path, 0) + 1
+            self.moved_files += 1
+            self.moved_bytes += source_stat.st_size
+            moved_files, total_files = self.moved_files, self.total_files
+
+        if metrics is not None:
+            now = time.perf_counter()
+            metrics.add_time('journal', now - start)
+            start = now
+
+        self.progress.advance(1, source_stat.st_size)
+        self.on_progress(moved_files, total_files)
+        if moved_files % 10 == 0:  # Update status every 10 files
+            self.log(f"Moved {moved_files} files ({total_files} found so far)...")
+
+        if metrics is not None:
+            metrics.add_time('callbacks', time.perf_counter() - start)
+
+    def result(self):
+        return {
+            'total_files': self.total_files,
+            'moved_files': self.moved_files,
+            'skipped_files': self.skipped_files,
+            'duplicate_files': self.duplicate_files,
+            'changed_files': self.changed_files,
+            'errors': self.errors,
+            'cancelled': self.control is not None and self.control.cancelled,
+            'strategies': self.operation_record['strategies'],
+            'totals': rates(self.moved_files, self.moved_bytes, time.monotonic() - self.started),
+            'operation': self.operation_record
+        }
@@ -0,0 +1,58 @@
+"""Thread-safe channel from worker threads to a UI thread.
+
+Posting to a Tk event queue for every moved file floods it on large sorts.
+Workers post to an ``EventChannel`` instead, and the UI drains it on a
+fixed-rate timer. Posting is cheap and never waits for the UI: progress
+and status updates overwrite each other so only the latest value is
+shown, log lines are collected into one batch, and callables queued with
+``call`` run in order on the next drain.
+"""
+
+import threading
+from datetime import datetime
+
+# How often a UI should drain the channel, in milliseconds
+DRAIN_INTERVAL_MS = 100
+
+
+class EventChannel:
+    """Coalescing queue of progress, status, log lines and UI callbacks"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._progress = None
+        self._status = None
+        self._lines = []
+        self._calls = []
+
+    def progress(self, value):
+        """Set the latest progress value (0-100)"""
+        self._progress = value
+
+    def status(self, text):
+        """Set the latest status line"""
+        self._status = text
+
+    def log(self, message):
+        """Queue a log line, stamped with the time it was posted"""
+        line = f"[{datetime.now().strftime('%H:%M:%S')}] {message}"
+        with self._lock:
+            self._lines.append(line)
+
+    def call(self, fn, *args):
+        """Run fn(*args) on the UI thread at the next drain"""
+        with self._lock:
+            self._calls.append((fn, args))
+
+    def drain(self):
+        """Take everything posted since the last drain.
+
+        Returns (progress, status, lines, calls); progress and status are
+        None when they weren't updated.
+        """
+        with self._lock:
+            progress, self._progress = self._progress, None
+            status, self._status = self._status, None
+            lines, self._lines = self._lines, []
+            calls, self._calls = self._calls, []
+        return progress, status, lines, calls
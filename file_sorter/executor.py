@@ -0,0 +1,152 @@
+"""Worker pool for the move phase of a sort.
+
+Moving files is I/O bound, and on network shares or across devices every
+move is a copy plus a delete, so a single thread leaves most of the
+bandwidth unused. ``BoundedExecutor`` runs move jobs on a fixed number of
+threads. ``submit`` blocks once enough work is queued, so a fast scanner
+can't buffer the whole tree in memory.
+
+``DestinationFolder`` serializes the one step that must not race: picking a
+free file name inside a category folder.
+"""
+
+import os
+import threading
+
+from .mover import device_of
+
+# Local renames are fast enough that extra threads only add overhead;
+# raise the workers setting for network shares and cross-device sorts.
+DEFAULT_WORKERS = 1
+
+
+class BoundedExecutor:
+    """Thread pool whose submit() blocks while max_pending jobs are queued.
+
+    With a single worker jobs run inline in the submitting thread, which
+    keeps the old strictly sequential behaviour. An exception escaping a job
+    is raised the same way with more workers: the first one is kept and
+    raised by the next submit() or by shutdown(), after the running jobs
+    have finished.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_pending=None):
+        self.workers = max(1, int(workers))
+        self._pool = None
+        self._error = None
+        self._error_lock = threading.Lock()
+        if self.workers > 1:
+            # Imported here: concurrent.futures pulls in logging, which
+            # single-worker sorts and quick commands don't need
+            from concurrent.futures import ThreadPoolExecutor
+            self._slots = threading.BoundedSemaphore(max_pending or self.workers * 4)
+            self._pool = ThreadPoolExecutor(max_workers=self.workers,
+                                            thread_name_prefix='file-sorter-move')
+
+    def submit(self, fn, *args):
+        """Run fn(*args) on a worker; an exception escaping fn fails the whole pool"""
+        if self._pool is None:
+            fn(*args)
+            return
+
+        self._raise_error()
+        self._slots.acquire()
+        try:
+            future = self._pool.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(self._job_done)
+
+    def _job_done(self, future):
+        self._slots.release()
+        if not future.cancelled() and future.exception() is not None:
+            with self._error_lock:
+                if self._error is None:
+                    self._error = future.exception()
+
+    def _raise_error(self):
+        with self._error_lock:
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def shutdown(self):
+        """Wait for all submitted jobs to finish; raises the first error a job raised"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.shutdown()
+        elif self._pool is not None:
+            # Already failing; let the jobs finish without raising theirs on top
+            self._pool.shutdown(wait=True)
+
+
+class DestinationFolder:
+    """A category folder that several workers move files into.
+
+    Instead of probing ``os.path.exists`` for ``name_1.ext``, ``name_2.ext``,
+    ... on every clash, the folder keeps an index of the names it holds,
+    seeded by a single scandir the first time a name is needed and updated
+    as moves are handed out. reserve() returns a free destination in O(1)
+    amortized time; release() gives the name back if the move failed.
+
+    The index can go stale when another process writes into the folder,
+    so movers must create the destination exclusively and raise
+    FileExistsError on a clash; the caller then simply reserves again (the
+    clashing name stays marked as taken). ``device`` is looked up once so
+    movers can decide between a rename and a copy without stat'ing the
+    folder per file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.device = device_of(path)
+        self._lock = threading.Lock()
+        self._names = None
+        # Next suffix to try per (stem, ext), so repeated clashes don't rescan
+        self._next_counter = {}
+
+    def _load_names(self):
+        names = set()
+        try:
+            with os.scandir(self.path) as it:
+                for entry in it:
+                    names.add(os.path.normcase(entry.name))
+        except OSError:
+            pass
+        return names
+
+    def reserve(self, filename):
+        """Pick and reserve a free destination path for filename"""
+        with self._lock:
+            if self._names is None:
+                self._names = self._load_names()
+            names = self._names
+
+            candidate = filename
+            if os.path.normcase(candidate) in names:
+                # Handle duplicate filenames
+                name, ext = os.path.splitext(filename)
+                key = (name, ext)
+                counter = self._next_counter.get(key, 1)
+                candidate = f"{name}_{counter}{ext}"
+                while os.path.normcase(candidate) in names:
+                    counter += 1
+                    candidate = f"{name}_{counter}{ext}"
+                self._next_counter[key] = counter + 1
+
+            names.add(os.path.normcase(candidate))
+            return os.path.join(self.path, candidate)
+
+    def release(self, destination):
+        """Free a reserved name after its move failed"""
+        with self._lock:
+            if self._names is not None:
+                self._names.discard(os.path.normcase(os.path.basename(destination)))
@@ -0,0 +1,334 @@
+"""Append-only on-disk journal of sort operations.
+
+Every sort writes one journal file while it runs, so an operation can be
+undone after the program exits or even after a crash in the middle of a
+sort. Each line is a small JSON array:
+
+    ["H", {"id": ..., "timestamp": ..., "directory": ...}]   header
+    ["D", 3, "/data/inbox/photos"]                            directory table
+    ["M", 3, "IMG_0001.jpg", 7, "IMG_0001_2.jpg", "rename", 52311]
+    ["F", 7]                                                  folder created
+    ["C", {"moved_files": ..., ...}]                          commit
+    ["U", 120]                                                 undone
+
+A "U" line is written when an undo is cancelled part way: the newest
+120 moves before it have been moved back, so a later undo skips them.
+"F" lines name the folders a view created, which its undo removes again.
+
+Directories are interned: a path is written once as a "D" line and moves
+refer to it by number, so a million moves out of a few folders cost a few
+dozen bytes each. Every record goes out with a single os.write(), so it
+survives a crash of the process; fsync() is batched so it doesn't throttle
+the move loop. A journal without a "C" line belongs to an interrupted sort.
+
+Undo reads a journal backwards block by block and never holds more than
+the directory table in memory.
+"""
+
+import os
+import json
+import time
+import threading
+from datetime import datetime
+
+JOURNAL_DIR = 'file_sorter_journal'
+JOURNAL_SUFFIX = '.journal'
+
+# fsync after this many records or this many seconds, whichever is first
+FSYNC_EVERY = 1000
+FSYNC_INTERVAL = 1.0
+
+_READ_BLOCK = 64 * 1024
+
+
+def _encode(record):
+    return (json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8', 'surrogatepass')
+
+
+def _decode(line):
+    try:
+        record = json.loads(line.decode('utf-8', 'surrogatepass'))
+    except ValueError:
+        # Torn last line after a crash
+        return None
+    return record if isinstance(record, list) and record else None
+
+
+def _ends_with_newline(path):
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+
+class JournalWriter:
+    """Appends move records to one journal file; safe to use from many threads"""
+
+    def __init__(self, path, header=None, fsync_every=FSYNC_EVERY, fsync_interval=FSYNC_INTERVAL):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._dirs = {}
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        # Moves already in the file when an interrupted journal is reopened
+        self.previous_moves = 0
+
+        resuming = header is None
+        if resuming:
+            # Reopen an existing journal; reload its directory table
+            for record in iter_records(path):
+                if record[0] == 'D':
+                    self._dirs[record[2]] = record[1]
+                elif record[0] == 'M':
+                    self.previous_moves += 1
+                elif record[0] == 'U':
+                    self.previous_moves -= record[1]
+
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        if resuming and not _ends_with_newline(path):
+            # Terminate a line torn by the crash so the next record parses
+            os.write(self._fd, b'\n')
+        if not resuming:
+            self._write(['H', header])
+            self.sync()
+
+    @property
+    def operation_id(self):
+        """The id of the operation, which is also the journal's file name"""
+        return os.path.basename(self.path)[:-len(JOURNAL_SUFFIX)]
+
+    def _write(self, record):
+        os.write(self._fd, _encode(record))
+
+    def _dir_id(self, path):
+        dir_id = self._dirs.get(path)
+        if dir_id is None:
+            dir_id = self._dirs[path] = len(self._dirs)
+            self._write(['D', dir_id, path])
+        return dir_id
+
+    def record_move(self, source, destination, strategy, size):
+        """Append one completed move"""
+        source_dir, source_name = os.path.split(source)
+        dest_dir, dest_name = os.path.split(destination)
+        with self._lock:
+            self._write(['M', self._dir_id(source_dir), source_name,
+                         self._dir_id(dest_dir), dest_name, strategy, size])
+            self._unsynced += 1
+            if (self._unsynced >= self.fsync_every
+                    or time.monotonic() - self._last_sync >= self.fsync_interval):
+                self._sync_locked()
+
+    def record_folder(self, path):
+        """Append a folder the operation created"""
+        with self._lock:
+            self._write(['F', self._dir_id(path)])
+
+    def _sync_locked(self):
+        os.fsync(self._fd)
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def sync(self):
+        """Force buffered records to stable storage"""
+        with self._lock:
+            self._sync_locked()
+
+    def commit(self, summary):
+        """Mark the operation complete and close the journal"""
+        with self._lock:
+            self._write(['C', summary])
+            self._sync_locked()
+        self.close()
+
+    def record_undone(self, count):
+        """Note that the newest count moves were moved back, and close the journal"""
+        with self._lock:
+            self._write(['U', count])
+            self._sync_locked()
+        self.close()
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+def iter_records(path):
+    """Yield the records of a journal file from first to last"""
+    with open(path, 'rb') as f:
+        for line in f:
+            record = _decode(line)
+            if record is not None:
+                yield record
+
+
+def iter_records_reversed(path):
+    """Yield the records of a journal file from last to first"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        tail = b''
+        while position > 0:
+            size = min(_READ_BLOCK, position)
+            position -= size
+            f.seek(position)
+            lines = (f.read(size) + tail).split(b'\n')
+            # The first piece may be the end of a line from the previous block
+            tail = lines.pop(0)
+            for line in reversed(lines):
+                if line:
+                    record = _decode(line)
+                    if record is not None:
+                        yield record
+        if tail:
+            record = _decode(tail)
+            if record is not None:
+                yield record
+
+
+def read_directory_table(path):
+    """Return {dir_id: path} for a journal, reading it forward once"""
+    return {record[1]: record[2] for record in iter_records(path) if record[0] == 'D'}
+
+
+def read_created_folders(path):
+    """Return the folders recorded as created by a journal's operation"""
+    dirs = {}
+    folders = []
+    for record in iter_records(path):
+        if record[0] == 'D':
+            dirs[record[1]] = record[2]
+        elif record[0] == 'F':
+            folders.append(dirs[record[1]])
+    return folders
+
+
+def iter_moves_reversed(path):
+    """Yield (source, destination) for every move of a journal, newest first.
+
+    Moves already moved back by a cancelled undo are left out.
+    """
+    dirs = read_directory_table(path)
+    undone = 0
+    for record in iter_records_reversed(path):
+        if record[0] == 'U':
+            undone += record[1]
+        elif record[0] == 'M':
+            if undone:
+                undone -= 1
+                continue
+            yield (os.path.join(dirs[record[1]], record[2]),
+                   os.path.join(dirs[record[3]], record[4]))
+
+
+def history_slots(operations):
+    """Group operations into history slots, oldest first.
+
+    Operations of one batch job (same 'batch' id) share a slot, so a
+    batch over many roots counts as one entry against the history limit.
+    """
+    slots = []
+    batches = {}
+    for operation in operations:
+        batch = operation.get('batch')
+        if batch is None:
+            slots.append([operation])
+        elif batch in batches:
+            batches[batch].append(operation)
+        else:
+            batches[batch] = [operation]
+            slots.append(batches[batch])
+    return slots
+
+
+def read_summary(path):
+    """Return the operation dict for a journal without reading its moves.
+
+    The result has the header fields, the commit summary (if any), the
+    journal path and 'complete' telling whether the sort finished, plus
+    'undone' when a cancelled undo already moved some files back.
+    """
+    operation = {'journal': path, 'complete': False}
+    with open(path, 'rb') as f:
+        header = _decode(f.readline())
+    if header and header[0] == 'H':
+        operation.update(header[1])
+    undone = 0
+    for record in iter_records_reversed(path):
+        if record[0] == 'U':
+            undone += record[1]
+            continue
+        if record[0] == 'C':
+            operation.update(record[1])
+            operation['complete'] = True
+        break
+    if undone:
+        operation['undone'] = undone
+    return operation
+
+
+class JournalStore:
+    """The directory holding one journal file per operation"""
+
+    def __init__(self, directory=JOURNAL_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._started = set()
+
+    def paths(self):
+        """Journal files, oldest first"""
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith(JOURNAL_SUFFIX)]
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self.directory, name) for name in sorted(names)]
+
+    def start(self, directory, batch=None, view=None):
+        """Create the journal for a new sort of directory; view is its view mode, if any"""
+        os.makedirs(self.directory, exist_ok=True)
+        now = datetime.now()
+        with self._lock:
+            # Sorts of a batch job can start in the same microsecond
+            operation_id = now.strftime('%Y%m%d-%H%M%S-%f')
+            suffix = 0
+            while operation_id in self._started or os.path.exists(
+                    os.path.join(self.directory, operation_id + JOURNAL_SUFFIX)):
+                suffix += 1
+                operation_id = f"{now.strftime('%Y%m%d-%H%M%S-%f')}-{suffix}"
+            self._started.add(operation_id)
+        path = os.path.join(self.directory, operation_id + JOURNAL_SUFFIX)
+        header = {
+            'id': operation_id,
+            'timestamp': now.isoformat(),
+            'directory': directory
+        }
+        if batch is not None:
+            header['batch'] = batch
+        if view is not None:
+            header['view'] = view
+        return JournalWriter(path, header)
+
+    def operations(self):
+        """Summaries of all journaled operations, oldest first"""
+        return [read_summary(path) for path in self.paths()]
+
+    def discard(self, path):
+        """Delete a journal once its operation has been undone"""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def prune(self, keep):
+        """Delete the complete journals of the oldest history slots beyond keep"""
+        complete = [operation for operation in self.operations() if operation['complete']]
+        slots = history_slots(complete)
+        for slot in slots[:-keep] if keep else slots:
+            for operation in slot:
+                self.discard(operation['journal'])
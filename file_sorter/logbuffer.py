@@ -0,0 +1,95 @@
+"""Bounded in-memory log with an optional rotating file on disk.
+
+A Tk text widget gets slow and memory hungry after a few hundred thousand
+lines. ``LogBuffer`` keeps the newest ``max_lines`` lines in a ring buffer
+for display and search; when a spill file is configured every line is
+also appended there, so nothing is lost. The spill file is rotated like a
+log file (``sorter.log``, ``sorter.log.1``, ...) once it grows past
+``max_bytes``.
+"""
+
+import os
+from collections import deque
+
+DEFAULT_MAX_LINES = 5000
+DEFAULT_SPILL_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_SPILL_BACKUPS = 3
+
+
+class LogBuffer:
+    """Ring buffer of log lines, optionally mirrored to a rotating file"""
+
+    def __init__(self, max_lines=DEFAULT_MAX_LINES, spill_path=None,
+                 spill_max_bytes=DEFAULT_SPILL_MAX_BYTES, spill_backups=DEFAULT_SPILL_BACKUPS):
+        self.max_lines = max(1, int(max_lines))
+        self.spill_path = spill_path
+        self.spill_max_bytes = spill_max_bytes
+        self.spill_backups = spill_backups
+        self._lines = deque(maxlen=self.max_lines)
+        self._spill = None
+
+    def __len__(self):
+        return len(self._lines)
+
+    def append(self, lines):
+        """Add lines; returns how many old lines fell out of the buffer"""
+        dropped = max(0, len(self._lines) + len(lines) - self.max_lines)
+        self._lines.extend(lines)
+        if self.spill_path:
+            self._write_spill(lines)
+        return dropped
+
+    def lines(self):
+        """All retained lines, oldest first"""
+        return list(self._lines)
+
+    def search(self, text):
+        """Retained lines containing text (case-insensitive)"""
+        text = text.lower()
+        return [line for line in self._lines if text in line.lower()]
+
+    def configure(self, max_lines, spill_path=None):
+        """Change the retained line limit and the spill file"""
+        self.max_lines = max(1, int(max_lines))
+        self._lines = deque(self._lines, maxlen=self.max_lines)
+        if spill_path != self.spill_path:
+            self.close()
+            self.spill_path = spill_path
+
+    def clear(self):
+        """Forget the retained lines; the spill file is kept"""
+        self._lines.clear()
+
+    def _write_spill(self, lines):
+        try:
+            if self._spill is None:
+                directory = os.path.dirname(self.spill_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._spill = open(self.spill_path, 'a', encoding='utf-8', errors='replace')
+            self._spill.write("\n".join(lines) + "\n")
+            self._spill.flush()
+            if self._spill.tell() >= self.spill_max_bytes:
+                self._rotate()
+        except OSError:
+            # Logging must never break a sort; stop spilling
+            self.close()
+            self.spill_path = None
+
+    def _rotate(self):
+        self._spill.close()
+        self._spill = None
+        for index in range(self.spill_backups - 1, 0, -1):
+            older = f"{self.spill_path}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.spill_path}.{index + 1}")
+        if self.spill_backups > 0:
+            os.replace(self.spill_path, f"{self.spill_path}.1")
+        else:
+            os.remove(self.spill_path)
+
+    def close(self):
+        """Close the spill file"""
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
@@ -0,0 +1,214 @@
+"""Timers, counters and optional profiling for one operation.
+
+With the ``timings`` setting on, every sort, preview and undo gets a
+``Metrics`` object that the hot paths report into: time spent listing
+directories (scan), classifying files, picking free names in category
+folders (collisions), checking for duplicates, moving (by rename or by
+copy), journaling and calling back into the UI. At the end the engine
+logs a short table and attaches ``report()`` to the operation record.
+
+When the setting is off the engine passes ``None`` instead, and the hot
+paths skip their timing calls entirely; wrappers such as ``timed`` are
+only installed when there is something to report to.
+
+Timers add up the time of every call, so those running on several move
+workers can exceed the wall-clock time of the operation.
+
+The ``profile`` setting additionally runs ``cProfile`` ('cpu') or
+``tracemalloc`` ('memory') for the duration of the operation. cProfile
+only sees the thread that started the operation, which also does the
+moves when ``workers`` is 1. The full profile is written to a ``.prof``
+file (open it with ``python -m pstats``); the report keeps the top
+entries. Operations profiling memory at the same time share one
+tracemalloc session, so their peaks are those of the process.
+"""
+
+import io
+import os
+import time
+import threading
+from datetime import datetime
+
+PROFILE_MODES = ('off', 'cpu', 'memory')
+DEFAULT_PROFILE_MODE = 'off'
+PROFILE_DIR = 'file_sorter_profiles'
+
+# Lines of the profile kept in the report
+PROFILE_TOP = 15
+
+# Operations profiling memory at the moment, and whether they started
+# tracemalloc: the last one to finish stops it, and only if they did
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_owned = False
+
+
+class Metrics:
+    """Named timers and counters, safe to update from several threads"""
+
+    def __init__(self, profile=DEFAULT_PROFILE_MODE, profile_dir=None):
+        self._lock = threading.Lock()
+        # name -> [seconds, calls]
+        self.timers = {}
+        self.counters = {}
+        self.profile = profile
+        self.profile_dir = profile_dir
+        self._profiler = None
+        self._tracing = False
+        self._start = time.perf_counter()
+        if profile == 'cpu':
+            # pstats is imported now so the import doesn't show in the profile
+            import cProfile
+            import pstats
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                self._profiler = profiler
+            except ValueError:
+                # Another profiler is active, e.g. for a concurrent sort
+                pass
+        elif profile == 'memory':
+            global _tracemalloc_users, _tracemalloc_owned
+            import tracemalloc
+            with _tracemalloc_lock:
+                if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    _tracemalloc_owned = True
+                _tracemalloc_users += 1
+            self._tracing = True
+
+    def add_time(self, name, seconds, calls=1):
+        with self._lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                self.timers[name] = [seconds, calls]
+            else:
+                timer[0] += seconds
+                timer[1] += calls
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def timed(self, name, fn):
+        """Return fn wrapped so its run time is added to timer name"""
+        perf_counter = time.perf_counter
+        add_time = self.add_time
+
+        def wrapper(*args):
+            start = perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                add_time(name, perf_counter() - start)
+        return wrapper
+
+    def timed_iter(self, name, iterable):
+        """Yield the items of iterable, adding the time spent producing them to name"""
+        perf_counter = time.perf_counter
+        it = iter(iterable)
+        seconds = 0.0
+        calls = 0
+        try:
+            while True:
+                start = perf_counter()
+                try:
+                    item = next(it)
+                except StopIteration:
+                    seconds += perf_counter() - start
+                    return
+                seconds += perf_counter() - start
+                calls += 1
+                yield item
+        finally:
+            close = getattr(it, 'close', None)
+            if close is not None:
+                close()
+            self.add_time(name, seconds, calls)
+
+    def report(self):
+        """Stop profiling and return the timings as a JSON-friendly dict"""
+        report = {
+            'seconds': round(time.perf_counter() - self._start, 6),
+            'timers': {name: {'seconds': round(seconds, 6), 'calls': calls}
+                       for name, (seconds, calls) in sorted(self.timers.items(),
+                                                            key=lambda item: -item[1][0])},
+            'counters': dict(sorted(self.counters.items()))
+        }
+        if self.profile == 'cpu' and self._profiler is not None:
+            report['profile'] = self._finish_cpu_profile()
+        elif self.profile == 'memory':
+            report['profile'] = self._finish_memory_profile()
+        return report
+
+    def _profile_path(self, suffix):
+        if not self.profile_dir:
+            return None
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+        except OSError:
+            return None
+        name = datetime.now().strftime('%Y%m%d-%H%M%S-%f') + suffix
+        return os.path.join(self.profile_dir, name)
+
+    def _finish_cpu_profile(self):
+        import pstats
+        profiler, self._profiler = self._profiler, None
+        profiler.disable()
+        text = io.StringIO()
+        stats = pstats.Stats(profiler, stream=text)
+        stats.sort_stats('cumulative').print_stats(PROFILE_TOP)
+        profile = {'mode': 'cpu', 'top': [line.rstrip() for line in text.getvalue().splitlines()
+                                          if line.strip()]}
+        path = self._profile_path('.prof')
+        if path:
+            try:
+                stats.dump_stats(path)
+                profile['path'] = path
+            except OSError:
+                pass
+        return profile
+
+    def _finish_memory_profile(self):
+        global _tracemalloc_users, _tracemalloc_owned
+        import tracemalloc
+        if not self._tracing:
+            return {'mode': 'memory'}
+        self._tracing = False
+        with _tracemalloc_lock:
+            if not tracemalloc.is_tracing():
+                # Stopped by someone else
+                _tracemalloc_users -= 1
+                return {'mode': 'memory'}
+            snapshot = tracemalloc.take_snapshot()
+            # Shared by operations profiled at the same time
+            current, peak = tracemalloc.get_traced_memory()
+            _tracemalloc_users -= 1
+            if _tracemalloc_users == 0 and _tracemalloc_owned:
+                tracemalloc.stop()
+                _tracemalloc_owned = False
+        top = snapshot.statistics('lineno')[:PROFILE_TOP]
+        return {
+            'mode': 'memory',
+            'current_bytes': current,
+            'peak_bytes': peak,
+            'top': [f"{stat.size / 1024:.1f} KiB in {stat.count} blocks: {stat.traceback[0]}"
+                    for stat in top]
+        }
+
+
+def format_report(report):
+    """Lines describing a report, for the results log"""
+    lines = [f"Timings ({report['seconds']:.3f} s in total):"]
+    for name, timer in report['timers'].items():
+        lines.append(f"  {name:<22} {timer['seconds']:>10.3f} s  {timer['calls']:>9} calls")
+    for name, value in report['counters'].items():
+        lines.append(f"  {name:<22} {value:>10}")
+    profile = report.get('profile')
+    if profile:
+        if profile['mode'] == 'memory' and 'peak_bytes' in profile:
+            lines.append(f"Memory peak: {profile['peak_bytes'] / (1024 * 1024):.1f} MiB")
+        if profile.get('path'):
+            lines.append(f"Profile saved to {profile['path']}")
+        lines.extend(f"  {line}" for line in profile.get('top', ()))
+    return lines
@@ -0,0 +1,231 @@
+"""Move strategies used by sort and undo.
+
+``shutil.move`` silently falls back to copy + delete when the destination
+is on another device and doesn't say which path it took. ``Mover`` makes
+that choice explicit: a single rename call when source and destination
+share a device, otherwise a zero-copy ``copy_file_range``/``sendfile`` copy
+(or a chunked read/write where those aren't available), a size check, and
+only then the removal of the source. Every move reports the strategy it
+used and the number of bytes copied so operation records can show where
+the time went.
+
+Moves never replace an existing destination: renames use
+``renameat2(RENAME_NOREPLACE)`` (or a hard link + unlink) on POSIX, and
+copies create the destination exclusively, so a name taken by another
+process in the meantime surfaces as FileExistsError instead of data loss.
+"""
+
+import os
+import sys
+import stat
+import errno
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Strategy names recorded per move
+RENAME = 'rename'
+COPY_FILE_RANGE = 'copy_file_range'
+SENDFILE = 'sendfile'
+CHUNKED = 'chunked'
+SYMLINK = 'symlink'
+HARDLINK = 'hardlink'
+FALLBACK = 'shutil'
+
+# Errors meaning "this zero-copy call can't be used here, try the next one"
+_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EBADF,
+                getattr(errno, 'EOPNOTSUPP', errno.EINVAL),
+                getattr(errno, 'ENOTSUP', errno.EINVAL)}
+
+_WINDOWS_NOT_SAME_DEVICE = 17
+
+
+def _is_cross_device(error):
+    return (error.errno == errno.EXDEV
+            or getattr(error, 'winerror', None) == _WINDOWS_NOT_SAME_DEVICE)
+
+
+_AT_FDCWD = -100
+_RENAME_NOREPLACE = 1
+
+# renameat2 from libc, looked up on first use; False when unavailable
+_renameat2 = None
+
+
+def _load_renameat2():
+    global _renameat2
+    _renameat2 = False
+    if not sys.platform.startswith('linux'):
+        return
+    try:
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        func = libc.renameat2
+    except (OSError, AttributeError):
+        return
+    func.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+    func.restype = ctypes.c_int
+    _renameat2 = func
+
+
+def rename_noreplace(source, destination, source_stat=None):
+    """Rename source to destination, raising FileExistsError if it exists"""
+    if os.name == 'nt':
+        # Windows never replaces an existing file on rename
+        os.rename(source, destination)
+        return
+
+    if _renameat2 is None:
+        _load_renameat2()
+    if _renameat2:
+        import ctypes
+        if _renameat2(_AT_FDCWD, os.fsencode(source), _AT_FDCWD,
+                      os.fsencode(destination), _RENAME_NOREPLACE) == 0:
+            return
+        err = ctypes.get_errno()
+        if err not in (errno.EINVAL, errno.ENOSYS):
+            raise OSError(err, os.strerror(err), source, None, destination)
+        # The filesystem doesn't support the flag; fall through
+
+    st = source_stat or os.lstat(source)
+    if stat.S_ISREG(st.st_mode):
+        try:
+            # link() fails atomically if destination exists
+            os.link(source, destination)
+        except FileExistsError:
+            raise
+        except OSError as e:
+            if e.errno == errno.EXDEV:
+                raise
+        else:
+            os.unlink(source)
+            return
+
+    # Last resort for filesystems without hard links: check, then rename
+    if os.path.lexists(destination):
+        raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), destination)
+    os.rename(source, destination)
+
+
+def device_of(path):
+    """Return the device id of path, or None if it can't be determined"""
+    try:
+        return os.stat(path).st_dev
+    except OSError:
+        return None
+
+
+class Mover:
+    """Moves single files, picking the cheapest strategy for each one"""
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.chunk_size = max(64 * 1024, int(chunk_size))
+
+    def move(self, source, destination, dest_device=None, source_stat=None):
+        """Move source to destination and return (strategy, bytes).
+
+        dest_device is the device of the destination folder; callers moving
+        many files into one folder look it up once and pass it in. Raises
+        FileExistsError if destination already exists.
+        """
+        st = source_stat or os.lstat(source)
+        if dest_device is None:
+            dest_device = device_of(os.path.dirname(destination))
+
+        if dest_device is None or st.st_dev == dest_device:
+            try:
+                rename_noreplace(source, destination, st)
+                return RENAME, st.st_size
+            except OSError as e:
+                # Bind mounts share st_dev but still refuse renames
+                if not _is_cross_device(e):
+                    raise
+
+        return self._copy_and_unlink(source, destination, st)
+
+    def _copy_and_unlink(self, source, destination, st):
+        if stat.S_ISLNK(st.st_mode):
+            # symlink() never replaces an existing destination
+            os.symlink(os.readlink(source), destination)
+            os.unlink(source)
+            return SYMLINK, 0
+
+        if not stat.S_ISREG(st.st_mode):
+            if os.path.lexists(destination):
+                raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), destination)
+            import shutil
+            shutil.move(source, destination)
+            return FALLBACK, st.st_size
+
+        with open(source, 'rb') as fsrc:
+            try:
+                with open(destination, 'xb') as fdst:
+                    strategy, copied = self._copy_data(fsrc.fileno(), fdst.fileno())
+                import shutil
+                shutil.copystat(source, destination)
+
+                # Verify size before removing the source
+                written = os.stat(destination).st_size
+                if copied != st.st_size or written != st.st_size:
+                    raise OSError(errno.EIO,
+                                  f"Size mismatch after copy ({written} of {st.st_size} bytes)",
+                                  destination)
+            except BaseException:
+                try:
+                    os.unlink(destination)
+                except OSError:
+                    pass
+                raise
+
+        os.unlink(source)
+        return strategy, copied
+
+    def _copy_data(self, fd_in, fd_out):
+        """Copy all of fd_in to fd_out, returning (strategy, bytes)"""
+        chunk_size = self.chunk_size
+
+        if hasattr(os, 'copy_file_range'):
+            copied = self._zero_copy(os.copy_file_range, fd_in, fd_out, chunk_size)
+            if copied is not None:
+                return COPY_FILE_RANGE, copied
+
+        # sendfile() only accepts regular file destinations on Linux
+        if sys.platform.startswith('linux') and hasattr(os, 'sendfile'):
+            copied = self._zero_copy(
+                lambda src, dst, count: os.sendfile(dst, src, None, count),
+                fd_in, fd_out, chunk_size)
+            if copied is not None:
+                return SENDFILE, copied
+
+        copied = 0
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        with open(fd_in, 'rb', buffering=0, closefd=False) as fsrc, \
+                open(fd_out, 'wb', buffering=0, closefd=False) as fdst:
+            while True:
+                n = fsrc.readinto(buffer)
+                if not n:
+                    break
+                # Raw writes may be short (network and FUSE filesystems, signals)
+                done = 0
+                while done < n:
+                    written = fdst.write(view[done:n])
+                    if not written:
+                        raise OSError(errno.EIO, "Write made no progress")
+                    done += written
+                copied += n
+        return CHUNKED, copied
+
+    @staticmethod
+    def _zero_copy(call, fd_in, fd_out, chunk_size):
+        """Run a copy_file_range style call to EOF; None if it isn't supported"""
+        copied = 0
+        while True:
+            try:
+                n = call(fd_in, fd_out, chunk_size)
+            except OSError as e:
+                if copied == 0 and e.errno in _UNSUPPORTED:
+                    return None
+                raise
+            if n == 0:
+                return copied
+            copied += n
@@ -0,0 +1,156 @@
+"""Move plans: every move of a sort, decided before anything is moved.
+
+``SortEngine.plan`` scans a directory once and returns a ``MovePlan``:
+the preview summary plus one entry per file to move, holding the source,
+the destination folder and the free name picked there (collisions are
+resolved at planning time, against the folder contents and the other
+planned moves), the expected strategy, and the size and mtime the source
+had. ``SortEngine.execute_plan`` then carries it out without scanning
+again; a source whose size or mtime no longer match is left alone.
+
+Folder paths are kept once in a table and moves refer to them by index;
+the rest of a move lives in array buffers (see compact.py), so a plan
+costs little more than the file names it contains. Plans can be saved as
+JSON and executed later, e.g. after someone has reviewed them.
+"""
+
+import os
+import json
+import threading
+from array import array
+from datetime import datetime
+
+from .compact import DirectoryTable, NameBuffer, NameTable
+from .mover import RENAME
+
+PLAN_VERSION = 1
+
+# Strategy predicted for moves to another device (the mover picks the copy call)
+COPY = 'copy'
+
+
+class MovePlan:
+    """The moves a sort of directory will make, with destination names decided"""
+
+    def __init__(self, directory, summary=None, created=None):
+        self.directory = directory
+        self.summary = summary if summary is not None else {}
+        self.created = created or datetime.now().isoformat()
+        # Folder paths; moves refer to them by index
+        self.folders = DirectoryTable()
+        # Destination folder index -> the category or rule target it holds
+        self.labels = {}
+        # One entry per move in each of these
+        self._sources = array('I')
+        self._names = NameBuffer()
+        self._targets = array('I')
+        self._sizes = array('Q')
+        self._mtimes = array('q')
+        self._strategies = NameTable()
+        # Index -> destination name, for moves that rename the file
+        self._renamed = {}
+
+    def __len__(self):
+        return len(self._names)
+
+    def folder_id(self, path):
+        return self.folders.id(path)
+
+    def add(self, entry, st, label, folder, destination_name, strategy):
+        """Plan to move entry (stat result st) into folder as destination_name"""
+        self._append(self.folder_id(os.path.dirname(entry.path)), entry.name,
+                     self.folder_id(folder), destination_name, st.st_size, st.st_mtime_ns,
+                     strategy)
+        self.labels.setdefault(self._targets[-1], label)
+
+    def _append(self, source_id, name, folder_id, destination_name, size, mtime_ns, strategy):
+        if destination_name is not None and destination_name != name:
+            self._renamed[len(self._names)] = destination_name
+        self._sources.append(source_id)
+        self._names.append(name)
+        self._targets.append(folder_id)
+        self._sizes.append(size)
+        self._mtimes.append(mtime_ns)
+        self._strategies.append(strategy)
+
+    def _rows(self):
+        """Yield the moves as (source folder, name, destination folder,
+        destination name or None, size, mtime_ns, strategy)"""
+        renamed = self._renamed
+        strategies = self._strategies
+        for index, name in enumerate(self._names):
+            yield (self._sources[index], name, self._targets[index], renamed.get(index),
+                   self._sizes[index], self._mtimes[index], strategies[index])
+
+    def iter_moves(self):
+        """Yield (source, label, folder, destination_name, size, mtime_ns, strategy)"""
+        folders = self.folders.paths
+        labels = self.labels
+        join = os.path.join
+        for source_id, name, folder_id, destination_name, *rest in self._rows():
+            yield (join(folders[source_id], name), labels[folder_id], folders[folder_id],
+                   destination_name or name, *rest)
+
+    def total_size(self):
+        """Bytes of all planned moves"""
+        return sum(self._sizes)
+
+    def strategies(self):
+        """Number of planned moves per expected strategy"""
+        names = self._strategies.names
+        counts = dict.fromkeys(names, 0)
+        for strategy_id in self._strategies.ids:
+            counts[names[strategy_id]] += 1
+        return counts
+
+    def to_dict(self):
+        return {
+            'version': PLAN_VERSION,
+            'directory': self.directory,
+            'created': self.created,
+            'summary': self.summary,
+            'folders': self.folders.paths,
+            'labels': {str(folder_id): label for folder_id, label in self.labels.items()},
+            'moves': list(self._rows())
+        }
+
+    def save(self, path):
+        """Write the plan to path as JSON"""
+        data = json.dumps(self.to_dict(), separators=(',', ':'))
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def from_dict(cls, data):
+        if not isinstance(data, dict) or data.get('version') != PLAN_VERSION:
+            raise ValueError("not a move plan, or one written by another version")
+        try:
+            plan = cls(data['directory'], data.get('summary'), data.get('created'))
+            for folder in data['folders']:
+                plan.folder_id(folder)
+            plan.labels = {int(folder_id): label for folder_id, label in data['labels'].items()}
+            count = len(plan.folders)
+            for move in data['moves']:
+                source_id, name, folder_id, destination_name, size, mtime_ns, strategy = move
+                if not (0 <= source_id < count and folder_id in plan.labels):
+                    raise ValueError(f"move of {name!r} refers to an unknown folder")
+                plan._append(source_id, name, folder_id, destination_name, size, mtime_ns,
+                             strategy)
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"malformed move plan: {e}")
+        return plan
+
+    @classmethod
+    def load(cls, path):
+        """Read a plan written by save(); raises ValueError if it isn't one"""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+
+def predict_strategy(source_stat, folder_device):
+    """The strategy a move will most likely use"""
+    if folder_device is None or source_stat.st_dev == folder_device:
+        return RENAME
+    return COPY
@@ -0,0 +1,186 @@
+"""Byte-weighted progress, throughput and ETA of a running operation.
+
+Counting moved files makes one 40 GB video weigh as much as a 2 KB text
+file, so a file-count progress bar says little about how long a mixed
+tree will take. A ``ProgressTracker`` counts bytes as well: the sort adds
+each file's size (from the stat the scan already made) when it queues
+the move, and again when the move is done. Progress is the fraction of
+the bytes done, or of the files when there are no bytes to weigh.
+
+Throughput in files/s and bytes/s is smoothed with an exponentially
+weighted moving average over samples taken at most every
+``SAMPLE_INTERVAL`` seconds, so the ETA follows the recent rate without
+jumping with every small file. While a sort is still scanning, the
+totals only cover the files found so far.
+
+One tracker may be shared by several sorts (a batch job); each of them
+adds its own files. ``snapshot()`` can be called from any thread.
+"""
+
+import math
+import time
+import threading
+
+# Seconds between throughput samples
+SAMPLE_INTERVAL = 0.5
+
+# Time constant of the moving average, in seconds: older rates fade out
+# with exp(-age / SMOOTHING)
+SMOOTHING = 5.0
+
+
+def rates(files, size, seconds):
+    """Totals of a finished operation: files, bytes, seconds and average rates"""
+    return {
+        'files': files,
+        'bytes': size,
+        'seconds': round(seconds, 3),
+        'files_per_second': round(files / seconds, 1) if seconds > 0 else None,
+        'bytes_per_second': round(size / seconds) if seconds > 0 else None
+    }
+
+
+def format_size(size):
+    """Size in bytes as a short human readable string"""
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if abs(size) < 1024 or unit == 'TB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def format_duration(seconds):
+    """Seconds as h:mm:ss or m:ss"""
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+def describe(snapshot):
+    """Status line for a snapshot, like: 1.2 GB of 4.0 GB, 350 files/s, 85.0 MB/s, 0:32 left"""
+    if snapshot['bytes_total']:
+        text = (f"{format_size(snapshot['bytes_done'])} of "
+                f"{format_size(snapshot['bytes_total'])}")
+    else:
+        text = f"{snapshot['files_done']} of {snapshot['files_total']} files"
+    if snapshot['scanning']:
+        text += " found so far"
+    if snapshot['files_per_second'] is not None:
+        text += (f", {snapshot['files_per_second']:.0f} files/s, "
+                 f"{format_size(snapshot['bytes_per_second'])}/s")
+    if snapshot['eta_seconds'] is not None and not snapshot['scanning']:
+        text += f", {format_duration(snapshot['eta_seconds'])} left"
+    return text
+
+
+class ProgressTracker:
+    """Files and bytes queued and done, with smoothed rates; thread-safe"""
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.files_total = 0
+        self.bytes_total = 0
+        self.files_done = 0
+        self.bytes_done = 0
+        self._scans = 0
+        self._started = None
+        # Last sample: (time, files_done, bytes_done)
+        self._sample = None
+        self._files_rate = None
+        self._bytes_rate = None
+
+    def begin_scan(self):
+        """A sort started finding files; totals grow until end_scan"""
+        with self._lock:
+            self._scans += 1
+            if self._started is None:
+                self._started = self._clock()
+                self._sample = (self._started, self.files_done, self.bytes_done)
+
+    def end_scan(self):
+        with self._lock:
+            self._scans = max(0, self._scans - 1)
+
+    def expect(self, files, size):
+        """Add files totalling size bytes to the work to do"""
+        with self._lock:
+            self.files_total += files
+            self.bytes_total += size
+            if self._started is None:
+                self._started = self._clock()
+                self._sample = (self._started, self.files_done, self.bytes_done)
+
+    def drop(self, files, size):
+        """Take expected files that won't be done (skipped, failed) off the totals"""
+        with self._lock:
+            self.files_total = max(self.files_done, self.files_total - files)
+            self.bytes_total = max(self.bytes_done, self.bytes_total - size)
+
+    def advance(self, files, size):
+        """Count files totalling size bytes as done"""
+        with self._lock:
+            self.files_done += files
+            self.bytes_done += size
+            # Files done but never expected still count towards the totals
+            self.files_total = max(self.files_total, self.files_done)
+            self.bytes_total = max(self.bytes_total, self.bytes_done)
+            self._update_rates(self._clock())
+
+    def _update_rates(self, now):
+        if self._sample is None:
+            self._started = self._started or now
+            self._sample = (now, 0, 0)
+        then, files, size = self._sample
+        elapsed = now - then
+        if elapsed < SAMPLE_INTERVAL:
+            return
+        files_rate = (self.files_done - files) / elapsed
+        bytes_rate = (self.bytes_done - size) / elapsed
+        if self._files_rate is None:
+            self._files_rate, self._bytes_rate = files_rate, bytes_rate
+        else:
+            # Weight of the new sample grows with the time it covers
+            weight = 1 - math.exp(-elapsed / SMOOTHING)
+            self._files_rate += weight * (files_rate - self._files_rate)
+            self._bytes_rate += weight * (bytes_rate - self._bytes_rate)
+        self._sample = (now, self.files_done, self.bytes_done)
+
+    def fraction(self):
+        """Share of the work done, 0.0-1.0: by bytes, or by files if there are none"""
+        with self._lock:
+            return self._fraction()
+
+    def _fraction(self):
+        if self.bytes_total:
+            return min(1.0, self.bytes_done / self.bytes_total)
+        if self.files_total:
+            return min(1.0, self.files_done / self.files_total)
+        return 0.0
+
+    def snapshot(self):
+        """Counts, rates and ETA as a dict; rates and eta_seconds are None until measured"""
+        with self._lock:
+            now = self._clock()
+            if self._started is not None:
+                self._update_rates(now)
+            files_rate, bytes_rate = self._files_rate, self._bytes_rate
+            eta = None
+            if bytes_rate and self.bytes_total:
+                eta = (self.bytes_total - self.bytes_done) / bytes_rate
+            elif files_rate and self.files_total:
+                eta = (self.files_total - self.files_done) / files_rate
+            return {
+                'files_done': self.files_done,
+                'files_total': self.files_total,
+                'bytes_done': self.bytes_done,
+                'bytes_total': self.bytes_total,
+                'fraction': self._fraction(),
+                'files_per_second': files_rate,
+                'bytes_per_second': bytes_rate,
+                'eta_seconds': eta,
+                'elapsed': now - self._started if self._started is not None else 0.0,
+                'scanning': self._scans > 0
+            }
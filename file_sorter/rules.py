@@ -0,0 +1,309 @@
+"""Placement rules that go beyond extensions.
+
+``file_types`` only says which category folder an extension belongs in.
+Rules, kept under ``"rules"`` in the settings file, can send files
+elsewhere based on their name, category, size or age::
+
+    "rules": [
+        {"glob": "invoice_*.pdf", "target": "Finance"},
+        {"category": "Videos", "min_size": "1GB", "target": "Videos/Large"},
+        {"older_than_days": 180, "target": "Archive/{year}"}
+    ]
+
+Conditions of a rule must all hold; the first matching rule wins and files
+no rule matches go to their category folder as before. Conditions:
+
+    glob                  whole file name, case-insensitive
+    regex                 searched in the file name (anchor with ^ and $)
+    extensions            list of extensions, compound ones included
+    category              the category the extension (or content) gives
+    min_size, max_size    bytes, or a string such as "500MB" or "1.5GB"
+    older_than_days,
+    newer_than_days       modification time
+
+``target`` is a folder relative to the sorted directory. It may use
+``{category}``, ``{ext}`` and, from the modification time, ``{year}``,
+``{month}`` and ``{day}``.
+
+``compile_rules`` turns the list into a ``RuleMatcher``: name patterns
+without groups or global inline flags are joined into one regex so a file
+name is scanned once (the others are tested one by one), extension
+conditions become a suffix dict, and the stat data is fetched only when a
+candidate rule needs a size, an age or a date in its target. The scanner's
+``DirEntry`` caches that stat, and the move needs it anyway.
+"""
+
+import re
+import json
+import time
+import fnmatch
+import string
+
+from .classifier import normalize_extension
+
+_SIZE_UNITS = {'': 1, 'b': 1, 'k': 1024, 'kb': 1024, 'm': 1024 ** 2, 'mb': 1024 ** 2,
+               'g': 1024 ** 3, 'gb': 1024 ** 3, 't': 1024 ** 4, 'tb': 1024 ** 4}
+_SIZE_PATTERN = re.compile(r'\s*([0-9]*\.?[0-9]+)\s*([a-zA-Z]*)\s*$')
+
+_DAY = 24 * 60 * 60
+
+_CONDITIONS = {'glob', 'regex', 'extensions', 'category', 'min_size', 'max_size',
+               'older_than_days', 'newer_than_days'}
+_TARGET_FIELDS = {'category', 'ext', 'year', 'month', 'day'}
+_DATE_FIELDS = {'year', 'month', 'day'}
+# Inline flags like (?i) that apply to a whole pattern
+_GLOBAL_FLAGS = re.compile(r'\(\?[aiLmsux]+\)')
+
+
+class RuleError(ValueError):
+    """A rule in the settings can't be compiled"""
+
+
+def parse_size(value):
+    """Return a size in bytes from a number or a string like "1.5GB\""""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    match = _SIZE_PATTERN.match(str(value))
+    if not match or match.group(2).lower() not in _SIZE_UNITS:
+        raise RuleError(f"invalid size {value!r}")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).lower()])
+
+
+class _Rule:
+    """One compiled rule"""
+
+    __slots__ = ('index', 'glob', 'regex', 'has_name', 'pattern', 'extensions', 'category',
+                 'min_size', 'max_size', 'older_than', 'newer_than', 'target', 'target_fields',
+                 'needs_stat')
+
+    def __init__(self, index, spec):
+        if not isinstance(spec, dict):
+            raise RuleError("a rule must be an object")
+        unknown = set(spec) - _CONDITIONS - {'target', 'name'}
+        if unknown:
+            raise RuleError(f"unknown keys {', '.join(sorted(unknown))}")
+        if not set(spec) & _CONDITIONS:
+            raise RuleError("a rule needs at least one condition")
+
+        self.index = index
+        # Each name condition is compiled on its own, so its groups,
+        # backreferences and inline flags mean what the user wrote
+        self.glob = self.regex = None
+        patterns = []
+        if 'glob' in spec:
+            # translate() anchors the end itself
+            glob = '(?i:' + fnmatch.translate(str(spec['glob'])) + ')'
+            self.glob = re.compile(glob)
+            patterns.append((glob, self.glob))
+        if 'regex' in spec:
+            try:
+                self.regex = re.compile(str(spec['regex']))
+            except re.error as e:
+                raise RuleError(f"invalid regex: {e}")
+            # Searched anywhere in the name, like re.search
+            patterns.append(('(?s:.*?)(?:' + self.regex.pattern + ')', self.regex))
+        self.has_name = bool(patterns)
+        # Lookaheads let one regex test both conditions from the start. Only
+        # set when the conditions can be joined with other rules' safely:
+        # groups would be renumbered and global flags must come first.
+        self.pattern = None
+        if patterns and all(compiled.groups == 0 and not _GLOBAL_FLAGS.search(compiled.pattern)
+                            for _, compiled in patterns):
+            self.pattern = ''.join(f'(?={pattern})' for pattern, _ in patterns)
+
+        self.extensions = None
+        if 'extensions' in spec:
+            extensions = spec['extensions']
+            if isinstance(extensions, str):
+                extensions = [extensions]
+            self.extensions = {normalize_extension(extension) for extension in extensions}
+            self.extensions.discard('')
+
+        self.category = spec.get('category')
+        self.min_size = parse_size(spec['min_size']) if 'min_size' in spec else None
+        self.max_size = parse_size(spec['max_size']) if 'max_size' in spec else None
+        try:
+            self.older_than = (float(spec['older_than_days']) * _DAY
+                               if 'older_than_days' in spec else None)
+            self.newer_than = (float(spec['newer_than_days']) * _DAY
+                               if 'newer_than_days' in spec else None)
+        except (TypeError, ValueError):
+            raise RuleError("days must be a number")
+
+        target = spec.get('target')
+        if not isinstance(target, str) or not target.strip('/\\ '):
+            raise RuleError("a rule needs a target folder")
+        parts = [part for part in re.split(r'[/\\]+', target.strip()) if part]
+        if any(part in ('.', '..') for part in parts) or re.match(r'^[a-zA-Z]:', target):
+            raise RuleError(f"target {target!r} must stay inside the sorted directory")
+        self.target = '/'.join(parts)
+        try:
+            self.target_fields = {field for _, field, _, _ in string.Formatter().parse(self.target)
+                                  if field is not None}
+        except ValueError as e:
+            raise RuleError(f"invalid target {target!r}: {e}")
+        if self.target_fields - _TARGET_FIELDS:
+            raise RuleError(f"unknown target fields {', '.join(sorted(self.target_fields - _TARGET_FIELDS))}")
+
+        self.needs_stat = (self.min_size is not None or self.max_size is not None
+                           or self.older_than is not None or self.newer_than is not None
+                           or bool(self.target_fields & _DATE_FIELDS))
+
+    def check_name(self, name):
+        if self.glob is not None and not self.glob.match(name):
+            return False
+        return self.regex is None or self.regex.search(name) is not None
+
+    def check_stat(self, st, now):
+        if self.min_size is not None and st.st_size < self.min_size:
+            return False
+        if self.max_size is not None and st.st_size > self.max_size:
+            return False
+        age = now - st.st_mtime
+        if self.older_than is not None and age < self.older_than:
+            return False
+        if self.newer_than is not None and age > self.newer_than:
+            return False
+        return True
+
+
+class RuleMatcher:
+    """Ordered, precompiled set of rules; see compile_rules"""
+
+    def __init__(self, rules, max_parts):
+        self.rules = rules
+        self.errors = []
+        self._max_parts = max_parts
+        # Rules that name no extension, and extension -> rules naming it
+        self._any_extension = [rule for rule in rules if rule.extensions is None]
+        self._by_extension = {}
+        for rule in rules:
+            for extension in rule.extensions or ():
+                self._by_extension.setdefault(extension, []).append(rule)
+        # Joinable name patterns in one regex; group _ruleN is rule N
+        named = [rule for rule in rules if rule.pattern]
+        self._names = None
+        if named:
+            self._names = re.compile('|'.join(f'(?P<_rule{rule.index}>{rule.pattern})'
+                                              for rule in named))
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    @property
+    def stat_dependent(self):
+        """Whether a file can match differently without its folder changing.
+
+        Age rules change their mind as files get older; size rules and
+        date fields in targets when a file is rewritten in place, which
+        updates the file but not the folder it is in.
+        """
+        return any(rule.needs_stat for rule in self.rules)
+
+    def fingerprint(self):
+        """Short hash of the compiled rules; equal rules give equal hashes"""
+        import hashlib
+        parts = [self._max_parts]
+        for rule in self.rules:
+            extensions = sorted(rule.extensions) if rule.extensions is not None else None
+            parts.append([rule.glob and rule.glob.pattern, rule.regex and rule.regex.pattern,
+                          extensions, rule.category, rule.min_size, rule.max_size,
+                          rule.older_than, rule.newer_than, rule.target])
+        return hashlib.sha1(json.dumps(parts).encode('utf-8')).hexdigest()[:16]
+
+    def targets(self):
+        """First path component of every rule target without fields in it"""
+        return {rule.target.split('/', 1)[0] for rule in self.rules
+                if '{' not in rule.target.split('/', 1)[0]}
+
+    def _suffixes(self, name):
+        base = name.lower().lstrip('.')
+        suffixes = []
+        pos = len(base)
+        for _ in range(self._max_parts):
+            pos = base.rfind('.', 0, pos)
+            if pos <= 0:
+                break
+            suffixes.append(base[pos:])
+        return suffixes
+
+    def _candidates(self, name):
+        """Rules whose extension condition the name meets, in rule order"""
+        if not self._by_extension:
+            return self.rules
+        candidates = list(self._any_extension)
+        for suffix in self._suffixes(name):
+            candidates.extend(self._by_extension.get(suffix, ()))
+        if len(candidates) > len(self._any_extension):
+            candidates.sort(key=lambda rule: rule.index)
+        return candidates
+
+    def match(self, entry, category, now=None):
+        """Return the target folder (relative, '/'-separated) for entry, or None"""
+        candidates = self._candidates(entry.name)
+        if not candidates:
+            return None
+
+        name = entry.name
+        name_match = None
+        if self._names is not None:
+            # One pass finds the first rule whose name pattern matches
+            match = self._names.match(name)
+            name_match = int(match.lastgroup[5:]) if match else -1
+
+        st = None
+        for rule in candidates:
+            if rule.has_name:
+                if rule.pattern is None or name_match is None:
+                    # Not in the joined regex
+                    if not rule.check_name(name):
+                        continue
+                elif rule.index < name_match or name_match < 0:
+                    continue
+                elif rule.index > name_match and not rule.check_name(name):
+                    continue
+            if rule.category is not None and rule.category != category:
+                continue
+            if rule.needs_stat:
+                if st is None:
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        return None
+                if not rule.check_stat(st, now if now is not None else time.time()):
+                    continue
+            return self._format(rule, name, category, st)
+        return None
+
+    def _format(self, rule, name, category, st):
+        if not rule.target_fields:
+            return rule.target
+        fields = {'category': category}
+        if 'ext' in rule.target_fields:
+            suffixes = self._suffixes(name)
+            fields['ext'] = suffixes[0].lstrip('.') if suffixes else 'none'
+        if rule.target_fields & _DATE_FIELDS:
+            date = time.localtime(st.st_mtime)
+            fields.update(year=f'{date.tm_year:04d}', month=f'{date.tm_mon:02d}',
+                          day=f'{date.tm_mday:02d}')
+        return rule.target.format(**fields)
+
+
+def compile_rules(specs, max_parts=1):
+    """Compile the "rules" list of the settings into a RuleMatcher.
+
+    Invalid rules are left out and reported in the matcher's ``errors``
+    as ``(position, message)`` tuples.
+    """
+    rules = []
+    errors = []
+    for position, spec in enumerate(specs or ()):
+        try:
+            rules.append(_Rule(len(rules), spec))
+        except RuleError as e:
+            errors.append((position, str(e)))
+    max_parts = max([max_parts] + [extension.count('.') for rule in rules
+                                   for extension in rule.extensions or ()])
+    matcher = RuleMatcher(rules, max_parts)
+    matcher.errors = errors
+    return matcher
@@ -0,0 +1,303 @@
+"""Streaming directory scanner built on os.scandir.
+
+Unlike ``os.walk`` the scanner hands out the ``os.DirEntry`` objects it
+read, so callers get the name, the file type and (on Windows) the stat
+data without extra system calls. Work is yielded one directory at a time,
+so memory use depends on the widest directory, not on the size of the tree.
+
+On network file systems every directory listing is a round trip, and a
+single walker spends most of its time waiting. With ``workers`` above 1
+a pool of threads lists directories from a shared stack: each worker
+takes a directory, lists it with os.scandir and pushes the
+subdirectories back, so any idle worker picks up the next one. Listings
+are handed to the caller as they complete, or, with ``ordered``, in the
+same order as the single-threaded walk. At most ``read_ahead`` listings
+wait for the caller at any time, which bounds memory as before.
+"""
+
+import os
+import threading
+from collections import deque
+
+DEFAULT_SCAN_WORKERS = 1
+
+# Listings the workers may read ahead of the caller, per worker
+READ_AHEAD = 64
+
+
+class CachedDir:
+    """Stand-in for the DirEntry of a subdirectory known from a snapshot"""
+
+    __slots__ = ('name', 'path')
+
+    def __init__(self, parent, name):
+        self.name = name
+        self.path = os.path.join(parent, name)
+
+    def is_dir(self, follow_symlinks=True):
+        return True
+
+    def is_symlink(self):
+        return False
+
+
+class PathEntry:
+    """Stand-in for the DirEntry of a file known only by its path"""
+
+    __slots__ = ('name', 'path', '_stat')
+
+    def __init__(self, path):
+        self.name = os.path.basename(path)
+        self.path = path
+        self._stat = None
+
+    def is_dir(self, follow_symlinks=True):
+        return False
+
+    def is_symlink(self):
+        return os.path.islink(self.path)
+
+    def stat(self, follow_symlinks=True):
+        if not follow_symlinks:
+            if self._stat is None:
+                self._stat = os.lstat(self.path)
+            return self._stat
+        return os.stat(self.path)
+
+
+def _list_directory(dirpath, snapshot):
+    """Return (file_entries, dir_entries) of dirpath; raises OSError.
+
+    file_entries is None for a directory the snapshot knows is unchanged.
+    """
+    if snapshot is not None:
+        record = snapshot.check(dirpath)
+        if record is not None:
+            return None, [CachedDir(dirpath, name) for name in record[3]]
+
+    file_entries = []
+    dir_entries = []
+    with os.scandir(dirpath) as it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                dir_entries.append(entry)
+            else:
+                file_entries.append(entry)
+    return file_entries, dir_entries
+
+
+def _subdirectories(dir_entries):
+    """Paths of the directories to descend into, skipping symlinks"""
+    paths = []
+    for entry in dir_entries:
+        try:
+            if entry.is_symlink():
+                continue
+        except OSError:
+            continue
+        paths.append(entry.path)
+    return paths
+
+
+def walk_entries(top, on_error=None, snapshot=None, workers=DEFAULT_SCAN_WORKERS,
+                 ordered=True):
+    """Walk top like os.walk, yielding (dirpath, file_entries, dir_entries).
+
+    Directories are listed completely before they are yielded. As with
+    os.walk(topdown=True) the caller may reorder or remove items of
+    dir_entries in place to control which directories are visited next.
+    Symlinks to directories are reported in dir_entries but not followed.
+    on_error(path, exc) is called for directories that can't be listed,
+    and the walk goes on with the rest.
+
+    With a DirectorySnapshot, directories it reports as unchanged are not
+    listed: they are yielded with file_entries set to None and
+    dir_entries built from the cached subdirectory names.
+
+    With workers above 1 directories are listed by that many threads.
+    Changes to dir_entries then only take effect for top: the workers
+    queue the subdirectories of every other directory as soon as they
+    have listed it. Without ordered, directories come in the order their
+    listings complete.
+    """
+    if workers > 1:
+        yield from _ParallelWalk(top, snapshot, workers, ordered).walk(on_error)
+        return
+
+    stack = [top]
+    while stack:
+        dirpath = stack.pop()
+        try:
+            file_entries, dir_entries = _list_directory(dirpath, snapshot)
+        except OSError as e:
+            if on_error is not None:
+                on_error(dirpath, e)
+            continue
+
+        yield dirpath, file_entries, dir_entries
+
+        stack.extend(reversed(_subdirectories(dir_entries)))
+
+
+class _ParallelWalk:
+    """Shared state of one walk_entries call with several workers.
+
+    Directories to list sit on a stack, so workers go depth first like
+    the single-threaded walk. Each listing is stored with the paths of its
+    subdirectories until the caller takes it. In ordered mode the caller
+    keeps its own stack of the serial order and takes listings from it by
+    path; when the one it needs next is still waiting on the stack, it
+    lists it itself instead of waiting for a worker.
+    """
+
+    def __init__(self, top, snapshot, workers, ordered):
+        self.top = top
+        self.snapshot = snapshot
+        self.workers = workers
+        self.ordered = ordered
+        self.read_ahead = READ_AHEAD * workers
+        self._condition = threading.Condition()
+        # Directories to list; entries no longer in _pending were taken by the caller
+        self._stack = []
+        self._pending = set()
+        # Finished listings: path -> listing when ordered, else a deque of (path, listing)
+        self._listed = {} if ordered else deque()
+        # Listings being made or waiting for the caller
+        self._buffered = 0
+        self._active = 0
+        self._stopped = False
+
+    def _push(self, paths):
+        """Queue directories to list; called with the condition held"""
+        self._stack.extend(reversed(paths))
+        self._pending.update(paths)
+        self._condition.notify_all()
+
+    def _list(self, dirpath):
+        """Return (file_entries, dir_entries, subdirectory paths) or the exception raised"""
+        try:
+            file_entries, dir_entries = _list_directory(dirpath, self.snapshot)
+        except Exception as e:
+            return e
+        return file_entries, dir_entries, _subdirectories(dir_entries)
+
+    def _work(self):
+        condition = self._condition
+        while True:
+            with condition:
+                while not self._stopped and (not self._pending
+                                             or self._buffered >= self.read_ahead):
+                    condition.wait()
+                if self._stopped:
+                    return
+                while True:
+                    dirpath = self._stack.pop()
+                    if dirpath in self._pending:
+                        self._pending.remove(dirpath)
+                        break
+                self._buffered += 1
+                self._active += 1
+
+            listing = self._list(dirpath)
+
+            with condition:
+                if not isinstance(listing, Exception):
+                    self._push(listing[2])
+                if self.ordered:
+                    self._listed[dirpath] = listing
+                else:
+                    self._listed.append((dirpath, listing))
+                self._active -= 1
+                condition.notify_all()
+
+    def _take(self, dirpath):
+        """Return the listing of dirpath (ordered mode), making it here if no worker has started"""
+        condition = self._condition
+        with condition:
+            while True:
+                if dirpath in self._listed:
+                    self._buffered -= 1
+                    condition.notify_all()
+                    return self._listed.pop(dirpath)
+                if dirpath in self._pending:
+                    self._pending.remove(dirpath)
+                    break
+                condition.wait()
+        listing = self._list(dirpath)
+        if not isinstance(listing, Exception):
+            with condition:
+                self._push(listing[2])
+        return listing
+
+    def _next(self):
+        """Return the next (dirpath, listing) to finish (unordered mode), or None when done"""
+        condition = self._condition
+        with condition:
+            while not self._listed:
+                if not self._pending and not self._active:
+                    return None
+                condition.wait()
+            self._buffered -= 1
+            condition.notify_all()
+            return self._listed.popleft()
+
+    def walk(self, on_error):
+        # top is listed here, so the caller can prune and reorder its subdirectories
+        try:
+            file_entries, dir_entries = _list_directory(self.top, self.snapshot)
+        except OSError as e:
+            if on_error is not None:
+                on_error(self.top, e)
+            return
+
+        threads = [threading.Thread(target=self._work, daemon=True)
+                   for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            yield self.top, file_entries, dir_entries
+
+            subdirectories = _subdirectories(dir_entries)
+            with self._condition:
+                self._push(subdirectories)
+            stack = list(reversed(subdirectories))
+
+            while True:
+                if self.ordered:
+                    if not stack:
+                        return
+                    dirpath = stack.pop()
+                    listing = self._take(dirpath)
+                else:
+                    item = self._next()
+                    if item is None:
+                        return
+                    dirpath, listing = item
+
+                if isinstance(listing, Exception):
+                    if not isinstance(listing, OSError):
+                        raise listing
+                    if on_error is not None:
+                        on_error(dirpath, listing)
+                    continue
+
+                file_entries, dir_entries, subdirectories = listing
+                yield dirpath, file_entries, dir_entries
+                if self.ordered:
+                    stack.extend(reversed(subdirectories))
+        finally:
+            with self._condition:
+                self._stopped = True
+                self._condition.notify_all()
+            for thread in threads:
+                thread.join()
+
+
+def iter_files(top, on_error=None):
+    """Yield an os.DirEntry for every file below top"""
+    for dirpath, file_entries, dir_entries in walk_entries(top, on_error):
+        yield from file_entries
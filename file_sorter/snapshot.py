@@ -0,0 +1,130 @@
+"""Persisted directory snapshots for incremental rescans.
+
+Drop folders are re-sorted every few minutes, and each run used to list
+every category folder again only to count its files as already sorted.
+A ``DirectorySnapshot`` remembers, per directory, the mtime and inode it
+had when it was last seen *clean* (every file in it already in its
+category folder), the number of files in it and its subdirectory names.
+On the next scan an unchanged clean directory is not listed at all: its
+file count is reported from the snapshot and its subdirectories are
+visited from the cached names.
+
+Directories that had files to move are never recorded; they are listed
+again next time. A directory modified too close to the moment the
+snapshot was saved is treated as changed, so a write landing in the same
+timestamp tick isn't missed.
+"""
+
+import os
+import json
+import time
+
+SNAPSHOT_DIR = 'file_sorter_cache'
+
+# Modifications this close to the snapshot time are not trusted
+_RACY_NS = 50 * 1000 * 1000
+# Coarse timestamp filesystems (FAT, some SMB servers) get a wider margin
+_RACY_COARSE_NS = 2 * 1000 * 1000 * 1000
+
+_VERSION = 1
+
+
+class DirectorySnapshot:
+    """Snapshot of the clean directories below one root"""
+
+    def __init__(self, cache_path, root, full_rescan=False, variant=''):
+        self.cache_path = cache_path
+        self.root = root
+        # Identifies the classification rules; a snapshot taken under others is ignored
+        self.variant = variant
+        self._old = {}
+        self._old_taken = 0
+        # Records carried over or written in this run: path -> [mtime_ns, ino, files, subdirs]
+        self._new = {}
+        # (mtime_ns, ino) seen by check() for directories that weren't cached
+        self._stats = {}
+        # check() results, so each directory is stat'ed once per run
+        self._checked = {}
+
+        if not full_rescan:
+            self._load()
+
+    @classmethod
+    def for_root(cls, cache_dir, root, full_rescan=False, variant=''):
+        """Open the snapshot of root stored in cache_dir"""
+        import hashlib
+        key = hashlib.sha1(os.path.abspath(root).encode('utf-8', 'surrogatepass')).hexdigest()
+        return cls(os.path.join(cache_dir, key[:20] + '.json'), root, full_rescan, variant)
+
+    def _load(self):
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if (data.get('version') == _VERSION and data.get('root') == os.path.abspath(self.root)
+                and data.get('variant', '') == self.variant):
+            self._old = data.get('dirs', {})
+            self._old_taken = data.get('taken', 0)
+
+    def check(self, dirpath):
+        """Return the cached record if dirpath is unchanged since it was clean, else None"""
+        if dirpath in self._checked:
+            return self._checked[dirpath]
+
+        record = None
+        try:
+            st = os.stat(dirpath)
+        except OSError:
+            st = None
+        if st is not None:
+            old = self._old.get(dirpath)
+            coarse = st.st_mtime_ns % 1000000 == 0
+            margin = _RACY_COARSE_NS if coarse else _RACY_NS
+            if (old is not None and old[0] == st.st_mtime_ns and old[1] == st.st_ino
+                    and st.st_mtime_ns < self._old_taken - margin):
+                record = self._new[dirpath] = old
+            else:
+                self._stats[dirpath] = (st.st_mtime_ns, st.st_ino)
+
+        self._checked[dirpath] = record
+        return record
+
+    def record(self, dirpath, files, subdirs):
+        """Remember that dirpath was clean when check() stat'ed it"""
+        st = self._stats.get(dirpath)
+        if st is not None:
+            self._new[dirpath] = [st[0], st[1], files, list(subdirs)]
+
+    def refresh(self, dirpath, added_files):
+        """Update a recorded directory after this run moved files into it"""
+        record = self._new.get(dirpath)
+        if record is None:
+            return
+        try:
+            st = os.stat(dirpath)
+        except OSError:
+            self.forget(dirpath)
+            return
+        self._new[dirpath] = [st.st_mtime_ns, st.st_ino, record[2] + added_files, record[3]]
+
+    def forget(self, dirpath):
+        """Make sure dirpath is listed again next time"""
+        self._new.pop(dirpath, None)
+
+    def save(self):
+        """Write the snapshot; directories not seen in this run are dropped"""
+        data = {
+            'version': _VERSION,
+            'root': os.path.abspath(self.root),
+            'variant': self.variant,
+            'taken': time.time_ns(),
+            'dirs': self._new
+        }
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = self.cache_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(temp_path, self.cache_path)
@@ -0,0 +1,207 @@
+"""Content sniffing for files without a usable extension.
+
+Files named ``scan0001`` or ``report.dat`` end up in the default category
+because only the extension is looked at. A ``ContentSniffer`` reads the
+first bytes of such files with a single read, matches them
+against a table of magic numbers and classifies the file as if it had
+the matching extension, so the categories stay the ones configured in
+``file_types``.
+
+Modes:
+
+    'off'      extensions only
+    'unknown'  sniff files whose extension maps to the default category
+    'all'      also sniff files with a known extension, and move files
+               whose content says otherwise (a PDF named .jpg)
+
+Results are cached by (device, inode, size, mtime), which a rename keeps,
+so a file is read once no matter how often it is scanned or moved. The
+reads run on a thread pool while the scan continues.
+"""
+
+import os
+from collections import deque
+
+from .cache import StatCache, stat_key
+
+SNIFF_MODES = ('off', 'unknown', 'all')
+DEFAULT_SNIFF_MODE = 'off'
+DEFAULT_SNIFF_WORKERS = 4
+SNIFF_CACHE_FILE = 'sniff_cache.json'
+
+# Enough for the tar header magic at offset 257
+HEAD_SIZE = 512
+
+_OPEN_FLAGS = os.O_RDONLY | getattr(os, 'O_BINARY', 0) | getattr(os, 'O_NOATIME', 0)
+_HAVE_PREAD = hasattr(os, 'pread')
+
+# (offset, magic, extension). Checked in order, so longer and more
+# specific signatures come before the ones they start with.
+MAGIC_NUMBERS = [
+    (0, b'%PDF-', '.pdf'),
+    (0, b'{\\rtf', '.rtf'),
+    (0, b'\x89PNG\r\n\x1a\n', '.png'),
+    (0, b'\xff\xd8\xff', '.jpg'),
+    (0, b'GIF87a', '.gif'),
+    (0, b'GIF89a', '.gif'),
+    (0, b'II*\x00', '.tiff'),
+    (0, b'MM\x00*', '.tiff'),
+    (0, b'\x00\x00\x01\x00', '.ico'),
+    (8, b'WEBP', '.webp'),
+    (8, b'WAVE', '.wav'),
+    (8, b'AVI ', '.avi'),
+    (4, b'ftypM4A', '.m4a'),
+    (4, b'ftypqt', '.mov'),
+    (4, b'ftyp', '.mp4'),
+    (0, b'\x1aE\xdf\xa3', '.mkv'),
+    (0, b'0&\xb2u\x8ef\xcf\x11', '.wmv'),
+    (0, b'FLV\x01', '.flv'),
+    (0, b'ID3', '.mp3'),
+    (0, b'\xff\xfb', '.mp3'),
+    (0, b'\xff\xf3', '.mp3'),
+    (0, b'fLaC', '.flac'),
+    (0, b'OggS', '.ogg'),
+    (0, b'Rar!\x1a\x07', '.rar'),
+    (0, b"7z\xbc\xaf'\x1c", '.7z'),
+    (0, b'\x1f\x8b', '.gz'),
+    (0, b'BZh', '.bz2'),
+    (257, b'ustar', '.tar'),
+    (0, b'!<arch>\ndebian', '.deb'),
+    (0, b'\xed\xab\xee\xdb', '.rpm'),
+    (0, b'MZ', '.exe'),
+]
+
+# Containers whose magic says little about what is inside. They only
+# classify files without a known extension; a .docx is a zip too.
+_ZIP = b'PK\x03\x04'
+_OLE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+_CONTAINERS = {'.zip', '.doc'}
+
+# Office Open XML and OpenDocument parts named in the first zip entries
+_ZIP_MEMBERS = [
+    (b'word/', '.docx'),
+    (b'xl/', '.xlsx'),
+    (b'ppt/', '.pptx'),
+    (b'application/vnd.oasis.opendocument.text', '.odt'),
+]
+
+
+def identify(head):
+    """Return the extension the leading bytes of a file point to, or None"""
+    for offset, magic, extension in MAGIC_NUMBERS:
+        if head.startswith(magic, offset):
+            return extension
+    if head.startswith(_ZIP):
+        for member, extension in _ZIP_MEMBERS:
+            if member in head:
+                return extension
+        return '.zip'
+    if head.startswith(_OLE):
+        return '.doc'
+    text = head.lstrip()[:256].lower()
+    if text.startswith((b'<!doctype html', b'<html')):
+        return '.html'
+    if text.startswith(b'<svg') or (text.startswith(b'<?xml') and b'<svg' in text):
+        return '.svg'
+    if text.startswith(b'#!') and b'python' in text.split(b'\n', 1)[0]:
+        return '.py'
+    return None
+
+
+class ContentSniffer:
+    """Refines extension-based categories by looking at file contents"""
+
+    def __init__(self, index, mode='unknown', cache_path=None, workers=DEFAULT_SNIFF_WORKERS):
+        self.index = index
+        self.mode = mode
+        self.workers = max(1, workers)
+        # Extension per file, or '' when nothing matched
+        self._cache = StatCache(cache_path)
+
+    def save(self):
+        """Write the cache back if anything was added"""
+        self._cache.save()
+
+    def wants(self, category):
+        """Whether a file the extension puts in category should be sniffed"""
+        if self.mode == 'all':
+            return True
+        return self.mode == 'unknown' and category == self.index.default
+
+    def sniff(self, entry):
+        """Return the extension entry's content points to, or None"""
+        try:
+            st = entry.stat(follow_symlinks=False)
+        except OSError:
+            return None
+        if not st.st_size or entry.is_symlink():
+            return None
+        key = stat_key(st)
+        extension = self._cache.get(key)
+        if extension is not None:
+            return extension or None
+
+        try:
+            fd = os.open(entry.path, _OPEN_FLAGS)
+        except PermissionError:
+            # O_NOATIME is only allowed for the file's owner
+            try:
+                fd = os.open(entry.path, _OPEN_FLAGS & ~getattr(os, 'O_NOATIME', 0))
+            except OSError:
+                return None
+        except OSError:
+            return None
+        try:
+            # Freshly opened, so a plain read starts at 0 too; Windows has no pread
+            head = os.pread(fd, HEAD_SIZE, 0) if _HAVE_PREAD else os.read(fd, HEAD_SIZE)
+        except OSError:
+            return None
+        finally:
+            os.close(fd)
+
+        extension = identify(head)
+        self._cache.set(key, extension or '')
+        return extension
+
+    def category(self, entry, category):
+        """Return the category entry's content gives, or None to keep category"""
+        extension = self.sniff(entry)
+        if extension is None:
+            return None
+        sniffed = self.index.category_for_name('x' + extension)
+        if sniffed == self.index.default or sniffed == category:
+            return None
+        if category != self.index.default and extension in _CONTAINERS:
+            # A zip or OLE file with a known extension is probably what it says
+            return None
+        return sniffed
+
+    def refine(self, work, place):
+        """Re-yield (entry, category, category_folder) items with sniffed categories.
+
+        place(entry, category) returns the (category, category_folder) pair
+        for a sniffed category. Sniffing runs on a thread pool; items come
+        out in the order they went in, at most a few dozen behind the scan.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        window = self.workers * 16
+        pending = deque()
+        with ThreadPoolExecutor(self.workers) as pool:
+            for item in work:
+                if self.wants(item[1]):
+                    pending.append((item, pool.submit(self.category, item[0], item[1])))
+                else:
+                    pending.append((item, None))
+                while pending and (len(pending) > window or pending[0][1] is None
+                                   or pending[0][1].done()):
+                    yield self._resolve(place, *pending.popleft())
+            while pending:
+                yield self._resolve(place, *pending.popleft())
+
+    def _resolve(self, place, item, future):
+        if future is None:
+            return item
+        sniffed = future.result()
+        if sniffed is None:
+            return item
+        return (item[0],) + place(item[0], sniffed)
@@ -0,0 +1,250 @@
+"""Sorting into a view instead of moving files.
+
+A view builds the category folders without touching the files: each
+file stays where it is and its category folder gets a symlink to it, a
+hard link, or a reflink copy (a clone sharing the file's data blocks,
+made with the FICLONE ioctl on Btrfs, XFS and other filesystems that
+support it). A sort of terabytes then takes as long as creating the
+links, uses no extra data blocks, and tools relying on the original
+layout keep working.
+
+Hard links and reflinks only work within one device, and reflinks are
+only tried on filesystems known to support them (the preview must be
+able to say what a sort will do without writing test files); files that
+can't be linked or cloned into their category folder get a symlink
+instead. Undoing a view deletes its entries, never the files they point
+at.
+"""
+
+import os
+import sys
+import stat
+import errno
+import threading
+
+from .mover import HARDLINK, SYMLINK
+
+VIEW_MODES = ('off', 'symlink', 'hardlink', 'reflink')
+DEFAULT_VIEW_MODE = 'off'
+
+REFLINK = 'reflink'
+
+# _IOW(0x94, 9, int) from linux/fs.h; fcntl only names it from Python 3.12
+_FICLONE = 0x40049409
+
+# Errors meaning "no hard link or clone possible here", so a symlink is used
+_NO_LINK = {errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTTY, errno.EINVAL, errno.ENOSYS,
+            getattr(errno, 'EOPNOTSUPP', errno.EINVAL), getattr(errno, 'ENOTSUP', errno.EINVAL)}
+
+# Filesystems whose FICLONE is expected to work, for predicting before a clone was tried
+_REFLINK_FILESYSTEMS = {'btrfs', 'xfs', 'bcachefs', 'ocfs2', 'zfs'}
+
+# Device -> whether FICLONE works there, learned from the first attempt
+_reflink_devices = {}
+_reflink_lock = threading.Lock()
+# Device -> filesystem type from /proc/self/mountinfo
+_filesystem_types = {}
+
+
+def _clone(source, destination):
+    """Create destination as a reflink copy of source, keeping its times"""
+    import fcntl
+    with open(source, 'rb') as fsrc:
+        with open(destination, 'xb') as fdst:
+            try:
+                fcntl.ioctl(fdst.fileno(), getattr(fcntl, 'FICLONE', _FICLONE), fsrc.fileno())
+            except BaseException:
+                fdst.close()
+                os.unlink(destination)
+                raise
+    st = os.stat(source)
+    os.utime(destination, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
+def _filesystem_type(device):
+    """Type of the filesystem mounted with device (Linux), or None"""
+    if device in _filesystem_types:
+        return _filesystem_types[device]
+    fs_type = None
+    key = f"{os.major(device)}:{os.minor(device)}"
+    try:
+        with open('/proc/self/mountinfo', 'r') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) > 2 and fields[2] == key and '-' in fields:
+                    fs_type = fields[fields.index('-') + 1]
+                    break
+    except (OSError, IndexError):
+        pass
+    _filesystem_types[device] = fs_type
+    return fs_type
+
+
+def reflink_supported(device):
+    """Whether reflinks can be made on device.
+
+    Learned from the first clone tried there; before that it's guessed
+    from the filesystem type, so a preview doesn't write test files.
+    """
+    if not sys.platform.startswith('linux'):
+        return False
+    known = _reflink_devices.get(device)
+    if known is not None:
+        return known
+    return _filesystem_type(device) in _REFLINK_FILESYSTEMS
+
+
+def view_strategy(mode, source_stat, folder_device):
+    """The kind of entry a view in mode will most likely get for a file"""
+    if mode == 'symlink' or not stat.S_ISREG(source_stat.st_mode):
+        return SYMLINK
+    if folder_device is not None and source_stat.st_dev != folder_device:
+        return SYMLINK
+    if mode == 'hardlink':
+        return HARDLINK
+    return REFLINK if reflink_supported(source_stat.st_dev) else SYMLINK
+
+
+def _symlink_target(source, destination):
+    """Relative target where possible, so a view survives moving the whole tree"""
+    source = os.path.abspath(source)
+    try:
+        return os.path.relpath(source, os.path.dirname(os.path.abspath(destination)))
+    except ValueError:
+        # Another drive on Windows
+        return source
+
+
+def _copy_key(name, st):
+    """Key of a regular file for recognizing reflink copies: name, size and mtime.
+
+    A name that got a collision suffix (photo_2.jpg) is keyed by the
+    name it was given for (photo.jpg).
+    """
+    stem, ext = os.path.splitext(os.path.normcase(name))
+    base, sep, counter = stem.rpartition('_')
+    if sep and base and counter.isdigit():
+        stem = base
+    return ('copy', stem + ext, st.st_size, st.st_mtime_ns)
+
+
+class ViewIndex:
+    """What the category folders of a view already link to.
+
+    Each folder is listed once, the first time it's asked about, so a
+    second sort into the same view skips the files it already has
+    entries for, under whatever name they got. Symlinks are recognized by
+    their target and hard links by inode; reflink copies by name, size
+    and mtime, since a clone is a file of its own.
+    """
+
+    def __init__(self, mode):
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._folders = {}
+
+    def _load(self, folder):
+        keys = set()
+        try:
+            with os.scandir(folder) as it:
+                for entry in it:
+                    try:
+                        if entry.is_symlink():
+                            target = os.path.join(folder, os.readlink(entry.path))
+                            keys.add(('link', os.path.normpath(os.path.abspath(target))))
+                        elif entry.is_file(follow_symlinks=False):
+                            st = entry.stat(follow_symlinks=False)
+                            keys.add(('inode', st.st_dev, st.st_ino))
+                            keys.add(_copy_key(entry.name, st))
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return keys
+
+    def contains(self, folder, source, source_stat):
+        """Whether folder already has the view entry of source"""
+        with self._lock:
+            keys = self._folders.get(folder)
+            if keys is None:
+                keys = self._folders[folder] = self._load(folder)
+        if ('link', os.path.abspath(source)) in keys:
+            return True
+        if self.mode == 'hardlink':
+            return ('inode', source_stat.st_dev, source_stat.st_ino) in keys
+        if self.mode == 'reflink':
+            return _copy_key(os.path.basename(source), source_stat) in keys
+        return False
+
+
+class ViewBuilder:
+    """Creates view entries; the view counterpart of mover.Mover"""
+
+    def __init__(self, mode):
+        self.mode = mode
+
+    def link(self, source, destination, dest_device=None, source_stat=None):
+        """Create the view entry of source at destination and return (strategy, bytes).
+
+        bytes is always 0: no data is copied. Raises FileExistsError if
+        destination already exists.
+        """
+        st = source_stat or os.lstat(source)
+        strategy = view_strategy(self.mode, st, dest_device)
+        if strategy == REFLINK:
+            try:
+                _clone(source, destination)
+            except FileExistsError:
+                raise
+            except OSError as e:
+                if e.errno not in _NO_LINK:
+                    raise
+                with _reflink_lock:
+                    _reflink_devices[st.st_dev] = False
+                strategy = SYMLINK
+            else:
+                with _reflink_lock:
+                    _reflink_devices[st.st_dev] = True
+                return REFLINK, 0
+        if strategy == HARDLINK:
+            try:
+                os.link(source, destination, follow_symlinks=False)
+                return HARDLINK, 0
+            except FileExistsError:
+                raise
+            except OSError as e:
+                if e.errno not in _NO_LINK:
+                    raise
+        # symlink() never replaces an existing destination
+        os.symlink(_symlink_target(source, destination), destination)
+        return SYMLINK, 0
+
+
+def remove_view_entry(source, path):
+    """Delete the view entry path of source; used by undo.
+
+    Symlinks are simply removed. A hard link or reflink copy is removed
+    only while it still matches its original (same file, or same size and
+    mtime); otherwise it may hold data the original no longer has, so it
+    is kept and OSError raised.
+    """
+    st = os.lstat(path)
+    if not stat.S_ISLNK(st.st_mode):
+        try:
+            source_stat = os.lstat(source)
+        except FileNotFoundError:
+            raise OSError(errno.ENOENT, f"Kept {path}: its original {source} is gone") from None
+        if not (os.path.samestat(st, source_stat) or (st.st_size == source_stat.st_size and
+                                                      st.st_mtime_ns == source_stat.st_mtime_ns)):
+            # A reflink copy keeps the size and mtime of its source until one is changed
+            raise OSError(errno.EEXIST, f"Kept {path}: it no longer matches {source}")
+    os.unlink(path)
+
+
+def remove_empty_folders(folders):
+    """Remove the folders a view created, deepest first, where they are empty"""
+    for folder in sorted(set(folders), key=len, reverse=True):
+        try:
+            os.rmdir(folder)
+        except OSError:
+            pass
@@ -0,0 +1,350 @@
+"""Watch mode: sort files as they arrive instead of rescanning.
+
+A ``SortWatcher`` keeps an inotify watch on the sorted directory and its
+non-category subdirectories (``PollingSource`` lists them periodically
+where inotify isn't available). Every event costs a dict update: a file
+that was created, written or moved in is scheduled to be sorted once it
+has been quiet for ``settle`` seconds, and each further write pushes the
+deadline back, so files still being downloaded stay put. Files whose
+deadlines have passed are handed to ``SortEngine.sort_paths`` as one
+batch, which is journaled and undoable like any other sort.
+
+Category folders directly below the directory (and the duplicates folder)
+are the output of the sort and are not watched. If the kernel event queue overflows, the next batch
+is a full ``sort_directory``.
+
+All sorts of one watch session share a batch id, like the roots of a
+``BatchJob``, so a stream of small batches takes a single undo history
+slot instead of pushing earlier sorts out of the history, and undoing
+the last operation undoes the whole session.
+
+An ``OperationControl`` passed as ``control`` is handed to every sort, so
+cancelling it stops the running batch after the file being moved (its
+moves are committed as usual) and ends the watch.
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+from collections import OrderedDict
+from datetime import datetime
+
+from .scanner import walk_entries
+
+DEFAULT_SETTLE = 2.0
+DEFAULT_POLL_INTERVAL = 1.0
+# Most files handed to one sort_paths call
+MAX_BATCH = 1000
+
+# Names browsers and downloaders use while a file is still incomplete
+PARTIAL_SUFFIXES = ('.part', '.partial', '.crdownload', '.download', '.tmp', '.!qb')
+
+# Event kinds reported by the sources
+FILE = 'file'
+GONE = 'gone'
+DIRECTORY = 'dir'
+OVERFLOW = 'overflow'
+
+# inotify(7) constants
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (_IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE
+               | _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_ONLYDIR)
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifySource:
+    """File system events from Linux inotify, through ctypes"""
+
+    def __init__(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        try:
+            self._init1 = libc.inotify_init1
+            self._add_watch = libc.inotify_add_watch
+            self._rm_watch = libc.inotify_rm_watch
+        except AttributeError:
+            raise OSError(errno.ENOSYS, "libc has no inotify functions")
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self._get_errno = ctypes.get_errno
+
+        self.fd = self._init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            err = self._get_errno()
+            raise OSError(err, os.strerror(err))
+        # Watch descriptor -> directory path, and back
+        self._paths = {}
+        self._watches = {}
+
+    def add(self, path):
+        """Start watching the directory path"""
+        if path in self._watches:
+            return
+        wd = self._add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            err = self._get_errno()
+            raise OSError(err, os.strerror(err), path)
+        self._paths[wd] = path
+        self._watches[path] = wd
+
+    def remove(self, path):
+        """Stop watching path"""
+        wd = self._watches.pop(path, None)
+        if wd is not None:
+            self._paths.pop(wd, None)
+            self._rm_watch(self.fd, wd)
+
+    def read(self, timeout):
+        """Wait up to timeout seconds; return a list of (kind, path) events"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+
+            if mask & _IN_Q_OVERFLOW:
+                events.append((OVERFLOW, None))
+                continue
+            directory = self._paths.get(wd)
+            if directory is None:
+                continue
+            if mask & (_IN_IGNORED | _IN_DELETE_SELF | _IN_MOVE_SELF):
+                if mask & _IN_IGNORED:
+                    self._paths.pop(wd, None)
+                    self._watches.pop(directory, None)
+                continue
+
+            path = os.path.join(directory, name)
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    events.append((DIRECTORY, path))
+            elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                events.append((GONE, path))
+            else:
+                events.append((FILE, path))
+        return events
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class PollingSource:
+    """Fallback event source that lists the watched directories periodically"""
+
+    def __init__(self, interval=DEFAULT_POLL_INTERVAL):
+        self.interval = interval
+        # Directory -> {name: (size, mtime_ns)} of its files at the last poll
+        self._listings = {}
+
+    def add(self, path):
+        if path not in self._listings:
+            self._listings[path] = self._list(path)[0]
+
+    def remove(self, path):
+        self._listings.pop(path, None)
+
+    def _list(self, path):
+        files = {}
+        dirs = []
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.name)
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                files[entry.name] = (st.st_size, st.st_mtime_ns)
+        return files, dirs
+
+    def read(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        events = []
+        for path, old in list(self._listings.items()):
+            try:
+                files, dirs = self._list(path)
+            except OSError:
+                self.remove(path)
+                continue
+            for name, signature in files.items():
+                if old.get(name) != signature:
+                    events.append((FILE, os.path.join(path, name)))
+            for name in old.keys() - files.keys():
+                events.append((GONE, os.path.join(path, name)))
+            for name in dirs:
+                child = os.path.join(path, name)
+                if child not in self._listings:
+                    events.append((DIRECTORY, child))
+            self._listings[path] = files
+        return events
+
+    def close(self):
+        self._listings.clear()
+
+
+def open_source(polling=False, poll_interval=DEFAULT_POLL_INTERVAL):
+    """Return an InotifySource, or a PollingSource where inotify can't be used"""
+    if not polling:
+        try:
+            return InotifySource()
+        except OSError:
+            pass
+    return PollingSource(poll_interval)
+
+
+class SortWatcher:
+    """Sort the files arriving in a directory until stopped"""
+
+    def __init__(self, engine, directory, create_folders=True, settle=DEFAULT_SETTLE,
+                 source=None, on_batch=None, control=None):
+        self.engine = engine
+        self.directory = os.path.abspath(directory)
+        self.create_folders = create_folders
+        self.settle = settle
+        self.source = source or open_source()
+        self.on_batch = on_batch
+        self.control = control
+        # Path -> monotonic deadline. Deadlines only grow, so moving an
+        # updated path to the end keeps the dict ordered by deadline.
+        self._pending = OrderedDict()
+        self._full_sort = False
+        # Category folders indexed by sort_paths, kept between batches
+        self._folders = {}
+        # Batch id shared by the sorts of one run()
+        self.batch_id = None
+
+    def _watch_tree(self, top, queue_files):
+        """Watch top and the directories below it, skipping category folders"""
+        output_folders = self.engine.output_folders()
+        for dirpath, file_entries, dir_entries in walk_entries(top, self.engine._scan_error):
+            if dirpath == self.directory:
+                dir_entries[:] = [entry for entry in dir_entries if entry.name not in output_folders]
+            try:
+                self.source.add(dirpath)
+            except OSError as e:
+                self.engine.log(f"Cannot watch {dirpath}: {e}")
+            if queue_files:
+                for entry in file_entries:
+                    self._schedule(entry.path)
+
+    def _schedule(self, path):
+        if path.endswith(PARTIAL_SUFFIXES):
+            return
+        self._pending[path] = time.monotonic() + self.settle
+        self._pending.move_to_end(path)
+
+    def _handle(self, kind, path):
+        if kind == FILE:
+            self._schedule(path)
+        elif kind == GONE:
+            self._pending.pop(path, None)
+        elif kind == DIRECTORY:
+            if (os.path.dirname(path) == self.directory
+                    and os.path.basename(path) in self.engine.output_folders()):
+                return
+            # Files may have landed in it before the watch was added
+            self._watch_tree(path, queue_files=True)
+        elif kind == OVERFLOW:
+            # Events were lost, directories may have gone unwatched too
+            self._watch_tree(self.directory, queue_files=False)
+            self._full_sort = True
+
+    def _take_ready(self):
+        """Pop the pending paths whose quiet period is over"""
+        now = time.monotonic()
+        ready = []
+        while self._pending and len(ready) < MAX_BATCH:
+            path, deadline = next(iter(self._pending.items()))
+            if deadline > now:
+                break
+            del self._pending[path]
+            try:
+                st = os.lstat(path)
+            except OSError:
+                continue
+            # Written to without an event reaching us yet; wait some more
+            if time.time() - st.st_mtime < self.settle:
+                self._schedule(path)
+                continue
+            ready.append(path)
+        return ready
+
+    def _timeout(self):
+        if not self._pending:
+            return self.settle
+        deadline = next(iter(self._pending.values()))
+        return max(0.0, min(self.settle, deadline - time.monotonic()))
+
+    def run(self, stop, initial_sort=True):
+        """Watch and sort until the threading.Event stop is set"""
+        self._watch_tree(self.directory, queue_files=False)
+        if initial_sort:
+            self._full_sort = True
+        self.engine.log(f"Watching {self.directory}")
+        self.batch_id = 'watch-' + datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+
+        control = self.control
+        try:
+            while not stop.is_set() and not (control is not None and control.cancelled):
+                if self._full_sort:
+                    self._full_sort = False
+                    self._pending.clear()
+                    self._report(self.engine.sort_directory(self.directory, self.create_folders,
+                                                            batch=self.batch_id,
+                                                            control=control))
+                    continue
+
+                for kind, path in self.source.read(min(self._timeout(), 1.0)):
+                    self._handle(kind, path)
+
+                ready = self._take_ready()
+                if ready:
+                    result = self.engine.sort_paths(self.directory, ready, self.create_folders,
+                                                    folders=self._folders, control=control,
+                                                    batch=self.batch_id)
+                    if result['errors']:
+                        # A category folder may have been removed; index again
+                        self._folders.clear()
+                    self._report(result)
+        finally:
+            self.source.close()
+            self.engine.log(f"Stopped watching {self.directory}")
+
+    def _report(self, result):
+        if result['moved_files']:
+            self.engine.log(f"Watch: moved {result['moved_files']} files")
+        if self.on_batch is not None:
+            self.on_batch(result)
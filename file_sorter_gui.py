@@ -0,0 +1,1038 @@
+import os
+import json
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox, scrolledtext
+import time
+import threading
+from datetime import datetime
+
+from file_sorter import SortEngine
+from file_sorter.batch import BatchJob
+from file_sorter.control import OperationControl
+from file_sorter.events import EventChannel, DRAIN_INTERVAL_MS
+from file_sorter.logbuffer import LogBuffer
+from file_sorter.metrics import PROFILE_MODES, format_report
+from file_sorter.progress import ProgressTracker, describe, format_duration, format_size
+from file_sorter.dedup import DEDUP_MODES
+from file_sorter.rules import compile_rules
+from file_sorter.sniffer import SNIFF_MODES
+from file_sorter.view import VIEW_MODES
+from file_sorter.watcher import SortWatcher
+
+class AdvancedFileSorter:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Advanced File Sorter - by Syed Dayim")
+        self.root.geometry("900x700")
+        self.root.configure(bg='#f0f0f0')
+        
+        # Worker threads post UI updates here; drained by _poll_events
+        self.events = EventChannel()
+        
+        # Sorting engine (file type mappings, settings and undo history)
+        self.engine = SortEngine(log=self._log_from_thread)
+        
+        # Results log: the widget only shows what the ring buffer retains
+        self.log_buffer = LogBuffer(self.engine.log_max_lines, self.engine.log_file or None)
+        self.log_filter = ''
+        self._widget_lines = 0
+        
+        # Set while watch mode runs; setting it stops the watcher
+        self.watch_stop = None
+        # Watch thread and the control cancelling its current batch
+        self.watch_thread = None
+        self.watch_control = None
+        
+        # Move plan of the last preview; the next sort of that directory executes it
+        self.plan = None
+        
+        # Running operations: OperationControl -> worker thread
+        self.operations = {}
+        self.closing = False
+        
+        self.setup_ui()
+        self.root.after(DRAIN_INTERVAL_MS, self._poll_events)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # Offer to clean up sorts that were cut short last time
+        if self.engine.interrupted_operations:
+            self.root.after(100, self.check_interrupted_operations)
+        
+    @property
+    def file_types(self):
+        return self.engine.file_types
+    
+    @property
+    def operation_history(self):
+        return self.engine.operation_history
+    
+    def load_settings(self):
+        """Load settings from JSON file"""
+        self.engine.load_settings()
+    
+    def save_settings(self):
+        """Save settings to JSON file"""
+        try:
+            self.engine.save_settings()
+        except Exception as e:
+            print(f"Error saving settings: {e}")
+    
+    def setup_ui(self):
+        """Setup the user interface"""
+        # Main frame
+        main_frame = ttk.Frame(self.root, padding="10")
+        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        # Configure grid weights
+        self.root.columnconfigure(0, weight=1)
+        self.root.rowconfigure(0, weight=1)
+        main_frame.columnconfigure(1, weight=1)
+        
+        # Title
+        title_label = ttk.Label(main_frame, text="Advanced File Sorter - by Syed Dayim", 
+                               font=('Arial', 16, 'bold'))
+        title_label.grid(row=0, column=0, columnspan=3, pady=(0, 10))
+        
+        # Developer info
+        dev_info_label = ttk.Label(main_frame, text="Email: dayim1277@gmail.com | GitHub: github.com/syedDayim", 
+                                 font=('Arial', 9))
+        dev_info_label.grid(row=1, column=0, columnspan=3, pady=(0, 20))
+        
+        
+        # Directory selection
+        ttk.Label(main_frame, text="Select Directory:").grid(row=2, column=0, sticky=tk.W, pady=5)
+        self.directory_var = tk.StringVar()
+        self.directory_entry = ttk.Entry(main_frame, textvariable=self.directory_var, width=50)
+        self.directory_entry.grid(row=2, column=1, sticky=(tk.W, tk.E), padx=(10, 5), pady=5)
+        
+        browse_btn = ttk.Button(main_frame, text="Browse", command=self.browse_directory)
+        browse_btn.grid(row=2, column=2, padx=(5, 0), pady=5)
+        
+        # Options frame
+        options_frame = ttk.LabelFrame(main_frame, text="Options", padding="10")
+        options_frame.grid(row=3, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=10)
+        options_frame.columnconfigure(1, weight=1)
+        
+        # Preview mode checkbox
+        self.preview_mode = tk.BooleanVar(value=True)
+        ttk.Checkbutton(options_frame, text="Preview Mode (recommended)", 
+                       variable=self.preview_mode).grid(row=0, column=0, sticky=tk.W, pady=2)
+        
+        # Create folders checkbox
+        self.create_folders = tk.BooleanVar(value=True)
+        ttk.Checkbutton(options_frame, text="Create folders automatically", 
+                       variable=self.create_folders).grid(row=1, column=0, sticky=tk.W, pady=2)
+        
+        # Full rescan checkbox
+        self.full_rescan = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="Full rescan (ignore scan snapshot)", 
+                       variable=self.full_rescan).grid(row=2, column=0, sticky=tk.W, pady=2)
+        
+        # Search the file catalog for sorted files
+        find_frame = ttk.Frame(options_frame)
+        find_frame.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(5, 2))
+        find_frame.columnconfigure(1, weight=1)
+        ttk.Label(find_frame, text="Find sorted file:").grid(row=0, column=0, sticky=tk.W)
+        self.find_var = tk.StringVar()
+        find_entry = ttk.Entry(find_frame, textvariable=self.find_var)
+        find_entry.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=5)
+        find_entry.bind('<Return>', lambda e: self.find_sorted_files())
+        ttk.Button(find_frame, text="Find", command=self.find_sorted_files).grid(row=0, column=2)
+        
+        # Action buttons
+        button_frame = ttk.Frame(main_frame)
+        button_frame.grid(row=4, column=0, columnspan=3, pady=10)
+        
+        self.preview_btn = ttk.Button(button_frame, text="Preview Files", 
+                                     command=self.preview_files, style='Accent.TButton')
+        self.preview_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        self.sort_btn = ttk.Button(button_frame, text="Sort Files", 
+                                  command=self.sort_files, style='Accent.TButton')
+        self.sort_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        self.save_plan_btn = ttk.Button(button_frame, text="Save Plan...", 
+                                       command=self.save_plan, state=tk.DISABLED)
+        self.save_plan_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        self.watch_btn = ttk.Button(button_frame, text="Start Watching", 
+                                   command=self.toggle_watch)
+        self.watch_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        self.undo_btn = ttk.Button(button_frame, text="Undo Last Operation", 
+                                  command=self.undo_last_operation)
+        self.undo_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        batch_btn = ttk.Button(button_frame, text="Batch Sort...", 
+                              command=self.open_batch_window)
+        batch_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        settings_btn = ttk.Button(button_frame, text="Settings", 
+                                 command=self.open_settings)
+        settings_btn.pack(side=tk.LEFT)
+        
+        # Progress bar
+        self.progress_var = tk.DoubleVar()
+        self.progress_bar = ttk.Progressbar(main_frame, variable=self.progress_var, 
+                                          maximum=100, length=400)
+        self.progress_bar.grid(row=5, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=10)
+        
+        # Pause/Cancel for running operations
+        control_frame = ttk.Frame(main_frame)
+        control_frame.grid(row=5, column=2, padx=(5, 0), pady=10)
+        self.pause_btn = ttk.Button(control_frame, text="Pause", 
+                                   command=self.toggle_pause, state=tk.DISABLED)
+        self.pause_btn.pack(side=tk.LEFT, padx=(0, 5))
+        self.cancel_btn = ttk.Button(control_frame, text="Cancel", 
+                                    command=self.cancel_operations, state=tk.DISABLED)
+        self.cancel_btn.pack(side=tk.LEFT)
+        
+        # Status label
+        self.status_var = tk.StringVar(value="Ready")
+        self.status_label = ttk.Label(main_frame, textvariable=self.status_var)
+        self.status_label.grid(row=6, column=0, columnspan=3, pady=5)
+        
+        # Results text area
+        results_frame = ttk.LabelFrame(main_frame, text="Results", padding="5")
+        results_frame.grid(row=7, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=10)
+        results_frame.columnconfigure(0, weight=1)
+        results_frame.rowconfigure(1, weight=1)
+        main_frame.rowconfigure(7, weight=1)
+        
+        # Log filter
+        filter_frame = ttk.Frame(results_frame)
+        filter_frame.grid(row=0, column=0, sticky=(tk.W, tk.E), pady=(0, 5))
+        filter_frame.columnconfigure(1, weight=1)
+        ttk.Label(filter_frame, text="Filter:").grid(row=0, column=0, sticky=tk.W)
+        self.log_filter_var = tk.StringVar()
+        filter_entry = ttk.Entry(filter_frame, textvariable=self.log_filter_var)
+        filter_entry.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=5)
+        filter_entry.bind('<Return>', lambda e: self.apply_log_filter())
+        ttk.Button(filter_frame, text="Apply", command=self.apply_log_filter).grid(row=0, column=2)
+        ttk.Button(filter_frame, text="Show All", 
+                   command=lambda: (self.log_filter_var.set(''), self.apply_log_filter())).grid(row=0, column=3, padx=(5, 0))
+        
+        self.results_text = scrolledtext.ScrolledText(results_frame, height=15, width=80)
+        self.results_text.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        # Configure styles
+        style = ttk.Style()
+        style.configure('Accent.TButton', foreground='white', background='#0078d4')
+    
+    def browse_directory(self):
+        """Open directory browser"""
+        directory = filedialog.askdirectory()
+        if directory:
+            self.directory_var.set(directory)
+    
+    def get_file_category(self, file_path):
+        """Determine file category based on extension"""
+        return self.engine.get_file_category(file_path)
+    
+    def scan_directory(self, directory):
+        """Scan directory for files to sort"""
+        return self.engine.scan_directory(directory)
+    
+    def preview_files(self):
+        """Preview files that will be sorted"""
+        directory = self.directory_var.get()
+        if not directory or not os.path.exists(directory):
+            messagebox.showerror("Error", "Please select a valid directory")
+            return
+        
+        self.log_message("Scanning directory for files...")
+        self.status_var.set("Scanning...")
+        self.progress_var.set(0)
+        
+        # Run in separate thread to prevent UI freezing
+        self._start_operation(self._preview_files_thread, directory, self.full_rescan.get())
+    
+    def _preview_files_thread(self, directory, full_rescan=False, control=None):
+        """Preview files in separate thread"""
+        try:
+            plan = self.engine.plan(directory, full_rescan=full_rescan, control=control)
+            if plan.summary.get('cancelled'):
+                self.events.log("Preview cancelled.")
+                self.events.status("Cancelled")
+                return
+            
+            self.events.call(self._update_preview_results, plan)
+            
+        except Exception as e:
+            self.events.log(f"Error during preview: {e}")
+            self.events.status("Error")
+    
+    def _update_preview_results(self, plan):
+        """Update preview results in main thread"""
+        self.clear_log()
+        summary = plan.summary
+        self.plan = plan if len(plan) else None
+        self.save_plan_btn.config(state=tk.NORMAL if self.plan else tk.DISABLED)
+        total_files = summary['total_files']
+        
+        if total_files == 0:
+            self.log_message("No files found to sort.")
+            self.status_var.set("No files found")
+            return
+        
+        self.log_message(f"Found {total_files} files to sort:")
+        self.log_message("=" * 50)
+        
+        for category, entry in summary['categories'].items():
+            mode = f", {entry['mode']}" if 'mode' in entry else ""
+            self.log_message(f"\n{category} ({entry['count']} files{mode}):")
+            
+            for sample in entry['samples']:  # Show first 10 files
+                if sample['already_sorted']:
+                    self.log_message(f"  ✓ {sample['name']} (already sorted)")
+                else:
+                    destination = f"{category}/{sample.get('destination', '')}"
+                    self.log_message(f"  → {sample['name']} (will move to {destination})")
+            
+            if entry['count'] > len(entry['samples']):
+                self.log_message(f"  ... and {entry['count'] - len(entry['samples'])} more files")
+        
+        files_to_move = summary['files_to_move']
+        self.log_message(f"\nSummary:")
+        self.log_message(f"  Files to move: {files_to_move}")
+        self.log_message(f"  Files already sorted: {summary['files_already_sorted']}")
+        
+        # Earlier sorts of this folder, counted from the catalog
+        if summary.get('catalog'):
+            self.log_message("\nSorted earlier (file catalog):")
+            for category, totals in sorted(summary['catalog'].items()):
+                self.log_message(f"  {category}: {totals['files']} files, "
+                                 f"{totals['bytes'] / (1024 * 1024):.1f} MB")
+        
+        # The engine logged the timings before the log was cleared
+        if 'metrics' in summary:
+            self.log_message("")
+            for line in format_report(summary['metrics']):
+                self.log_message(line)
+        
+        self.status_var.set(f"Preview complete - {total_files} files found ({files_to_move} to move)")
+        self.progress_var.set(100)
+    
+    def sort_files(self):
+        """Sort files into categories"""
+        directory = self.directory_var.get()
+        if not directory or not os.path.exists(directory):
+            messagebox.showerror("Error", "Please select a valid directory")
+            return
+        
+        if not self.preview_mode.get():
+            result = messagebox.askyesno("Confirm", 
+                                       "Are you sure you want to sort files without preview?")
+            if not result:
+                return
+        
+        self.status_var.set("Sorting files...")
+        self.progress_var.set(0)
+        
+        # A plan is used once: its files are no longer where it expects them
+        plan, self.plan = self.plan, None
+        self.save_plan_btn.config(state=tk.DISABLED)
+        if (plan is not None
+                and plan.summary.get('settings_hash') != self.engine.settings_fingerprint()):
+            self.log_message("Settings changed since the preview; sorting with the new settings.")
+            plan = None
+        if plan is not None and os.path.abspath(plan.directory) == os.path.abspath(directory):
+            self.log_message(f"Sorting as previewed ({len(plan)} files to move)...")
+            self._start_operation(self._execute_plan_thread, plan, self.create_folders.get())
+            return
+        
+        self.log_message("Starting file sorting...")
+        
+        # Run in separate thread
+        self._start_operation(self._sort_files_thread, directory, self.create_folders.get(),
+                              self.full_rescan.get())
+    
+    def _sort_files_thread(self, directory, create_folders=True, full_rescan=False,
+                           control=None):
+        """Sort files in separate thread"""
+        try:
+            progress = ProgressTracker()
+            result = self.engine.sort_directory(directory, create_folders=create_folders,
+                                                on_progress=self._progress_reporter(progress),
+                                                full_rescan=full_rescan, control=control,
+                                                progress=progress)
+            
+            if result['total_files'] == 0 and not result['cancelled']:
+                self.events.log("No files found to sort.")
+                self.events.status("No files found")
+                return
+            
+            self.events.call(self._sort_complete, result['moved_files'],
+                            result['total_files'], result['skipped_files'],
+                            result['cancelled'], result['totals'])
+            
+        except Exception as e:
+            self.events.log(f"Error during sorting: {e}")
+            self.events.status("Error")
+    
+    def _execute_plan_thread(self, plan, create_folders=True, control=None):
+        """Execute the previewed plan in separate thread"""
+        try:
+            progress = ProgressTracker()
+            result = self.engine.execute_plan(plan, create_folders=create_folders,
+                                              on_progress=self._progress_reporter(progress),
+                                              control=control, progress=progress)
+            
+            if result['changed_files']:
+                self.events.log(f"{result['changed_files']} files changed after the preview "
+                                "and were left in place.")
+            self.events.call(self._sort_complete, result['moved_files'],
+                            result['total_files'], result['skipped_files'],
+                            result['cancelled'], result['totals'])
+            
+        except Exception as e:
+            self.events.log(f"Error during sorting: {e}")
+            self.events.status("Error")
+    
+    def save_plan(self):
+        """Save the move plan of the last preview to a file"""
+        if self.plan is None:
+            return
+        path = filedialog.asksaveasfilename(defaultextension=".json", 
+                                            filetypes=[("Move plan", "*.json")])
+        if not path:
+            return
+        try:
+            self.plan.save(path)
+            self.log_message(f"Plan saved to {path}")
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not save the plan: {e}")
+    
+    def _sort_complete(self, moved_files, total_files, skipped_files=0, cancelled=False,
+                       totals=None):
+        """Handle sort completion"""
+        if cancelled:
+            self.log_message(f"\nSorting cancelled. Moved {moved_files} files "
+                             "(Undo Last Operation moves them back).")
+            self.status_var.set(f"Cancelled - {moved_files} files moved")
+            return
+        
+        self.log_message(f"\nSorting complete! Moved {moved_files} files.")
+        if totals and totals['seconds']:
+            self.log_message(f"{format_size(totals['bytes'])} in "
+                             f"{format_duration(totals['seconds'])} "
+                             f"({totals['files_per_second']:.0f} files/s, "
+                             f"{format_size(totals['bytes_per_second'])}/s)")
+        if skipped_files > 0:
+            self.log_message(f"Skipped {skipped_files} files that were already in correct folders.")
+        self.status_var.set(f"Complete - {moved_files} files moved")
+        self.progress_var.set(100)
+        
+        if moved_files < total_files:
+            remaining = total_files - moved_files - skipped_files
+            if remaining > 0:
+                self.log_message(f"Note: {remaining} files could not be moved.")
+    
+    def find_sorted_files(self):
+        """Look the name in the find box up in the file catalog"""
+        pattern = self.find_var.get().strip()
+        if not pattern:
+            return
+        threading.Thread(target=self._find_files_thread, args=(pattern,), daemon=True).start()
+    
+    def _find_files_thread(self, pattern):
+        """Query the catalog in separate thread"""
+        try:
+            files = self.engine.find_sorted_files(pattern)
+        except Exception as e:
+            self.events.log(f"Error searching the file catalog: {e}")
+            return
+        self.events.call(self._show_found_files, pattern, files)
+    
+    def _show_found_files(self, pattern, files):
+        """Show catalog search results in main thread"""
+        if not files:
+            hint = "" if self.engine.catalog else " (turn on the file catalog in Settings → Performance)"
+            self.log_message(f"No sorted files match '{pattern}'{hint}.")
+            return
+        self.log_message(f"Sorted files matching '{pattern}':")
+        for found in files:
+            missing = "" if found['exists'] else " (no longer there)"
+            self.log_message(f"  {found['name']} → {found['destination']}{missing}")
+            self.log_message(f"      from {found['original']}, {found['category']}, "
+                             f"sorted {found['sorted_at'] or 'unknown'}")
+    
+    def toggle_watch(self):
+        """Start or stop sorting files as they arrive"""
+        if self.watch_stop is not None:
+            self.watch_stop.set()
+            self.watch_stop = None
+            self.watch_btn.config(text="Start Watching")
+            self.status_var.set("Ready")
+            return
+        
+        directory = self.directory_var.get()
+        if not directory or not os.path.exists(directory):
+            messagebox.showerror("Error", "Please select a valid directory")
+            return
+        
+        self.watch_stop = threading.Event()
+        self.watch_control = OperationControl()
+        self.watch_btn.config(text="Stop Watching")
+        self.status_var.set(f"Watching {directory}")
+        self.watch_thread = threading.Thread(
+            target=self._watch_thread,
+            args=(directory, self.create_folders.get(), self.watch_stop, self.watch_control),
+            daemon=True)
+        self.watch_thread.start()
+    
+    def _watch_thread(self, directory, create_folders, stop, control=None):
+        """Run watch mode in separate thread until stop is set"""
+        try:
+            watcher = SortWatcher(self.engine, directory, create_folders=create_folders,
+                                  control=control)
+            watcher.run(stop)
+        except Exception as e:
+            self.events.log(f"Error while watching: {e}")
+            self.events.status("Error")
+    
+    def open_batch_window(self):
+        """Open the window for sorting several directories in one job"""
+        batch_window = tk.Toplevel(self.root)
+        batch_window.title("Batch Sort")
+        batch_window.geometry("600x400")
+        batch_window.transient(self.root)
+        batch_window.grab_set()
+        
+        frame = ttk.Frame(batch_window, padding="10")
+        frame.pack(fill=tk.BOTH, expand=True)
+        frame.columnconfigure(0, weight=1)
+        frame.rowconfigure(1, weight=1)
+        
+        ttk.Label(frame, text="Directories to sort:").grid(row=0, column=0, sticky=tk.W)
+        roots_list = tk.Listbox(frame, selectmode=tk.EXTENDED)
+        roots_list.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
+        if self.directory_var.get():
+            roots_list.insert(tk.END, self.directory_var.get())
+        
+        def add_root():
+            directory = filedialog.askdirectory(parent=batch_window)
+            if directory and directory not in roots_list.get(0, tk.END):
+                roots_list.insert(tk.END, directory)
+        
+        def remove_roots():
+            for index in reversed(roots_list.curselection()):
+                roots_list.delete(index)
+        
+        list_buttons = ttk.Frame(frame)
+        list_buttons.grid(row=1, column=1, sticky=tk.N, padx=(10, 0), pady=5)
+        ttk.Button(list_buttons, text="Add...", command=add_root).pack(fill=tk.X, pady=(0, 5))
+        ttk.Button(list_buttons, text="Remove", command=remove_roots).pack(fill=tk.X)
+        
+        def start():
+            roots = list(roots_list.get(0, tk.END))
+            if not roots:
+                messagebox.showerror("Error", "Please add at least one directory", parent=batch_window)
+                return
+            batch_window.destroy()
+            self.log_message(f"Starting batch sort of {len(roots)} directories...")
+            self.status_var.set("Sorting files...")
+            self.progress_var.set(0)
+            self._start_operation(self._batch_sort_thread, roots, self.create_folders.get())
+        
+        button_frame = ttk.Frame(batch_window)
+        button_frame.pack(fill=tk.X, padx=10, pady=10)
+        ttk.Button(button_frame, text="Start", command=start).pack(side=tk.RIGHT, padx=(5, 0))
+        ttk.Button(button_frame, text="Cancel", command=batch_window.destroy).pack(side=tk.RIGHT)
+    
+    def _batch_sort_thread(self, roots, create_folders=True, control=None):
+        """Sort several directories in separate thread"""
+        # Shared by the sorts of all roots
+        progress = ProgressTracker()
+        report = self._progress_reporter(progress)
+        
+        def on_progress(root, moved, found):
+            # Called from several sorting threads at once
+            report(moved, found)
+        
+        def on_root_done(root, result):
+            if 'error' in result:
+                self.events.log(f"{root}: {result['error']}")
+            else:
+                self.events.log(f"{root}: moved {result['moved_files']} of "
+                                f"{result['total_files']} files")
+            progress = job.progress()
+            self.events.status(f"Batch: {progress['roots_done']} of "
+                               f"{progress['roots_total']} directories done")
+        
+        try:
+            job = BatchJob(self.engine, roots, create_folders=create_folders,
+                           on_progress=on_progress, on_root_done=on_root_done,
+                           control=control, progress=progress)
+            result = job.run()
+            self.events.call(self._sort_complete, result['moved_files'],
+                            result['total_files'], result['skipped_files'],
+                            result['cancelled'], result['totals'])
+        except Exception as e:
+            self.events.log(f"Error during batch sort: {e}")
+            self.events.status("Error")
+    
+    def check_interrupted_operations(self):
+        """Ask what to do with sorts that did not finish"""
+        for operation in list(self.engine.interrupted_operations):
+            answer = messagebox.askyesnocancel(
+                "Interrupted Sort",
+                f"Sorting {operation.get('directory')} (started {operation.get('timestamp')}) "
+                f"did not finish.\n\n"
+                f"Yes: finish sorting\n"
+                f"No: move the already sorted files back\n"
+                f"Cancel: keep them sorted (can be undone later)")
+            
+            if answer is None:
+                self.engine.close_interrupted(operation)
+                self.log_message(f"Kept partial sort of {operation.get('directory')}")
+            elif answer:
+                self.log_message(f"Resuming sort of {operation.get('directory')}...")
+                self.status_var.set("Sorting files...")
+                self._start_operation(self._resume_operation_thread, operation)
+            else:
+                self.log_message(f"Rolling back partial sort of {operation.get('directory')}...")
+                self.status_var.set("Undoing...")
+                self._start_operation(self._rollback_operation_thread, operation)
+    
+    def _resume_operation_thread(self, operation, control=None):
+        """Finish an interrupted sort in separate thread"""
+        try:
+            progress = ProgressTracker()
+            result = self.engine.resume_operation(operation,
+                                                  on_progress=self._progress_reporter(progress),
+                                                  control=control, progress=progress)
+            self.events.call(self._sort_complete, result['moved_files'],
+                            result['total_files'], result['skipped_files'],
+                            result['cancelled'], result['totals'])
+        except Exception as e:
+            self.events.log(f"Error during sorting: {e}")
+            self.events.status("Error")
+    
+    def _rollback_operation_thread(self, operation, control=None):
+        """Undo an interrupted sort in separate thread"""
+        try:
+            progress = ProgressTracker()
+            result = self.engine.rollback_interrupted(
+                operation, on_progress=self._progress_reporter(progress, "Undoing"),
+                control=control, progress=progress)
+            if result['cancelled']:
+                self.events.log(f"Rollback cancelled after moving {result['moved_back']} files "
+                                "back; the sort stays interrupted.")
+                self.events.status("Cancelled")
+                return
+            self.events.log(f"Rollback complete! Moved {result['moved_back']} files back.")
+            self.events.status("Undo complete")
+        except Exception as e:
+            self.events.log(f"Error during undo: {e}")
+            self.events.status("Undo error")
+    
+    def undo_last_operation(self):
+        """Undo the last sorting operation"""
+        if not self.operation_history:
+            messagebox.showinfo("Info", "No operations to undo")
+            return
+        
+        result = messagebox.askyesno("Confirm Undo", 
+                                   "Are you sure you want to undo the last operation?")
+        if not result:
+            return
+        
+        self.log_message("Undoing last operation...")
+        self.status_var.set("Undoing...")
+        
+        # Run undo in separate thread
+        self._start_operation(self._undo_last_thread)
+    
+    def _undo_last_thread(self, control=None):
+        """Undo the last operation in separate thread"""
+        try:
+            progress = ProgressTracker()
+            # The engine takes it off the history under its lock; sorts
+            # running meanwhile record theirs from other threads
+            result = self.engine.undo_last_operation(
+                on_progress=self._progress_reporter(progress, "Undoing"),
+                control=control, progress=progress)
+            if result is None:
+                self.events.log("No operations to undo")
+                self.events.status("Ready")
+                return
+            if result['cancelled']:
+                # Still in the history; undoing again continues where this stopped
+                self.events.log(f"Undo cancelled after moving {result['moved_back']} files back.")
+                self.events.status("Cancelled")
+                return
+            if result['errors']:
+                # Still in the history; undoing again retries the failed moves
+                self.events.log(f"Undo moved {result['moved_back']} files back with "
+                                f"{len(result['errors'])} errors; undo again to retry.")
+                self.events.status("Undo error")
+                return
+            
+            if 'view' in result:
+                self.events.log(f"Undo complete! Removed the view ({result['moved_back']} "
+                                f"{result['view']} entries).")
+            else:
+                self.events.log(f"Undo complete! Moved {result['moved_back']} files back.")
+            self.events.status("Undo complete")
+            
+        except Exception as e:
+            self.events.log(f"Error during undo: {e}")
+            self.events.status("Undo error")
+    
+    def _start_operation(self, target, *args):
+        """Run target(*args, control) in a worker thread that Pause and Cancel act on"""
+        control = OperationControl()
+        
+        def run():
+            try:
+                target(*args, control)
+            finally:
+                self.events.call(self._operation_finished, control)
+        
+        thread = threading.Thread(target=run, daemon=True)
+        self.operations[control] = thread
+        self.pause_btn.config(state=tk.NORMAL, text="Pause")
+        self.cancel_btn.config(state=tk.NORMAL)
+        thread.start()
+    
+    def _operation_finished(self, control):
+        """Forget a finished operation; disable Pause/Cancel once none is left"""
+        self.operations.pop(control, None)
+        if not self.operations:
+            self.pause_btn.config(state=tk.DISABLED, text="Pause")
+            self.cancel_btn.config(state=tk.DISABLED)
+    
+    def toggle_pause(self):
+        """Pause or resume every running operation"""
+        if not self.operations:
+            return
+        if any(control.paused for control in self.operations):
+            for control in self.operations:
+                control.resume()
+            self.pause_btn.config(text="Pause")
+            self.status_var.set("Resumed")
+        else:
+            for control in self.operations:
+                control.pause()
+            self.pause_btn.config(text="Resume")
+            self.status_var.set("Paused")
+    
+    def cancel_operations(self):
+        """Stop every running operation after the file it is working on"""
+        for control in self.operations:
+            control.cancel()
+        if self.operations:
+            self.log_message("Cancelling after the current file...")
+            self.status_var.set("Cancelling...")
+            self.pause_btn.config(state=tk.DISABLED, text="Pause")
+            self.cancel_btn.config(state=tk.DISABLED)
+    
+    def on_close(self):
+        """Cancel running operations and close the window once they have stopped"""
+        if self.closing:
+            return
+        self.closing = True
+        if self.watch_stop is not None:
+            self.watch_stop.set()
+            # Stop a batch being sorted after the current file
+            self.watch_control.cancel()
+        self.cancel_operations()
+        self._close_when_idle()
+    
+    def _close_when_idle(self):
+        # Operations and watch batches commit their moves before their thread ends
+        threads = list(self.operations.values())
+        if self.watch_thread is not None:
+            threads.append(self.watch_thread)
+        if any(thread.is_alive() for thread in threads):
+            self.root.after(DRAIN_INTERVAL_MS, self._close_when_idle)
+            return
+        self.root.destroy()
+    
+    def open_settings(self):
+        """Open settings window"""
+        settings_window = tk.Toplevel(self.root)
+        settings_window.title("File Sorter Settings")
+        settings_window.geometry("600x500")
+        settings_window.transient(self.root)
+        settings_window.grab_set()
+        
+        # Create notebook for tabs
+        notebook = ttk.Notebook(settings_window)
+        notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        # File types tab
+        file_types_frame = ttk.Frame(notebook)
+        notebook.add(file_types_frame, text="File Types")
+        
+        # Create scrollable frame for file types
+        canvas = tk.Canvas(file_types_frame)
+        scrollbar = ttk.Scrollbar(file_types_frame, orient="vertical", command=canvas.yview)
+        scrollable_frame = ttk.Frame(canvas)
+        
+        scrollable_frame.bind(
+            "<Configure>",
+            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
+        )
+        
+        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
+        canvas.configure(yscrollcommand=scrollbar.set)
+        
+        # File type entries
+        self.file_type_vars = {}
+        row = 0
+        
+        for category, extensions in self.file_types.items():
+            ttk.Label(scrollable_frame, text=f"{category}:", 
+                     font=('Arial', 10, 'bold')).grid(row=row, column=0, sticky=tk.W, pady=5)
+            
+            var = tk.StringVar(value=', '.join(extensions))
+            entry = ttk.Entry(scrollable_frame, textvariable=var, width=50)
+            entry.grid(row=row, column=1, sticky=(tk.W, tk.E), padx=(10, 0), pady=5)
+            self.file_type_vars[category] = var
+            row += 1
+        
+        canvas.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        
+        # Rules tab
+        rules_frame = ttk.Frame(notebook, padding="10")
+        notebook.add(rules_frame, text="Rules")
+        rules_frame.columnconfigure(0, weight=1)
+        rules_frame.rowconfigure(1, weight=1)
+        
+        ttk.Label(rules_frame, text='Checked in order before the file types, e.g. '
+                  '[{"glob": "invoice_*.pdf", "target": "Finance"}]', 
+                  font=('Arial', 8)).grid(row=0, column=0, sticky=tk.W)
+        self.rules_text = scrolledtext.ScrolledText(rules_frame, height=15, wrap=tk.NONE)
+        self.rules_text.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
+        self.rules_text.insert('1.0', json.dumps(self.engine.rules, indent=2))
+        
+        # Performance tab
+        performance_frame = ttk.Frame(notebook, padding="10")
+        notebook.add(performance_frame, text="Performance")
+        
+        ttk.Label(performance_frame, text="Parallel move workers:").grid(row=0, column=0, sticky=tk.W, pady=5)
+        self.workers_var = tk.IntVar(value=self.engine.workers)
+        ttk.Spinbox(performance_frame, from_=1, to=64, textvariable=self.workers_var, 
+                    width=5).grid(row=0, column=1, sticky=tk.W, padx=(10, 0), pady=5)
+        
+        ttk.Label(performance_frame, text="Copy chunk size (MB):").grid(row=1, column=0, sticky=tk.W, pady=5)
+        self.chunk_size_var = tk.IntVar(value=max(1, self.engine.copy_chunk_size // (1024 * 1024)))
+        ttk.Spinbox(performance_frame, from_=1, to=256, textvariable=self.chunk_size_var, 
+                    width=5).grid(row=1, column=1, sticky=tk.W, padx=(10, 0), pady=5)
+        ttk.Label(performance_frame, text="Used when moving files to another drive.", 
+                  font=('Arial', 8)).grid(row=2, column=0, columnspan=2, sticky=tk.W)
+        
+        ttk.Label(performance_frame, text="Results lines kept:").grid(row=3, column=0, sticky=tk.W, pady=5)
+        self.log_max_lines_var = tk.IntVar(value=self.engine.log_max_lines)
+        ttk.Spinbox(performance_frame, from_=100, to=1000000, increment=1000, 
+                    textvariable=self.log_max_lines_var, width=10).grid(row=3, column=1, sticky=tk.W, padx=(10, 0), pady=5)
+        
+        ttk.Label(performance_frame, text="Full log file (optional):").grid(row=4, column=0, sticky=tk.W, pady=5)
+        self.log_file_var = tk.StringVar(value=self.engine.log_file)
+        ttk.Entry(performance_frame, textvariable=self.log_file_var, 
+                  width=40).grid(row=4, column=1, sticky=(tk.W, tk.E), padx=(10, 0), pady=5)
+        
+        ttk.Label(performance_frame, text="Content sniffing:").grid(row=5, column=0, sticky=tk.W, pady=5)
+        self.sniff_var = tk.StringVar(value=self.engine.sniff_content)
+        ttk.Combobox(performance_frame, textvariable=self.sniff_var, values=SNIFF_MODES, 
+                     state='readonly', width=10).grid(row=5, column=1, sticky=tk.W, padx=(10, 0), pady=5)
+        ttk.Label(performance_frame, text="unknown: look inside files without a known extension; "
+                  "all: also fix mislabeled files.", 
+                  font=('Arial', 8)).grid(row=6, column=0, columnspan=2, sticky=tk.W)
+        
+        ttk.Label(performance_frame, text="Duplicate files:").grid(row=7, column=0, sticky=tk.W, pady=5)
+        self.dedup_var = tk.StringVar(value=self.engine.dedup)
+        ttk.Combobox(performance_frame, textvariable=self.dedup_var, values=DEDUP_MODES, 
+                     state='readonly', width=10).grid(row=7, column=1, sticky=tk.W, padx=(10, 0), pady=5)
+        ttk.Label(performance_frame, text="skip: leave them in place; hardlink: link to the existing copy; "
+                  "quarantine: move to Duplicates.", 
+                  font=('Arial', 8)).grid(row=8, column=0, columnspan=2, sticky=tk.W)
+        
+        self.timings_var = tk.BooleanVar(value=self.engine.timings)
+        ttk.Checkbutton(performance_frame, text="Log timings after each operation", 
+                        variable=self.timings_var).grid(row=9, column=0, columnspan=2, sticky=tk.W, pady=5)
+        
+        ttk.Label(performance_frame, text="Profile:").grid(row=10, column=0, sticky=tk.W, pady=5)
+        self.profile_var = tk.StringVar(value=self.engine.profile)
+        ttk.Combobox(performance_frame, textvariable=self.profile_var, values=PROFILE_MODES, 
+                     state='readonly', width=10).grid(row=10, column=1, sticky=tk.W, padx=(10, 0), pady=5)
+        ttk.Label(performance_frame, text="cpu: cProfile; memory: tracemalloc. Slows operations down.", 
+                  font=('Arial', 8)).grid(row=11, column=0, columnspan=2, sticky=tk.W)
+        
+        ttk.Label(performance_frame, text="Scan threads:").grid(row=12, column=0, sticky=tk.W, pady=5)
+        self.scan_workers_var = tk.IntVar(value=self.engine.scan_workers)
+        ttk.Spinbox(performance_frame, from_=1, to=64, textvariable=self.scan_workers_var, 
+                    width=5).grid(row=12, column=1, sticky=tk.W, padx=(10, 0), pady=5)
+        self.scan_ordered_var = tk.BooleanVar(value=self.engine.scan_ordered)
+        ttk.Checkbutton(performance_frame, text="Scan folders in a fixed order", 
+                        variable=self.scan_ordered_var).grid(row=13, column=0, columnspan=2, sticky=tk.W, pady=5)
+        ttk.Label(performance_frame, text="More scan threads help on network shares (8-32); "
+                  "keep 1 on local disks.", 
+                  font=('Arial', 8)).grid(row=14, column=0, columnspan=2, sticky=tk.W)
+        
+        self.catalog_var = tk.BooleanVar(value=self.engine.catalog)
+        ttk.Checkbutton(performance_frame, text="Keep a catalog of sorted files", 
+                        variable=self.catalog_var).grid(row=15, column=0, columnspan=2, sticky=tk.W, pady=5)
+        ttk.Label(performance_frame, text="Lets \"Find sorted file\" and previews answer without "
+                  "scanning folders.", 
+                  font=('Arial', 8)).grid(row=16, column=0, columnspan=2, sticky=tk.W)
+        
+        ttk.Label(performance_frame, text="Sort into a view:").grid(row=17, column=0, sticky=tk.W, pady=5)
+        self.view_var = tk.StringVar(value=self.engine.view)
+        ttk.Combobox(performance_frame, textvariable=self.view_var, values=VIEW_MODES, 
+                     state='readonly', width=10).grid(row=17, column=1, sticky=tk.W, padx=(10, 0), pady=5)
+        ttk.Label(performance_frame, text="Leave files in place and fill the category folders with links "
+                  "or reflink copies; Undo deletes the view.", 
+                  font=('Arial', 8)).grid(row=18, column=0, columnspan=2, sticky=tk.W)
+        
+        # Buttons
+        button_frame = ttk.Frame(settings_window)
+        button_frame.pack(fill=tk.X, padx=10, pady=10)
+        
+        ttk.Button(button_frame, text="Save", 
+                  command=lambda: self.save_settings_from_window(settings_window)).pack(side=tk.RIGHT, padx=(5, 0))
+        ttk.Button(button_frame, text="Cancel", 
+                  command=settings_window.destroy).pack(side=tk.RIGHT)
+    
+    def save_settings_from_window(self, window):
+        """Save settings from settings window"""
+        try:
+            rules = json.loads(self.rules_text.get('1.0', tk.END).strip() or '[]')
+            if not isinstance(rules, list):
+                raise ValueError("rules must be a JSON list")
+            errors = compile_rules(rules).errors
+            if errors:
+                position, message = errors[0]
+                raise ValueError(f"rule {position + 1}: {message}")
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid rules: {e}", parent=window)
+            return
+        
+        try:
+            for category, var in self.file_type_vars.items():
+                extensions = [ext.strip() for ext in var.get().split(',') if ext.strip()]
+                self.file_types[category] = extensions
+            
+            self.engine.workers = max(1, self.workers_var.get())
+            self.engine.copy_chunk_size = max(1, self.chunk_size_var.get()) * 1024 * 1024
+            self.engine.log_max_lines = max(100, self.log_max_lines_var.get())
+            self.engine.log_file = self.log_file_var.get().strip()
+            self.engine.sniff_content = self.sniff_var.get()
+            self.engine.dedup = self.dedup_var.get()
+            self.engine.timings = self.timings_var.get()
+            self.engine.profile = self.profile_var.get()
+            self.engine.scan_workers = max(1, self.scan_workers_var.get())
+            self.engine.scan_ordered = self.scan_ordered_var.get()
+            self.engine.catalog = self.catalog_var.get()
+            self.engine.view = self.view_var.get()
+            self.engine.rules = rules
+            
+            self.log_buffer.configure(self.engine.log_max_lines, self.engine.log_file or None)
+            self.apply_log_filter()
+            # A previewed plan may no longer be what these settings would do
+            self.plan = None
+            self.save_plan_btn.config(state=tk.DISABLED)
+            
+            self.save_settings()
+            messagebox.showinfo("Success", "Settings saved successfully!")
+            window.destroy()
+            
+        except Exception as e:
+            messagebox.showerror("Error", f"Error saving settings: {e}")
+    
+    def log_message(self, message):
+        """Add message to results text area"""
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        self._append_log_lines([f"[{timestamp}] {message}"])
+    
+    def _append_log_lines(self, lines):
+        """Add lines to the log buffer and show those matching the filter"""
+        self.log_buffer.append(lines)
+        if self.log_filter:
+            lines = [line for line in lines if self.log_filter in line.lower()]
+        if not lines:
+            return
+        
+        # One insert for the whole batch
+        self.results_text.insert(tk.END, "\n".join(lines) + "\n")
+        self._widget_lines += sum(line.count("\n") + 1 for line in lines)
+        
+        # Trim the widget to the same window the buffer retains
+        excess = self._widget_lines - self.log_buffer.max_lines
+        if excess > 0:
+            self.results_text.delete("1.0", f"{excess + 1}.0")
+            self._widget_lines -= excess
+        self.results_text.see(tk.END)
+    
+    def clear_log(self):
+        """Clear the results area and the retained log lines"""
+        self.results_text.delete(1.0, tk.END)
+        self.log_buffer.clear()
+        self._widget_lines = 0
+    
+    def apply_log_filter(self):
+        """Show only retained log lines containing the filter text"""
+        self.log_filter = self.log_filter_var.get().strip().lower()
+        lines = self.log_buffer.search(self.log_filter) if self.log_filter else self.log_buffer.lines()
+        
+        self.results_text.delete(1.0, tk.END)
+        self._widget_lines = 0
+        if lines:
+            self.results_text.insert(tk.END, "\n".join(lines) + "\n")
+            self._widget_lines = sum(line.count("\n") + 1 for line in lines)
+        self.results_text.see(tk.END)
+    
+    def _log_from_thread(self, message):
+        """Forward an engine log message to the UI thread"""
+        self.events.log(message)
+    
+    def _progress_reporter(self, progress, action="Sorting"):
+        """on_progress callback showing the bytes done, rates and ETA of progress.
+        
+        The bar follows the bytes moved rather than the file count, so one
+        large video weighs as much as it takes to move. Snapshots are
+        taken at most once per drain interval.
+        """
+        interval = DRAIN_INTERVAL_MS / 1000
+        last = [0.0]
+        
+        def on_progress(done, total):
+            now = time.monotonic()
+            if now - last[0] < interval and done < total:
+                return
+            last[0] = now
+            snapshot = progress.snapshot()
+            self.events.progress(snapshot['fraction'] * 100)
+            self.events.status(f"{action}: {describe(snapshot)}")
+        return on_progress
+    
+    def _poll_events(self):
+        """Apply everything the worker threads posted since the last poll"""
+        try:
+            progress, status, lines, calls = self.events.drain()
+            
+            if lines:
+                self._append_log_lines(lines)
+            if progress is not None:
+                self.progress_var.set(progress)
+            if status is not None:
+                self.status_var.set(status)
+            for fn, args in calls:
+                try:
+                    fn(*args)
+                except Exception as e:
+                    # One failing callback must not stop the others or the timer
+                    self.log_message(f"Error updating the window: {e}")
+        finally:
+            self.root.after(DRAIN_INTERVAL_MS, self._poll_events)
+
+def main():
+    root = tk.Tk()
+    app = AdvancedFileSorter(root)
+    root.mainloop()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
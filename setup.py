@@ -36,8 +36,10 @@ setup(
     entry_points={
         "console_scripts": [
             "file-sorter=fileSorter:main",
+            "file-sorter-cli=file_sorter.cli:main",
         ],
     },
+    py_modules=["fileSorter", "file_sorter_gui"],
     packages=find_packages(),
     include_package_data=True,
     zip_safe=False,
@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+from file_sorter.engine import SortEngine
+
+
+@pytest.fixture
+def make_engine(tmp_path):
+    """make_engine(**settings) -> a SortEngine whose settings, journal and caches live in tmp_path.
+
+    Calling it again with no settings gives a second engine on the same
+    files, as after a restart.
+    """
+    settings_path = tmp_path / 'settings.json'
+
+    def make(**settings):
+        if settings or not settings_path.exists():
+            settings_path.write_text(json.dumps(settings))
+        return SortEngine(str(settings_path))
+
+    return make
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """tree({'a.txt': b'...', 'sub/b.jpg': b'...'}) -> the 'work' directory holding those files"""
+    root = tmp_path / 'work'
+    root.mkdir()
+
+    def make(files):
+        for name, data in files.items():
+            path = root / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+        return root
+
+    return make
@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from file_sorter.executor import BoundedExecutor, DestinationFolder
+
+
+def test_reserve_numbers_clashing_names(tmp_path):
+    (tmp_path / 'a.txt').write_text('a')
+    (tmp_path / 'a_1.txt').write_text('a')
+    folder = DestinationFolder(str(tmp_path))
+
+    assert folder.reserve('a.txt') == os.path.join(str(tmp_path), 'a_2.txt')
+    assert folder.reserve('a.txt') == os.path.join(str(tmp_path), 'a_3.txt')
+    assert folder.reserve('b.txt') == os.path.join(str(tmp_path), 'b.txt')
+    assert folder.reserve('b.txt') == os.path.join(str(tmp_path), 'b_1.txt')
+
+
+def test_released_name_can_be_reserved_again(tmp_path):
+    folder = DestinationFolder(str(tmp_path))
+    first = folder.reserve('a.txt')
+    folder.release(first)
+
+    assert folder.reserve('a.txt') == first
+
+
+def test_parallel_reservations_never_repeat(tmp_path):
+    folder = DestinationFolder(str(tmp_path))
+    names = []
+    with BoundedExecutor(4) as executor:
+        for _ in range(200):
+            executor.submit(lambda: names.append(folder.reserve('same.txt')))
+
+    assert len(set(names)) == 200
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_job_errors_are_raised(workers):
+    def fail():
+        raise OSError("disk full")
+
+    with pytest.raises(OSError, match="disk full"):
+        with BoundedExecutor(workers) as executor:
+            executor.submit(fail)
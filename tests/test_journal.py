@@ -0,0 +1,103 @@
+import os
+
+from file_sorter.journal import (JournalStore, JournalWriter, iter_moves_reversed,
+                                 iter_records_reversed, read_directory_table, read_summary)
+
+
+def _moves(count, source_dir='/data/inbox', dest_dir='/data/inbox/Documents'):
+    # Long names so the journal spans several read blocks
+    return [(os.path.join(source_dir, f"{i:06d}-{'x' * 60}.txt"),
+             os.path.join(dest_dir, f"{i:06d}-{'x' * 60}.txt")) for i in range(count)]
+
+
+def test_moves_come_back_newest_first_across_blocks(tmp_path):
+    journal = JournalStore(str(tmp_path)).start('/data/inbox')
+    moves = _moves(3000)
+    for source, destination in moves:
+        journal.record_move(source, destination, 'rename', 1)
+    journal.commit({'moved_files': len(moves)})
+
+    assert os.path.getsize(journal.path) > 3 * 64 * 1024
+    assert list(iter_moves_reversed(journal.path)) == moves[::-1]
+    assert next(iter_records_reversed(journal.path))[0] == 'C'
+
+
+def test_resumed_journal_keeps_its_directory_table(tmp_path):
+    journal = JournalStore(str(tmp_path)).start('/data/inbox')
+    moves = _moves(10)
+    for source, destination in moves[:4]:
+        journal.record_move(source, destination, 'rename', 1)
+    journal.close()
+    assert not read_summary(journal.path)['complete']
+
+    resumed = JournalWriter(journal.path)
+    assert resumed.previous_moves == 4
+    for source, destination in moves[4:]:
+        resumed.record_move(source, destination, 'rename', 1)
+    resumed.commit({'moved_files': len(moves)})
+
+    # The folders were interned once, before the interruption
+    assert sorted(read_directory_table(journal.path).values()) == ['/data/inbox',
+                                                                   '/data/inbox/Documents']
+    assert list(iter_moves_reversed(journal.path)) == moves[::-1]
+
+
+def test_torn_line_is_skipped_on_resume(tmp_path):
+    journal = JournalStore(str(tmp_path)).start('/data/inbox')
+    moves = _moves(3)
+    journal.record_move(*moves[0], 'rename', 1)
+    journal.close()
+    with open(journal.path, 'ab') as f:
+        f.write(b'["M",0,"torn')
+
+    resumed = JournalWriter(journal.path)
+    for source, destination in moves[1:]:
+        resumed.record_move(source, destination, 'rename', 1)
+    resumed.close()
+
+    assert list(iter_moves_reversed(journal.path)) == moves[::-1]
+
+
+def test_undone_moves_are_skipped(tmp_path):
+    journal = JournalStore(str(tmp_path)).start('/data/inbox')
+    moves = _moves(5)
+    for source, destination in moves:
+        journal.record_move(source, destination, 'rename', 1)
+    journal.commit({'moved_files': 5})
+    JournalWriter(journal.path).record_undone(2)
+
+    assert list(iter_moves_reversed(journal.path)) == moves[2::-1]
+    assert read_summary(journal.path)['undone'] == 2
+
+
+def test_relative_directory_is_undone_from_anywhere(make_engine, tree, tmp_path, monkeypatch):
+    root = tree({'a.txt': b'a', 'b.jpg': b'b'})
+    engine = make_engine()
+    monkeypatch.chdir(root.parent)
+    engine.sort_directory('work')
+
+    monkeypatch.chdir('/')
+    result = make_engine().undo_last_operation()
+
+    assert result['moved_back'] == 2
+    assert (root / 'a.txt').exists() and (root / 'b.jpg').exists()
+
+
+def test_undo_with_errors_stays_in_the_history(make_engine, tree, tmp_path):
+    root = tree({name: name.encode() for name in ('a.txt', 'b.txt', 'c.txt', 'd.txt')})
+    make_engine().sort_directory(str(root))
+    held = tmp_path / 'held'
+    os.rename(root / 'Documents' / 'b.txt', held)
+
+    engine = make_engine()
+    result = engine.undo_last_operation()
+    assert result['moved_back'] == 3 and len(result['errors']) == 1
+    assert len(engine.operation_history) == 1
+
+    # After a restart only the failed move is left to do
+    os.rename(held, root / 'Documents' / 'b.txt')
+    engine = make_engine()
+    result = engine.undo_last_operation()
+    assert result['moved_back'] == 1 and result['errors'] == []
+    assert sorted(os.listdir(root)) == ['Documents', 'a.txt', 'b.txt', 'c.txt', 'd.txt']
+    assert engine.operation_history == []
@@ -0,0 +1,83 @@
+import io
+import os
+
+import pytest
+
+from file_sorter import mover
+from file_sorter.mover import CHUNKED, Mover
+
+
+class _ShortWriter:
+    """Raw file whose writes take at most limit bytes"""
+
+    def __init__(self, raw, limit):
+        self._raw = raw
+        self._limit = limit
+
+    def write(self, data):
+        return self._raw.write(data[:self._limit])
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._raw.close()
+
+
+@pytest.fixture
+def chunked_only(monkeypatch):
+    """Make _copy_data fall through to the read/write loop"""
+    monkeypatch.delattr(os, 'copy_file_range', raising=False)
+    monkeypatch.delattr(os, 'sendfile', raising=False)
+
+
+def _short_writes(monkeypatch, limit):
+    def fake_open(file, mode='r', *args, **kwargs):
+        raw = io.open(file, mode, *args, **kwargs)
+        return _ShortWriter(raw, limit) if 'w' in mode else raw
+    monkeypatch.setattr(mover, 'open', fake_open, raising=False)
+
+
+def _copy(tmp_path, data):
+    source = tmp_path / 'source.bin'
+    source.write_bytes(data)
+    destination = tmp_path / 'destination.bin'
+    with open(source, 'rb') as fsrc, open(destination, 'xb') as fdst:
+        result = Mover(64 * 1024)._copy_data(fsrc.fileno(), fdst.fileno())
+    return result, destination.read_bytes()
+
+
+def test_chunked_copy_finishes_short_writes(tmp_path, monkeypatch, chunked_only):
+    data = os.urandom(300 * 1024 + 17)
+    _short_writes(monkeypatch, 1000)
+
+    (strategy, copied), written = _copy(tmp_path, data)
+
+    assert strategy == CHUNKED
+    assert copied == len(data)
+    assert written == data
+
+
+def test_chunked_copy_fails_when_writes_stall(tmp_path, monkeypatch, chunked_only):
+    _short_writes(monkeypatch, 0)
+
+    with pytest.raises(OSError, match="no progress"):
+        _copy(tmp_path, b'data')
+
+
+def test_cross_device_move_keeps_the_data(tmp_path, monkeypatch, chunked_only):
+    data = os.urandom(200 * 1024)
+    source = tmp_path / 'a.bin'
+    source.write_bytes(data)
+    destination = tmp_path / 'b.bin'
+    _short_writes(monkeypatch, 4096)
+
+    # A device number that can't match forces the copy
+    strategy, size = Mover().move(str(source), str(destination), dest_device=-1)
+
+    assert (strategy, size) == (CHUNKED, len(data))
+    assert destination.read_bytes() == data
+    assert not source.exists()
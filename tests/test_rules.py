@@ -0,0 +1,97 @@
+import pytest
+
+from file_sorter.rules import compile_rules, parse_size
+from file_sorter.scanner import PathEntry
+
+
+def _target(rules, name, category='Documents'):
+    matcher = compile_rules(rules)
+    assert matcher.errors == []
+    return matcher.match(PathEntry('/nonexistent/' + name), category)
+
+
+def test_global_inline_flags_are_accepted():
+    rules = [{'regex': '(?i)invoice', 'target': 'Finance'}]
+
+    assert _target(rules, 'INVOICE-2024.pdf') == 'Finance'
+    assert _target(rules, 'report.pdf') is None
+
+
+def test_backreferences_stay_with_their_rule():
+    rules = [{'regex': r'(\d)\1', 'target': 'Doubles'},
+             {'regex': r'(x)\1', 'target': 'Xs'}]
+
+    assert _target(rules, 'a11.txt') == 'Doubles'
+    assert _target(rules, 'a12.txt') is None
+    assert _target(rules, 'xx.txt') == 'Xs'
+
+
+def test_backreference_after_a_glob():
+    rules = [{'glob': '*.txt', 'regex': r'(\d)\1', 'target': 'Doubles'}]
+
+    assert _target(rules, 'a33.txt') == 'Doubles'
+    assert _target(rules, 'a34.txt') is None
+    assert _target(rules, 'a33.pdf') is None
+
+
+def test_first_matching_rule_wins_across_joined_and_separate_patterns():
+    rules = [{'glob': 'a*', 'target': 'A'},
+             {'regex': 'b', 'target': 'B'},
+             {'glob': '*.txt', 'regex': r'(c)\1', 'target': 'C'},
+             {'regex': 'd', 'target': 'D'}]
+    matcher = compile_rules(rules)
+    # Only the rule with a group is tested on its own
+    assert [rule.pattern is not None for rule in matcher.rules] == [True, True, False, True]
+
+    assert _target(rules, 'abd.txt') == 'A'
+    assert _target(rules, 'bcc.txt') == 'B'
+    assert _target(rules, 'ccd.txt') == 'C'
+    assert _target(rules, 'd.txt') == 'D'
+    assert _target(rules, 'zz.txt') is None
+
+
+def test_glob_is_case_insensitive_and_whole_name():
+    rules = [{'glob': 'IMG_*.jpg', 'target': 'Camera'}]
+
+    assert _target(rules, 'img_0001.JPG') == 'Camera'
+    assert _target(rules, 'old_img_0001.jpg') is None
+
+
+def test_extension_and_category_conditions():
+    rules = [{'extensions': ['tar.gz'], 'target': 'Tarballs'},
+             {'category': 'Images', 'glob': 'screenshot*', 'target': 'Screens'}]
+    matcher = compile_rules(rules, max_parts=2)
+
+    assert matcher.match(PathEntry('/x/src.tar.gz'), 'Archives') == 'Tarballs'
+    assert matcher.match(PathEntry('/x/src.gz'), 'Archives') is None
+    assert matcher.match(PathEntry('/x/screenshot1.png'), 'Images') == 'Screens'
+    assert matcher.match(PathEntry('/x/screenshot1.txt'), 'Documents') is None
+
+
+@pytest.mark.parametrize('spec, message', [
+    ({'regex': '(', 'target': 'X'}, 'invalid regex'),
+    ({'glob': '*', 'target': '../up'}, 'inside'),
+    ({'target': 'X'}, 'condition'),
+    ({'glob': '*', 'target': '{nope}'}, 'unknown target fields'),
+])
+def test_invalid_rules_are_reported(spec, message):
+    matcher = compile_rules([spec, {'glob': '*', 'target': 'Ok'}])
+
+    assert len(matcher.rules) == 1
+    assert matcher.errors[0][0] == 0 and message in matcher.errors[0][1]
+
+
+def test_stat_dependence_and_fingerprint():
+    assert compile_rules([{'min_size': '1MB', 'target': 'Big'}]).stat_dependent
+    assert compile_rules([{'glob': '*', 'target': 'By/{year}'}]).stat_dependent
+    assert not compile_rules([{'glob': '*.pdf', 'target': 'P'}]).stat_dependent
+
+    one = compile_rules([{'glob': '*.pdf', 'target': 'P'}]).fingerprint()
+    assert one == compile_rules([{'glob': '*.pdf', 'target': 'P'}]).fingerprint()
+    assert one != compile_rules([{'glob': '*.pdf', 'target': 'Q'}]).fingerprint()
+
+
+def test_parse_size():
+    assert parse_size('1.5KB') == 1536
+    assert parse_size(' 2 gb ') == 2 * 1024 ** 3
+    assert parse_size(100) == 100
@@ -0,0 +1,77 @@
+import os
+import time
+
+
+def _age(root, seconds=60):
+    """Backdate every directory below root, so the snapshot trusts their mtimes"""
+    then = time.time_ns() - seconds * 1000 ** 3
+    for dirpath, _, _ in os.walk(root):
+        os.utime(dirpath, ns=(then, then))
+
+
+def _sort_clean(engine, root):
+    """Sort root, then sort it again so its clean folders are in the snapshot"""
+    engine.sort_directory(str(root))
+    _age(root)
+    result = engine.sort_directory(str(root))
+    assert result['moved_files'] == 0
+    return result
+
+
+def _plant(folder, name, data):
+    """Add a file to folder without changing the folder's mtime"""
+    st = os.stat(folder)
+    (folder / name).write_bytes(data)
+    os.utime(folder, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
+def test_unchanged_sorted_folders_are_not_listed(make_engine, tree):
+    root = tree({'a.txt': b'a', 'b.jpg': b'b'})
+    engine = make_engine()
+    _sort_clean(engine, root)
+    # Not something a real folder does; shows the folder is taken from the snapshot
+    _plant(root / 'Documents', 'c.jpg', b'c')
+
+    result = engine.sort_directory(str(root))
+    assert result['moved_files'] == 0
+    assert result['skipped_files'] == 2
+
+    result = engine.sort_directory(str(root), full_rescan=True)
+    assert result['moved_files'] == 1
+    assert (root / 'Images' / 'c.jpg').exists()
+
+
+def test_new_files_are_noticed(make_engine, tree):
+    root = tree({'a.txt': b'a'})
+    engine = make_engine()
+    _sort_clean(engine, root)
+    (root / 'Documents' / 'b.jpg').write_bytes(b'b')
+
+    result = engine.sort_directory(str(root))
+    assert result['moved_files'] == 1
+    assert (root / 'Images' / 'b.jpg').exists()
+
+
+def test_changed_rules_drop_the_snapshot(make_engine, tree):
+    root = tree({'a.txt': b'a', 'report.pdf': b'%PDF-'})
+    _sort_clean(make_engine(), root)
+
+    engine = make_engine(rules=[{'glob': '*.pdf', 'target': 'Papers'}])
+    result = engine.sort_directory(str(root))
+
+    assert result['moved_files'] == 1
+    assert (root / 'Papers' / 'report.pdf').exists()
+
+
+def test_size_rules_see_files_grow_in_place(make_engine, tree):
+    root = tree({'small.txt': b'a', 'other.txt': b'b'})
+    engine = make_engine(rules=[{'glob': '*.txt', 'min_size': 1024, 'target': 'Big'}])
+    assert engine._open_snapshot(str(root)) is None
+    _sort_clean(engine, root)
+    # Rewriting a file doesn't touch its folder's mtime
+    (root / 'Documents' / 'small.txt').write_bytes(b'x' * 2048)
+
+    result = engine.sort_directory(str(root))
+
+    assert result['moved_files'] == 1
+    assert (root / 'Big' / 'small.txt').exists()
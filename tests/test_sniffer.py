@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from file_sorter import sniffer
+from file_sorter.classifier import ExtensionIndex
+from file_sorter.engine import DEFAULT_FILE_TYPES
+from file_sorter.scanner import PathEntry
+from file_sorter.sniffer import ContentSniffer, identify
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 32
+
+
+@pytest.mark.parametrize('head, extension', [
+    (PNG, '.png'),
+    (b'%PDF-1.7\n', '.pdf'),
+    (b'\x00' * 257 + b'ustar\x00', '.tar'),
+    (b'PK\x03\x04....word/document.xml', '.docx'),
+    (b'PK\x03\x04....', '.zip'),
+    (b'  <!DOCTYPE html><html>', '.html'),
+    (b'#!/usr/bin/env python3\n', '.py'),
+    (b'plain text', None),
+])
+def test_identify(head, extension):
+    assert identify(head) == extension
+
+
+def test_sniffed_file_is_moved_after_a_preview(make_engine, tree):
+    root = tree({'Other/noext': PNG})
+    # Old enough for a snapshot to trust the folder
+    then = os.stat(root).st_mtime_ns - 60 * 1000 ** 3
+    for folder in (root, root / 'Other'):
+        os.utime(folder, ns=(then, then))
+    engine = make_engine(sniff_content='unknown')
+
+    assert engine.preview(str(root))['files_to_move'] == 1
+    result = engine.sort_directory(str(root))
+
+    assert result['moved_files'] == 1
+    assert (root / 'Images' / 'noext').exists()
+
+
+def test_sniffing_turns_the_snapshot_off(make_engine, tree):
+    root = tree({'a.txt': b'a'})
+
+    assert make_engine()._open_snapshot(str(root)) is not None
+    assert make_engine(sniff_content='unknown')._open_snapshot(str(root)) is None
+
+
+def test_heads_are_read_without_pread(tmp_path, monkeypatch):
+    path = tmp_path / 'scan0001'
+    path.write_bytes(PNG)
+    monkeypatch.setattr(sniffer, '_HAVE_PREAD', False)
+    monkeypatch.delattr(os, 'pread', raising=False)
+    content = ContentSniffer(ExtensionIndex(DEFAULT_FILE_TYPES), 'unknown')
+
+    assert content.sniff(PathEntry(str(path))) == '.png'
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'symlink') or os.name == 'nt',
+                                reason="symlink views need symlink permission")
+
+FILES = {'a.txt': b'a', 'b.jpg': b'b', 'c.pdf': b'c'}
+RULES = [{'glob': '*.pdf', 'target': 'Deep/Er'}]
+
+
+def _listing(root):
+    return sorted(os.path.relpath(os.path.join(dirpath, name), root)
+                  for dirpath, dirnames, filenames in os.walk(root)
+                  for name in dirnames + filenames)
+
+
+def test_view_links_files_without_moving_them(make_engine, tree):
+    root = tree(FILES)
+    result = make_engine(view='symlink', rules=RULES).sort_directory(str(root))
+
+    assert result['moved_files'] == 3
+    assert os.path.islink(root / 'Images' / 'b.jpg')
+    assert os.path.realpath(root / 'Deep' / 'Er' / 'c.pdf') == str(root / 'c.pdf')
+    assert (root / 'b.jpg').exists()
+
+
+def test_undo_removes_only_the_folders_the_view_created(make_engine, tree):
+    root = tree(FILES)
+    (root / 'Documents').mkdir()
+    (root / 'keep').mkdir()
+    make_engine(view='symlink', rules=RULES).sort_directory(str(root))
+
+    result = make_engine().undo_last_operation()
+
+    assert result['moved_back'] == 3 and result['view'] == 'symlink'
+    assert _listing(root) == ['Documents', 'a.txt', 'b.jpg', 'c.pdf', 'keep']
+
+
+def test_undo_from_the_catalog_removes_created_folders(make_engine, tree, tmp_path):
+    root = tree(FILES)
+    (root / 'Documents').mkdir()
+    engine = make_engine(view='symlink', catalog=True, rules=RULES)
+    operation_id = engine.sort_directory(str(root))['operation']['id']
+    for name in os.listdir(tmp_path / 'file_sorter_journal'):
+        os.remove(tmp_path / 'file_sorter_journal' / name)
+
+    result = make_engine().undo_operation_id(operation_id)
+
+    assert result['moved_back'] == 3
+    assert _listing(root) == ['Documents', 'a.txt', 'b.jpg', 'c.pdf']
+
+
+def test_sorting_into_the_same_view_again_adds_nothing(make_engine, tree):
+    root = tree(FILES)
+    engine = make_engine(view='symlink')
+    engine.sort_directory(str(root))
+
+    result = engine.sort_directory(str(root))
+
+    assert result['moved_files'] == 0
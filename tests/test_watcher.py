@@ -0,0 +1,68 @@
+import threading
+
+from file_sorter.watcher import FILE, SortWatcher
+
+
+class _ScriptedSource:
+    """Event source handing out one prepared batch of events per read, then stopping"""
+
+    def __init__(self, rounds, stop):
+        self.rounds = list(rounds)
+        self.stop = stop
+
+    def add(self, path):
+        pass
+
+    def remove(self, path):
+        pass
+
+    def read(self, timeout):
+        if not self.rounds:
+            self.stop.set()
+            return []
+        return self.rounds.pop(0)
+
+    def close(self):
+        pass
+
+
+def _watch(engine, root, rounds):
+    stop = threading.Event()
+    batches = []
+    watcher = SortWatcher(engine, str(root), settle=0, source=_ScriptedSource(rounds, stop),
+                          on_batch=batches.append)
+    watcher.run(stop, initial_sort=False)
+    return watcher, batches
+
+
+def test_batches_of_a_session_share_one_batch_id(make_engine, tree):
+    root = tree({'a.txt': b'a', 'b.jpg': b'b'})
+    engine = make_engine()
+
+    watcher, batches = _watch(engine, root, [[(FILE, str(root / 'a.txt'))],
+                                             [(FILE, str(root / 'b.jpg'))]])
+
+    assert [batch['moved_files'] for batch in batches] == [1, 1]
+    assert {batch['operation']['batch'] for batch in batches} == {watcher.batch_id}
+    assert (root / 'Documents' / 'a.txt').exists() and (root / 'Images' / 'b.jpg').exists()
+
+
+def test_undo_last_undoes_the_whole_watch_session(make_engine, tree):
+    root = tree({'old.txt': b'o'})
+    engine = make_engine()
+    engine.sort_directory(str(root))
+    tree({'a.txt': b'a', 'b.jpg': b'b', 'c.pdf': b'c'})
+    _watch(engine, root, [[(FILE, str(root / 'a.txt'))],
+                          [(FILE, str(root / 'b.jpg'))],
+                          [(FILE, str(root / 'c.pdf'))]])
+
+    # After a restart, as the history is read back from the journal
+    engine = make_engine()
+    result = engine.undo_last_operation()
+
+    assert result['operations'] == 3
+    assert result['moved_back'] == 3 and result['errors'] == []
+    assert all((root / name).exists() for name in ('a.txt', 'b.jpg', 'c.pdf'))
+    # The sort before the session is still there to undo
+    assert len(engine.operation_history) == 1
+    assert (root / 'Documents' / 'old.txt').exists()